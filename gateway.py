@@ -0,0 +1,197 @@
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from flask import Flask, jsonify
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+from werkzeug.serving import run_simple
+from werkzeug.utils import redirect
+from werkzeug.wrappers import Response
+
+# ---------------- MMACRAFTAI GATEWAY ----------------
+# Serves FightFit, SmartSpar and FightIQ from one process, each module's own
+# Flask app mounted under a prefix:
+#
+#   python gateway.py                      http://127.0.0.1:8000/
+#   python gateway.py --warm all           load every module in the background
+#   gunicorn 'gateway:create_app()'
+#
+# Nothing heavy is imported at startup. A module's app.py, and with it
+# pandas/sklearn or OpenCV/MediaPipe and its model, is imported on the first
+# request under its prefix, or ahead of time by the --warm thread. Modules
+# load one at a time, so the time and resident memory each one adds can be
+# told apart; they are printed and served at /gateway/status. Memory shared
+# between modules (numpy, pandas) is counted for whichever loads first.
+#
+# The modules still run standalone (python app.py in their directory) and
+# keep their own ports there; the landing page links are rewritten to the
+# prefixes when served from here.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+LANDING_PAGE = os.path.join(ROOT, 'index.html')
+
+# (name, prefix, directory, standalone URL linked from index.html)
+MODULES = [
+    ('fightfit', '/fightfit', 'module_1', 'http://127.0.0.1:8080/'),
+    ('smartspar', '/smartspar', 'module_2', 'http://127.0.0.1:5000/'),
+    ('fightiq', '/fightiq', 'module_3', 'http://127.0.0.1:5500/'),
+]
+
+# A module that failed to import is retried after this long
+RETRY_SECONDS = 30
+
+# sys.path edits and the per-module memory figures need loads to be serialised
+load_lock = threading.Lock()
+
+def rss_mb():
+    # Current resident set size of this process
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return float('nan')  # not available on Windows
+    # Peak rather than current outside Linux; bytes on macOS, KB elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class LazyModule:
+    # WSGI app that imports a module's app.py on first use and then hands
+    # every request to its Flask app
+    def __init__(self, name, prefix, directory):
+        self.name = name
+        self.prefix = prefix
+        self.directory = directory
+        self.module_name = f'{name}_app'  # every module's file is app.py
+        self.app = None
+        self.state = 'idle'
+        self.error = None
+        self.failed_at = 0.0
+        self.load_seconds = None
+        self.rss_delta_mb = None
+
+    def load(self):
+        with load_lock:
+            if self.app is not None:
+                return True
+            if self.state == 'failed' and time.time() - self.failed_at < RETRY_SECONDS:
+                return False
+            self.state = 'loading'
+            before, start = rss_mb(), time.perf_counter()
+            try:
+                # Sibling imports (from config import ..., import ingest) resolve
+                # against the module's own directory, as when run standalone
+                if self.directory not in sys.path:
+                    sys.path.insert(0, self.directory)
+                spec = importlib.util.spec_from_file_location(
+                    self.module_name, os.path.join(self.directory, 'app.py'))
+                module = importlib.util.module_from_spec(spec)
+                sys.modules[self.module_name] = module
+                spec.loader.exec_module(module)
+                app = module.app
+                # All three apps share the host; keep session cookies apart
+                if app.config.get('SESSION_COOKIE_PATH') is None:
+                    app.config['SESSION_COOKIE_PATH'] = self.prefix
+                self.app = app
+                self.state, self.error = 'ready', None
+            except Exception as e:
+                sys.modules.pop(self.module_name, None)
+                traceback.print_exc()
+                self.state, self.error, self.failed_at = 'failed', f'{type(e).__name__}: {e}', time.time()
+            self.load_seconds = round(time.perf_counter() - start, 3)
+            self.rss_delta_mb = round(rss_mb() - before, 1)
+            print(f"{self.name}: {self.state} in {self.load_seconds:.2f}s, {self.rss_delta_mb:+.1f} MB RSS")
+            return self.app is not None
+
+    def status(self):
+        return {
+            'prefix': self.prefix,
+            'state': self.state,
+            'load_seconds': self.load_seconds,
+            'rss_delta_mb': self.rss_delta_mb,
+            'error': self.error,
+        }
+
+    def __call__(self, environ, start_response):
+        # /fightfit -> /fightfit/, the pages use URLs relative to their root
+        if not environ.get('PATH_INFO'):
+            query = environ.get('QUERY_STRING')
+            location = environ.get('SCRIPT_NAME', '') + '/' + ('?' + query if query else '')
+            return redirect(location, 308)(environ, start_response)
+        if self.app is None and not self.load():
+            body = json.dumps({'error': f'{self.name} failed to load', 'detail': self.error})
+            response = Response(body, status=503, mimetype='application/json',
+                                headers={'Retry-After': str(RETRY_SECONDS)})
+            return response(environ, start_response)
+        return self.app(environ, start_response)
+
+def warm(modules):
+    # Background loading, in order, for modules that should not make their
+    # first visitor wait
+    def run():
+        for module in modules:
+            module.load()
+    thread = threading.Thread(target=run, name='gateway-warm', daemon=True)
+    thread.start()
+    return thread
+
+def create_app(warm_modules=None):
+    # WSGI application with every module mounted under its prefix.
+    # warm_modules: names to load in the background, or 'all'; defaults to
+    # the MMACRAFTAI_WARM environment variable (comma separated).
+    start, rss_start = time.perf_counter(), rss_mb()
+    modules = {name: LazyModule(name, prefix, os.path.join(ROOT, directory))
+               for name, prefix, directory, _ in MODULES}
+
+    gateway = Flask(__name__)
+    with open(LANDING_PAGE, encoding='utf-8') as f:
+        landing = f.read()
+    for name, prefix, _, standalone in MODULES:
+        landing = landing.replace(f'href="{standalone}"', f'href="{prefix}/"')
+
+    @gateway.route('/')
+    def index():
+        return landing
+
+    @gateway.route('/gateway/status')
+    def status():
+        return jsonify({
+            'gateway': {'startup_seconds': startup_seconds, 'startup_rss_mb': startup_rss, 'rss_mb': round(rss_mb(), 1)},
+            'modules': {name: module.status() for name, module in modules.items()},
+        })
+
+    application = DispatcherMiddleware(gateway, {m.prefix: m for m in modules.values()})
+
+    if warm_modules is None:
+        warm_modules = os.environ.get('MMACRAFTAI_WARM', '')
+    if isinstance(warm_modules, str):
+        warm_modules = list(modules) if warm_modules == 'all' else [n for n in warm_modules.split(',') if n]
+    unknown = [n for n in warm_modules if n not in modules]
+    if unknown:
+        raise ValueError(f"unknown module(s) {', '.join(unknown)}, expected {', '.join(modules)} or 'all'")
+
+    startup_seconds = round(time.perf_counter() - start, 3)
+    startup_rss = round(rss_mb(), 1)
+    print(f"Gateway ready in {startup_seconds * 1000:.0f} ms, {startup_rss:.1f} MB RSS "
+          f"(+{startup_rss - rss_start:.1f} MB), modules load on first request")
+    if warm_modules:
+        warm([modules[n] for n in warm_modules])
+    return application
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve all MMACRAFTAI modules from one process')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--warm', default=None, metavar='MODULES',
+                        help="load these modules in the background at startup: 'all' or e.g. fightiq,fightfit")
+    args = parser.parse_args()
+    run_simple(args.host, args.port, create_app(args.warm), threaded=True)
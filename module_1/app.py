@@ -1,12 +1,18 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response
+from functools import wraps
+import multiprocessing
+import threading
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import LabelEncoder
 import pickle
 import os
+import io
+import json
 import warnings 
+from plan_table import PlanTable, TABLE_PATH, META_PATH
+from artifacts import load_artifacts, save_artifacts, acquire_training_lock, release_training_lock, training_in_progress
+from inference import PackedForest
+from plan_index import PlanIndex, MAX_NEIGHBOURS
 warnings.filterwarnings("ignore")
 
 
@@ -14,10 +20,13 @@ warnings.filterwarnings("ignore")
 
 app = Flask(__name__)
 
+# Data files live next to this module, wherever the process was started
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
 # Load and preprocess the data
 def load_data():
     # Update the path to your CSV file
-    data = pd.read_csv("FightFitAI_final_plans_cleaned.csv")
+    data = pd.read_csv(os.path.join(BASE_DIR, "FightFitAI_final_plans_cleaned.csv"))
     df = pd.DataFrame(data)
     return df
 
@@ -27,6 +36,11 @@ def calculate_bmi(height, weight):
 
 # Train model function
 def train_model(df):
+    # sklearn is only needed to train, keep it out of the serving import path
+    from sklearn.model_selection import train_test_split
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.preprocessing import LabelEncoder
+
     # Encode categorical variables
     le_gender = LabelEncoder()
     le_experience = LabelEncoder()
@@ -53,9 +67,10 @@ def train_model(df):
 
 # Load or train model
 def get_model():
-    model_path = 'fightfit_model.pkl'
-    encoders_path = 'fightfit_encoders.pkl'
+    model_path = os.path.join(BASE_DIR, 'fightfit_model.pkl')
+    encoders_path = os.path.join(BASE_DIR, 'fightfit_encoders.pkl')
     
+    # Legacy pickles are converted to the artifact store rather than retrained
     if os.path.exists(model_path) and os.path.exists(encoders_path):
         with open(model_path, 'rb') as f:
             model = pickle.load(f)
@@ -65,24 +80,118 @@ def get_model():
     else:
         df = load_data()
         model, le_gender, le_experience, le_goal, le_injury = train_model(df)
-        with open(model_path, 'wb') as f:
-            pickle.dump(model, f)
-        with open(encoders_path, 'wb') as f:
-            pickle.dump((le_gender, le_experience, le_goal, le_injury), f)
     
     return model, le_gender, le_experience, le_goal, le_injury
 
-# Load model and encoders once at startup
-model, le_gender, le_experience, le_goal, le_injury = get_model()
+# Entry point of the background training process
+def build_artifacts():
+    lock = acquire_training_lock()
+    if lock is None:
+        app.logger.info("Another process is training the model, waiting for its artifacts")
+        return
+    try:
+        model, *encoders = get_model()
+        version = save_artifacts(model, encoders)
+        app.logger.info("Published model artifacts %s", version)
+    finally:
+        release_training_lock(lock)
+
+# ---------------- MODEL STATE ----------------
+# The model is loaded from the artifact store on demand. Until a version
+# exists, requests get a 503 while build_artifacts() runs in the background.
+model = le_gender = le_experience = le_goal = le_injury = None
+plan_table = None
+plan_index = None
+trainer = None
+training_error = None  # why the last background training failed, shown on the page
+model_lock = threading.Lock()
+
+def load_plan_table(digest):
+    # Optional compiled mode: serve plans from the precomputed grid table built by
+    # `python plan_table.py`, falling back to the live model outside the grid
+    if os.environ.get('FIGHTFIT_COMPILED') != '1':
+        return None
+    if not (os.path.exists(TABLE_PATH) and os.path.exists(META_PATH)):
+        app.logger.warning("%s not found, run `python plan_table.py`. Using live model.", TABLE_PATH)
+        return None
+    table = PlanTable.load()
+    if not table.matches(digest, le_experience, le_goal, le_injury):
+        app.logger.warning("Plan table was built for a different model. Using live model.")
+        return None
+    return table
+
+# Real plans returned alongside each prediction (FIGHTFIT_SIMILAR=0 turns it off)
+SIMILAR_PLANS = int(os.environ.get('FIGHTFIT_SIMILAR', '3'))
+
+def load_plan_index():
+    # Nearest-neighbour index over the plans in the dataset, see plan_index.py
+    if SIMILAR_PLANS <= 0:
+        return None
+    return PlanIndex(load_data(), le_experience, le_goal, le_injury)
+
+def ensure_model():
+    global model, le_gender, le_experience, le_goal, le_injury, plan_table, plan_index, trainer, training_error
+    if model is not None:
+        return True
+    with model_lock:
+        if model is not None:
+            return True
+        loaded = load_artifacts()
+        if loaded is not None:
+            forest, (le_gender, le_experience, le_goal, le_injury) = loaded
+            plan_table = load_plan_table(forest.digest)
+            plan_index = load_plan_index()
+            model = PackedForest(forest)
+            return True
+        # Only the serving process starts a trainer, never a spawned child, and
+        # at most one at a time: while another worker holds the training lock
+        # a new trainer would only find the lock taken and exit, so wait for
+        # that worker's artifacts instead
+        if multiprocessing.parent_process() is None and (trainer is None or not trainer.is_alive()):
+            if trainer is not None and trainer.exitcode:
+                training_error = f"training exited with code {trainer.exitcode}, retrying"
+                trainer = None
+            if not training_in_progress():
+                trainer = multiprocessing.Process(target=build_artifacts, daemon=True)
+                trainer.start()
+        return False
+
+def requires_model(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ensure_model():
+            response = jsonify({'error': 'Model is training, please retry shortly'})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        return view(*args, **kwargs)
+    return wrapper
+
+def predict_matrix(input_data):
+    if plan_table is None:
+        return model.predict(input_data)
+    predictions, hit = plan_table.lookup(input_data)
+    if not hit.all():
+        predictions[~hit] = model.predict(input_data[~hit])
+    return predictions
+
+# Start loading (or training) as soon as the app is imported
+ensure_model()
 
 @app.route('/')
 def index():
-    return render_template('index.html', 
+    # Browsers get the page either way: with a banner (and a refresh) while
+    # the model loads, rather than the API routes' JSON 503
+    if not ensure_model():
+        return render_template('index.html', model_status='error' if training_error else 'loading',
+                               model_error=training_error,
+                               experience_levels=[], goals=[], injury_history=[]), 503, {'Retry-After': '5'}
+    return render_template('index.html', model_status='ready',
                           experience_levels=list(le_experience.classes_),
                           goals=list(le_goal.classes_),
                           injury_history=list(le_injury.classes_))
 
 @app.route('/predict', methods=['POST'])
+@requires_model
 def predict():
     # Get form data
     data = request.get_json()
@@ -106,10 +215,27 @@ def predict():
     input_data = np.array([[age, gender_encoded, bmi, experience_encoded, goal_encoded, injury_encoded]])
     
     # Make prediction
-    prediction = model.predict(input_data)[0]
+    prediction = predict_matrix(input_data)[0]
     
-    # Format results
-    results = {
+    result = format_plan(bmi, prediction)
+    k = similar_count(data.get('similar'), SIMILAR_PLANS)
+    if k:
+        result['similar_plans'] = plan_index.similar(input_data, k)[0]
+    return jsonify(result)
+
+# Number of real plans to return: the request's value, capped, or the default
+def similar_count(value, default):
+    if plan_index is None:
+        return 0
+    try:
+        k = default if value is None else int(value)
+    except (TypeError, ValueError):
+        k = default
+    return max(0, min(k, MAX_NEIGHBOURS))
+
+# Shape one model output row into the response payload
+def format_plan(bmi, prediction):
+    return {
         'bmi': round(bmi, 1),
         'cardio': round(prediction[0]),
         'skill': round(prediction[1]),
@@ -118,8 +244,108 @@ def predict():
         'recovery': round(prediction[4]),
         'duration': round(prediction[5])
     }
-    
-    return jsonify(results)
+
+# ---------------- BATCH PREDICTION ----------------
+BATCH_FIELDS = ['age', 'height', 'weight', 'experience', 'goal', 'injury_history']
+
+def read_batch():
+    # CSV upload (multipart form) or raw CSV body
+    upload = request.files.get('file')
+    if upload is not None:
+        return pd.read_csv(io.TextIOWrapper(upload.stream, encoding='utf-8'), dtype=str)
+    if request.mimetype == 'text/csv':
+        return pd.read_csv(io.StringIO(request.get_data(as_text=True)), dtype=str)
+
+    # JSON array of athletes, or {"athletes": [...]}
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('athletes')
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        return None
+    return pd.DataFrame(data, dtype=object)
+
+def encode_column(encoder, values, errors, field):
+    # Flag labels the encoder has never seen, then encode the rest in one call
+    known = np.isin(values, encoder.classes_)
+    for i in np.flatnonzero(~known & (errors == '')):
+        errors[i] = f"unknown {field} '{values[i]}'"
+    encoded = np.zeros(len(values), dtype=int)
+    if known.any():
+        encoded[known] = encoder.transform(values[known])
+    return encoded
+
+def predict_frame(df):
+    df = df.rename(columns=lambda c: str(c).strip().lower())
+    n = len(df)
+    errors = np.full(n, '', dtype=object)
+
+    for field in BATCH_FIELDS:
+        if field not in df.columns:
+            df[field] = None
+    missing = df[BATCH_FIELDS].isna()
+    for i, row in enumerate(missing.to_numpy()):
+        if row.any():
+            errors[i] = 'missing ' + ', '.join(f for f, m in zip(BATCH_FIELDS, row) if m)
+
+    # Numeric columns
+    numeric = {}
+    for field in ['age', 'height', 'weight']:
+        values = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=float)
+        bad = ~np.isfinite(values) | (values <= 0)
+        for i in np.flatnonzero(bad & (errors == '')):
+            errors[i] = f"invalid {field} '{df[field].iloc[i]}'"
+        numeric[field] = np.trunc(np.where(bad, 1, values))
+
+    bmi = calculate_bmi(numeric['height'], numeric['weight'])
+
+    # Categorical columns, one vectorized transform each
+    experience = df['experience'].astype(str).str.strip().to_numpy()
+    goal = df['goal'].astype(str).str.strip().to_numpy()
+    injury = df['injury_history'].astype(str).str.strip().to_numpy()
+    experience_encoded = encode_column(le_experience, experience, errors, 'experience')
+    goal_encoded = encode_column(le_goal, goal, errors, 'goal')
+    injury_encoded = encode_column(le_injury, injury, errors, 'injury_history')
+    gender_encoded = le_gender.transform(['Male'])[0]  # Default to Male
+
+    valid = errors == ''
+    input_data = np.column_stack([
+        numeric['age'], np.full(n, gender_encoded), bmi,
+        experience_encoded, goal_encoded, injury_encoded
+    ])[valid]
+
+    # One model call for the whole batch
+    predictions = predict_matrix(input_data) if valid.any() else np.empty((0, 6))
+    return bmi, input_data, predictions, valid, errors
+
+@app.route('/predict_batch', methods=['POST'])
+@requires_model
+def predict_batch():
+    try:
+        df = read_batch()
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        return jsonify({'error': f'could not parse CSV: {e}'}), 400
+    if df is None:
+        return jsonify({'error': 'expected a JSON array of athletes or a CSV upload'}), 400
+
+    bmi, input_data, predictions, valid, errors = predict_frame(df)
+    # Similar real plans only on request (?similar=k), one index query for the batch
+    k = similar_count(request.args.get('similar'), 0)
+    similar = plan_index.similar(input_data, k) if k else None
+
+    def generate():
+        # Results are streamed back as NDJSON, one line per input row
+        n = 0
+        for i in range(len(errors)):
+            if valid[i]:
+                line = {'row': i, **format_plan(float(bmi[i]), predictions[n])}
+                if similar is not None:
+                    line['similar_plans'] = similar[n]
+                n += 1
+            else:
+                line = {'row': i, 'error': errors[i]}
+            yield json.dumps(line) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
 
 if __name__ == '__main__':
     app.run(host="127.0.0.1", port=8080, debug=True)
\ No newline at end of file
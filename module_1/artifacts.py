@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+
+# Versioned on-disk store for the FightFit model.
+#
+#   artifacts/
+#     LATEST              name of the current version directory
+#     v1/
+#       manifest.json     format, version, shapes, content digest of the arrays
+#       encoders.json     label vocabularies, in LabelEncoder class order
+#       feature.npy       \
+#       threshold.npy      |  every tree's nodes concatenated into flat arrays,
+#       children_left.npy  |  child indices are global (-1 marks a leaf)
+#       children_right.npy |
+#       value.npy          |  leaf outputs, (n_nodes, n_outputs)
+#       roots.npy         /   index of each tree's root node
+#       packed_*.npy          the same nodes laid out for PackedForest, see
+#                             inference.pack_forest
+#
+# The .npy files are memory-mapped on load, so any number of workers share one
+# copy of the forest through the page cache instead of each unpickling its own.
+# That includes the packed arrays the serving engine walks: they are written
+# here once rather than derived (and copied) in every process.
+
+ARTIFACT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'artifacts')
+FORMAT_VERSION = 1
+ARRAYS = ['feature', 'threshold', 'children_left', 'children_right', 'value', 'roots']
+PACKED_ARRAYS = ['packed_feature', 'packed_threshold', 'packed_left', 'packed_right']
+ENCODER_NAMES = ['gender', 'experience', 'goal', 'injury_history']
+
+# A training lock older than this is assumed to belong to a crashed trainer
+STALE_LOCK_SECONDS = 600
+
+class Vocabulary:
+    # Drop-in for a fitted LabelEncoder at serving time
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes, dtype=object)
+        self.index = {c: i for i, c in enumerate(classes)}
+
+    def transform(self, values):
+        try:
+            return np.array([self.index[v] for v in values], dtype=int)
+        except KeyError as e:
+            raise ValueError(f"y contains previously unseen labels: {e.args[0]!r}")
+
+def forest_digest(arrays):
+    # sha256 over the forest arrays, dtype and shape included. Version numbers
+    # restart when artifacts/ is rebuilt; this identifies the trees themselves.
+    h = hashlib.sha256()
+    for name in ARRAYS:
+        a = np.ascontiguousarray(arrays[name])
+        h.update(f"{name}:{a.dtype.str}:{a.shape};".encode())
+        h.update(a.data)
+    return h.hexdigest()
+
+class FlatForest:
+    def __init__(self, arrays, manifest):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.manifest = manifest
+        self.version = manifest['version']
+        self.n_outputs = manifest['n_outputs']
+        # Stored by save_artifacts; older versions are hashed on load
+        self.digest = manifest.get('digest') or forest_digest(arrays)
+        # PACKED_ARRAYS plus max_depth when stored with the artifacts
+        self.packed = None
+
+    @classmethod
+    def from_sklearn(cls, model):
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        offset = 0
+        for est in model.estimators_:
+            tree = est.tree_
+            leaf = tree.children_left == -1
+            roots.append(offset)
+            feature.append(tree.feature)
+            threshold.append(tree.threshold)
+            left.append(np.where(leaf, -1, tree.children_left + offset))
+            right.append(np.where(leaf, -1, tree.children_right + offset))
+            value.append(tree.value.reshape(tree.node_count, -1))
+            offset += tree.node_count
+
+        arrays = {
+            'feature': np.concatenate(feature).astype(np.int32),
+            'threshold': np.concatenate(threshold).astype(np.float64),
+            'children_left': np.concatenate(left).astype(np.int32),
+            'children_right': np.concatenate(right).astype(np.int32),
+            'value': np.concatenate(value).astype(np.float64),
+            'roots': np.array(roots, dtype=np.int32),
+        }
+        manifest = {
+            'format': FORMAT_VERSION,
+            'version': None,
+            'n_trees': len(roots),
+            'n_nodes': offset,
+            'n_features': int(model.n_features_in_),
+            'n_outputs': int(model.n_outputs_),
+        }
+        manifest['digest'] = forest_digest(arrays)
+        return cls(arrays, manifest)
+
+def _version_dirs(root):
+    if not os.path.isdir(root):
+        return []
+    return [d for d in os.listdir(root) if d.startswith('v') and d[1:].isdigit()]
+
+def latest_version(root=ARTIFACT_ROOT):
+    try:
+        with open(os.path.join(root, 'LATEST')) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def save_artifacts(model, encoders, extra=None, root=ARTIFACT_ROOT):
+    # Write into a scratch directory first and publish it with renames, so a
+    # reader never sees a half-written version
+    os.makedirs(root, exist_ok=True)
+    version = max([int(d[1:]) for d in _version_dirs(root)], default=0) + 1
+    scratch = os.path.join(root, f'.tmp-{os.getpid()}-{version}')
+    os.makedirs(scratch)
+
+    from inference import pack_forest
+
+    forest = model if isinstance(model, FlatForest) else FlatForest.from_sklearn(model)
+    for name in ARRAYS:
+        np.save(os.path.join(scratch, name + '.npy'), getattr(forest, name))
+    packed = pack_forest(forest)
+    for name in PACKED_ARRAYS:
+        np.save(os.path.join(scratch, name + '.npy'), packed[name])
+    vocab = {name: [str(c) for c in enc.classes_] for name, enc in zip(ENCODER_NAMES, encoders)}
+    with open(os.path.join(scratch, 'encoders.json'), 'w') as f:
+        json.dump(vocab, f, indent=2)
+    manifest = dict(forest.manifest, version=version, created=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    packed={'max_depth': packed['max_depth']}, **(extra or {}))
+    with open(os.path.join(scratch, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    name = f'v{version}'
+    os.rename(scratch, os.path.join(root, name))
+    pointer = os.path.join(root, f'.LATEST-{os.getpid()}')
+    with open(pointer, 'w') as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(root, 'LATEST'))
+    return name
+
+def load_artifacts(root=ARTIFACT_ROOT, mmap_mode='r'):
+    # Returns (forest, encoders) for the latest version, or None if there is none yet
+    name = latest_version(root)
+    if name is None:
+        return None
+    path = os.path.join(root, name)
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT_VERSION:
+        raise ValueError(f"{path} has artifact format {manifest.get('format')}, expected {FORMAT_VERSION}")
+    arrays = {n: np.load(os.path.join(path, n + '.npy'), mmap_mode=mmap_mode) for n in ARRAYS}
+    with open(os.path.join(path, 'encoders.json')) as f:
+        vocab = json.load(f)
+    encoders = tuple(Vocabulary(vocab[n]) for n in ENCODER_NAMES)
+    forest = FlatForest(arrays, manifest)
+    if manifest.get('packed'):
+        # Older versions have none; PackedForest then derives them in memory
+        forest.packed = {n: np.load(os.path.join(path, n + '.npy'), mmap_mode=mmap_mode) for n in PACKED_ARRAYS}
+        forest.packed['max_depth'] = manifest['packed']['max_depth']
+    return forest, encoders
+
+# ---------------- TRAINING LOCK ----------------
+# Several workers may find the store empty at once; only one of them trains.
+def _lock_path(root):
+    return os.path.join(root, '.training.lock')
+
+def training_in_progress(root=ARTIFACT_ROOT):
+    # Some process holds a training lock that is not stale yet
+    try:
+        return time.time() - os.path.getmtime(_lock_path(root)) <= STALE_LOCK_SECONDS
+    except OSError:
+        return False
+
+def acquire_training_lock(root=ARTIFACT_ROOT):
+    os.makedirs(root, exist_ok=True)
+    lock = _lock_path(root)
+    try:
+        if time.time() - os.path.getmtime(lock) > STALE_LOCK_SECONDS:
+            os.remove(lock)
+    except OSError:
+        pass
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return None
+    os.write(fd, str(os.getpid()).encode())
+    os.close(fd)
+    return lock
+
+def release_training_lock(lock):
+    try:
+        os.remove(lock)
+    except OSError:
+        pass
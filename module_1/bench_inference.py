@@ -0,0 +1,57 @@
+import argparse
+import time
+import numpy as np
+from inference import PackedForest
+
+# Microbenchmark: stock RandomForestRegressor.predict vs the packed engine.
+#   python bench_inference.py [--iterations 500] [--batch 1 100 10000]
+
+def sample_inputs(encoders, n, rng):
+    le_gender, le_experience, le_goal, le_injury = encoders
+    height = rng.integers(150, 201, n)
+    weight = rng.integers(50, 121, n)
+    return np.column_stack([
+        rng.integers(18, 51, n),
+        np.full(n, le_gender.transform(['Male'])[0]),
+        weight / ((height / 100) ** 2),
+        rng.integers(0, len(le_experience.classes_), n),
+        rng.integers(0, len(le_goal.classes_), n),
+        rng.integers(0, len(le_injury.classes_), n),
+    ]).astype(np.float64)
+
+def latencies(predict, X, iterations):
+    predict(X)  # warm up
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        predict(X)
+        samples.append(time.perf_counter() - start)
+    return np.percentile(np.array(samples) * 1000, [50, 99])
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark FightFit inference engines')
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--batch', type=int, nargs='+', default=[1, 100, 10000])
+    args = parser.parse_args()
+
+    from app import get_model
+    model, *encoders = get_model()
+    packed = PackedForest.from_sklearn(model)
+    rng = np.random.default_rng(42)
+
+    X = sample_inputs(encoders, 20000, rng)
+    diff = np.abs(packed.predict(X) - model.predict(X)).max()
+    print(f"max |packed - sklearn| over {len(X)} rows: {diff:.2e}")
+    assert np.allclose(packed.predict(X), model.predict(X), rtol=1e-9, atol=1e-9)
+
+    print(f"{'batch':>7} {'engine':>8} {'p50 ms':>10} {'p99 ms':>10}")
+    for batch in args.batch:
+        X = sample_inputs(encoders, batch, rng)
+        # Keep the total work per configuration roughly constant
+        iterations = max(10, args.iterations // max(1, batch // 100))
+        for name, predict in [('sklearn', model.predict), ('packed', packed.predict)]:
+            p50, p99 = latencies(predict, X, iterations)
+            print(f"{batch:>7} {name:>8} {p50:>10.3f} {p99:>10.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import numpy as np
+from artifacts import FlatForest, PACKED_ARRAYS
+
+# Lightweight tree-ensemble inference for the FightFit forest.
+#
+# All trees live in one packed node array (one contiguous column per field).
+# Leaves are rewritten to point at themselves with an infinite threshold, so
+# every row can take exactly max_depth steps through every tree without any
+# masking: each step gathers (feature, threshold, left, right) for an
+# (n_rows, n_trees) matrix of node ids. There is no input validation or joblib
+# dispatch, which is where most of sklearn's per-call time goes for the small
+# batches /predict sends. sklearn's compiled traversal is faster from about a
+# thousand rows (see bench_inference.py), but the serving process does not
+# import sklearn at all, so every batch size goes through this engine; large
+# rosters are better served from the plan table (FIGHTFIT_COMPILED=1).
+#
+# The packed arrays are stored with the model artifacts (see artifacts.py) and
+# memory-mapped like the rest, so workers share them instead of each building
+# private copies.
+
+# Rows evaluated per pass, keeps the (rows, trees) node matrix in cache
+CHUNK_ROWS = 256
+
+def floor_float32(values):
+    # sklearn compares float32 inputs against float64 thresholds. For a float32 x,
+    # x <= t holds exactly when x <= the largest float32 not above t, so the
+    # thresholds can be stored as float32 without changing any decision.
+    t32 = values.astype(np.float32)
+    over = t32.astype(np.float64) > values
+    t32[over] = np.nextafter(t32[over], np.float32(-np.inf))
+    return t32
+
+def tree_depth(roots, left, right):
+    # Deepest leaf over all trees, counted in edges from the root
+    depth = 0
+    frontier = np.asarray(roots)
+    while len(frontier):
+        inner = frontier[left[frontier] != -1]
+        frontier = np.concatenate([left[inner], right[inner]])
+        depth += 1
+    return depth - 1
+
+def pack_forest(forest):
+    # The arrays PackedForest walks (PACKED_ARRAYS), derived from a FlatForest,
+    # plus the depth every row is walked to
+    n = len(forest.feature)
+    ids = np.arange(n, dtype=np.int32)
+    left = np.asarray(forest.children_left)
+    right = np.asarray(forest.children_right)
+    leaf = left == -1
+    return {
+        'packed_feature': np.where(leaf, 0, forest.feature).astype(np.int32),
+        'packed_threshold': np.where(leaf, np.float32(np.inf), floor_float32(np.asarray(forest.threshold))),
+        'packed_left': np.where(leaf, ids, left).astype(np.int32),
+        'packed_right': np.where(leaf, ids, right).astype(np.int32),
+        'max_depth': tree_depth(forest.roots, left, right),
+    }
+
+class PackedForest:
+    def __init__(self, forest):
+        packed = forest.packed if getattr(forest, 'packed', None) is not None else pack_forest(forest)
+        self.feature = packed['packed_feature']
+        self.threshold = packed['packed_threshold']
+        self.left = packed['packed_left']
+        self.right = packed['packed_right']
+        self.max_depth = packed['max_depth']
+
+        # Views, not copies, of memory-mapped artifacts (already in these dtypes)
+        self.value = np.ascontiguousarray(forest.value)
+        self.roots = np.asarray(forest.roots, dtype=np.int32)
+        self.n_outputs = forest.n_outputs
+        self.version = forest.version
+        self.digest = forest.digest
+
+    @classmethod
+    def from_sklearn(cls, model):
+        return cls(FlatForest.from_sklearn(model))
+
+    def apply(self, X):
+        # Leaf node id reached in every tree, shape (n_rows, n_trees)
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if len(X) > CHUNK_ROWS:
+            return np.concatenate([self.apply(X[i:i + CHUNK_ROWS]) for i in range(0, len(X), CHUNK_ROWS)])
+        flat = X.ravel()
+        base = (np.arange(len(X), dtype=np.int32) * X.shape[1])[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            x = flat.take(base + self.feature.take(node))
+            node = np.where(x <= self.threshold.take(node), self.left.take(node), self.right.take(node))
+        return node
+
+    def predict(self, X):
+        return self.value[self.apply(X)].mean(axis=1)
@@ -0,0 +1,129 @@
+import sys
+import time
+import numpy as np
+from plan_table import AGE, BMI, EXPERIENCE, GOAL, INJURY
+
+# Nearest-neighbour retrieval of real plans from the FightFit dataset.
+#
+# Every plan in the library is a point: age and BMI standardised over the
+# library, plus one-hot experience, goal and injury history scaled by
+# CATEGORY_WEIGHT. A category mismatch then costs as much as
+# CATEGORY_WEIGHT * sqrt(2) standard deviations of age or BMI, so the
+# neighbours share the athlete's categories whenever the library has enough
+# of them. Gender is not part of the distance since the form does not ask for
+# it; each returned plan still reports its own.
+#
+# The points go into a KD-tree once at startup, so a query costs O(log n)
+# rather than a scan of the library, and a batch of athletes is one call.
+
+CATEGORY_WEIGHT = 2.0
+PLAN_COLUMNS = ['Cardio_Endurance', 'Skill_Drills', 'Strength_Conditioning',
+                'Agility_Mobility', 'Recovery', 'Goal_Duration_Months']
+MAX_NEIGHBOURS = 50
+
+class PlanIndex:
+    def __init__(self, df, le_experience, le_goal, le_injury):
+        # scipy comes with scikit-learn; only the index needs it
+        from scipy.spatial import cKDTree
+
+        self.vocab = [le_experience, le_goal, le_injury]
+        age = df['Age'].to_numpy(dtype=np.float64)
+        bmi = df['BMI'].to_numpy(dtype=np.float64)
+        self.mean = np.array([age.mean(), bmi.mean()])
+        self.std = np.array([age.std() or 1.0, bmi.std() or 1.0])
+
+        # Plan rows as returned to clients
+        self.age = df['Age'].to_numpy(dtype=int)
+        self.gender = df['Gender'].astype(str).to_numpy()
+        self.bmi = bmi
+        self.experience = df['Experience'].astype(str).to_numpy()
+        self.goal = df['Goal'].astype(str).to_numpy()
+        self.injury = df['Injury_History'].astype(str).to_numpy()
+        self.plans = df[PLAN_COLUMNS].to_numpy(dtype=int)
+
+        X = np.column_stack([
+            age, np.zeros(len(df)), bmi,
+            le_experience.transform(self.experience),
+            le_goal.transform(self.goal),
+            le_injury.transform(self.injury),
+        ])
+        self.tree = cKDTree(self.points(X), leafsize=16)
+
+    def __len__(self):
+        return len(self.plans)
+
+    def points(self, X):
+        # Model-layout rows (see plan_table.py) -> index space
+        X = np.asarray(X, dtype=np.float64)
+        numeric = (X[:, [AGE, BMI]] - self.mean) / self.std
+        onehot = [np.eye(len(enc.classes_))[X[:, col].astype(int)] * CATEGORY_WEIGHT
+                  for enc, col in zip(self.vocab, [EXPERIENCE, GOAL, INJURY])]
+        return np.column_stack([numeric] + onehot)
+
+    def query(self, X, k=3):
+        # (distances, rows), both (n_queries, k), nearest first
+        k = min(k, len(self))
+        distances, rows = self.tree.query(self.points(X), k=k, workers=-1 if len(X) > 1024 else 1)
+        return distances.reshape(len(X), k), rows.reshape(len(X), k)
+
+    def plan(self, row, distance):
+        cardio, skill, strength, agility, recovery, duration = self.plans[row].tolist()
+        return {
+            'plan_id': int(row),
+            'distance': round(float(distance), 3),
+            'age': int(self.age[row]),
+            'gender': self.gender[row],
+            'bmi': round(float(self.bmi[row]), 1),
+            'experience': self.experience[row],
+            'goal': self.goal[row],
+            'injury_history': self.injury[row],
+            'cardio': cardio,
+            'skill': skill,
+            'strength': strength,
+            'agility': agility,
+            'recovery': recovery,
+            'duration': duration,
+        }
+
+    def similar(self, X, k=3):
+        # The k nearest real plans for every row of X
+        if k <= 0 or not len(X):
+            return [[] for _ in range(len(X))]
+        distances, rows = self.query(X, k)
+        return [[self.plan(r, d) for r, d in zip(row, dist)] for row, dist in zip(rows, distances)]
+
+if __name__ == '__main__':
+    # Query latency as the library grows, with jittered copies of the real
+    # plans standing in for a larger dataset: python plan_index.py
+    import pandas as pd
+    import app
+
+    while not app.ensure_model():
+        time.sleep(1)
+    base = app.load_data()
+    rng = np.random.default_rng(0)
+    queries = np.column_stack([
+        rng.integers(18, 51, 1000), np.zeros(1000), rng.uniform(18, 35, 1000),
+        rng.integers(0, len(app.le_experience.classes_), 1000),
+        rng.integers(0, len(app.le_goal.classes_), 1000),
+        rng.integers(0, len(app.le_injury.classes_), 1000),
+    ])
+    for copies in [1, 10, 100, 300]:
+        df = pd.concat([base] * copies, ignore_index=True)
+        df['Age'] = df['Age'] + rng.integers(-2, 3, len(df)) * (copies > 1)
+        df['BMI'] = df['BMI'] + rng.normal(0, 0.5, len(df)) * (copies > 1)
+
+        start = time.perf_counter()
+        index = PlanIndex(df, app.le_experience, app.le_goal, app.le_injury)
+        built = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for row in queries[:200]:
+            index.similar(row[None, :], 3)
+        single = (time.perf_counter() - start) / 200
+
+        start = time.perf_counter()
+        index.query(queries, 3)
+        batch = time.perf_counter() - start
+        print(f"{len(index):>8} plans: build {built * 1000:7.1f} ms, one query {single * 1e6:6.1f} us, "
+              f"{len(queries)} queries {batch * 1000:6.1f} ms", file=sys.stderr)
@@ -0,0 +1,151 @@
+import json
+import os
+import sys
+import time
+import numpy as np
+
+# Precomputed FightFit plans for the finite input grid.
+#
+# The regressor only sees (age, gender, bmi, experience, goal, injury). Gender is
+# always 'Male', the categoricals have a handful of values and age is an integer,
+# so the only continuous input is BMI. The forest can only tell two BMIs apart if
+# some split threshold lies between them, so BMI is bucketed by the sorted BMI
+# thresholds of all trees and every bucket gets a single prediction. Lookups in
+# the table return exactly what model.predict would have returned (rounded).
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fightfit_plans.npy')
+META_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fightfit_plans.json')
+
+# Realistic grid, matches the sliders in templates/index.html
+AGE_RANGE = (18, 50)
+HEIGHT_RANGE = (150, 200)
+WEIGHT_RANGE = (50, 120)
+
+AGE, GENDER, BMI, EXPERIENCE, GOAL, INJURY = range(6)
+
+def split_thresholds(forest, feature):
+    return np.unique(forest.threshold[forest.feature == feature])
+
+def bmi_bucket(thresholds, bmi):
+    # sklearn casts inputs to float32 and sends x <= threshold left, so bucket k
+    # holds the BMIs in (thresholds[k-1], thresholds[k]]
+    bmi32 = np.asarray(bmi, dtype=np.float32).astype(np.float64)
+    return np.searchsorted(thresholds, bmi32, side='left')
+
+def bucket_representatives(thresholds, lo, hi):
+    # A float32 value inside each bucket: the largest float32 <= thresholds[k],
+    # and just above the last threshold for the open-ended top bucket
+    reps = []
+    for k in range(lo, hi + 1):
+        if k < len(thresholds):
+            r = np.float32(thresholds[k])
+            if r > thresholds[k]:
+                r = np.nextafter(r, np.float32(-np.inf))
+        else:
+            r = np.nextafter(np.float32(thresholds[-1]), np.float32(np.inf))
+        reps.append(r)
+    return np.array(reps, dtype=np.float64)
+
+def build_table(model, le_gender, le_experience, le_goal, le_injury):
+    thresholds = split_thresholds(model, BMI)
+
+    bmi_lo = WEIGHT_RANGE[0] / (HEIGHT_RANGE[1] / 100) ** 2
+    bmi_hi = WEIGHT_RANGE[1] / (HEIGHT_RANGE[0] / 100) ** 2
+    bucket_lo, bucket_hi = bmi_bucket(thresholds, [bmi_lo, bmi_hi])
+
+    ages = np.arange(AGE_RANGE[0], AGE_RANGE[1] + 1)
+    bmis = bucket_representatives(thresholds, bucket_lo, bucket_hi)
+    n_exp, n_goal, n_injury = len(le_experience.classes_), len(le_goal.classes_), len(le_injury.classes_)
+    gender_encoded = le_gender.transform(['Male'])[0]
+
+    # Enumerate the whole grid in C order of the table axes
+    grid = np.meshgrid(ages, bmis, np.arange(n_exp), np.arange(n_goal), np.arange(n_injury), indexing='ij')
+    X = np.column_stack([
+        grid[0].ravel(), np.full(grid[0].size, gender_encoded), grid[1].ravel(),
+        grid[2].ravel(), grid[3].ravel(), grid[4].ravel()
+    ])
+    predictions = np.round(model.predict(X))
+    dtype = np.uint8 if predictions.max() <= np.iinfo(np.uint8).max else np.uint16
+    table = predictions.astype(dtype).reshape(len(ages), len(bmis), n_exp, n_goal, n_injury, -1)
+
+    meta = {
+        'model_version': model.version,
+        'model_digest': model.digest,
+        'age_range': [int(ages[0]), int(ages[-1])],
+        'bmi_range': [bmi_lo, bmi_hi],
+        'bucket_range': [int(bucket_lo), int(bucket_hi)],
+        'bmi_thresholds': thresholds.tolist(),
+        'gender_encoded': int(gender_encoded),
+        'experience': list(le_experience.classes_),
+        'goal': list(le_goal.classes_),
+        'injury_history': list(le_injury.classes_),
+    }
+    return table, meta
+
+def save_table(table, meta, table_path=TABLE_PATH, meta_path=META_PATH):
+    np.save(table_path, table)
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+
+class PlanTable:
+    def __init__(self, table, meta):
+        self.table = table
+        self.age_min, self.age_max = meta['age_range']
+        self.bmi_min, self.bmi_max = meta['bmi_range']
+        self.bucket_lo, self.bucket_hi = meta['bucket_range']
+        self.thresholds = np.asarray(meta['bmi_thresholds'], dtype=np.float64)
+        self.gender_encoded = meta['gender_encoded']
+        self.meta = meta
+
+    @classmethod
+    def load(cls, table_path=TABLE_PATH, meta_path=META_PATH):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        # Memory-mapped so every worker shares the same pages
+        return cls(np.load(table_path, mmap_mode='r'), meta)
+
+    def matches(self, digest, le_experience, le_goal, le_injury):
+        # A table built for another model would silently return wrong plans.
+        # Keyed on the forest's content digest: artifact versions restart at v1
+        # when artifacts/ is rebuilt, so a version number alone proves nothing.
+        return (self.meta.get('model_digest') == digest and
+                self.meta['experience'] == list(le_experience.classes_) and
+                self.meta['goal'] == list(le_goal.classes_) and
+                self.meta['injury_history'] == list(le_injury.classes_))
+
+    def lookup(self, X):
+        # X has the model's column layout; returns (predictions, hit mask).
+        # Rows outside the grid are left as NaN for the caller to fill.
+        X = np.asarray(X, dtype=np.float64)
+        age = X[:, AGE]
+        bmi = X[:, BMI]
+        hit = ((age >= self.age_min) & (age <= self.age_max) & (age == np.floor(age)) &
+               (bmi >= self.bmi_min) & (bmi <= self.bmi_max) &
+               (X[:, GENDER] == self.gender_encoded))
+
+        out = np.full((len(X), self.table.shape[-1]), np.nan)
+        if hit.any():
+            rows = X[hit]
+            out[hit] = self.table[
+                rows[:, AGE].astype(int) - self.age_min,
+                bmi_bucket(self.thresholds, rows[:, BMI]) - self.bucket_lo,
+                rows[:, EXPERIENCE].astype(int),
+                rows[:, GOAL].astype(int),
+                rows[:, INJURY].astype(int),
+            ]
+        return out, hit
+
+if __name__ == '__main__':
+    # Build the table from the latest model artifacts: python plan_table.py
+    import app
+
+    while not app.ensure_model():
+        time.sleep(1)
+    model, le_gender, le_experience, le_goal, le_injury = (
+        app.model, app.le_gender, app.le_experience, app.le_goal, app.le_injury)
+
+    start = time.perf_counter()
+    table, meta = build_table(model, le_gender, le_experience, le_goal, le_injury)
+    save_table(table, meta)
+    print(f"Built {TABLE_PATH}: shape {table.shape}, {table.nbytes / 1e6:.1f} MB, "
+          f"{time.perf_counter() - start:.1f}s", file=sys.stderr)
@@ -80,7 +80,7 @@ document.addEventListener('DOMContentLoaded', function() {
         };
         
         // Send AJAX request
-        fetch('/predict', {
+        fetch('predict', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -0,0 +1,150 @@
+import os
+import time
+import cv2
+import numpy as np
+
+# ---------------- ADAPTIVE QUALITY ----------------
+# Keeps pose inference inside a CPU budget on small machines.
+#
+# The controller trades work for quality along two axes: the width frames are
+# downscaled to before inference, and how often inference runs while the
+# athlete is standing still (the last pose is reused in between). As soon as
+# the wrists move faster than `motion_threshold` it goes back to inferring
+# every frame, so punches are never scored off a stale pose. Frames that would
+# be skipped are first checked by a WristWatch, so a punch starting between
+# two inferred frames is caught on the frame it starts, not up to max_skip
+# frames later.
+#
+# Once per `adjust_every` seconds it compares the measured inference cost per
+# frame with the budget, cpu_budget cores at target_fps frames per second, and
+# steps one level: first the skip interval (only used while static), then the
+# resolution.
+
+def select_model_complexity(setting='auto', cpus=None):
+    # MediaPipe Pose model complexity; 'auto' picks the light model on
+    # machines with two cores or fewer
+    if setting != 'auto':
+        return int(setting)
+    cpus = cpus or os.cpu_count() or 1
+    return 0 if cpus <= 2 else 1
+
+class AdaptiveController:
+    def __init__(self, target_fps, cpu_budget=1.0, widths=(960, 640, 480, 320), max_skip=4,
+                 motion_threshold=0.01, adjust_every=1.0, still_frames=5):
+        self.budget = cpu_budget / target_fps  # inference seconds per frame
+        self.widths = list(widths)
+        self.max_skip = max_skip
+        self.motion_threshold = motion_threshold
+        self.adjust_every = adjust_every
+        self.still_frames = still_frames
+        self.level = 0        # index into widths
+        self.skip = 1         # infer every `skip` frames while static
+        self.still = 0        # inferred frames in a row below the motion threshold
+        self.since_infer = 0
+        self.cost = None      # moving average of inference seconds
+        self.frames = 0
+        self.inferred = 0
+        self.last_adjust = time.time()
+        self.window_frames = 0
+        self.window_cost = 0.0
+
+    def moving(self):
+        return self.still < self.still_frames
+
+    def should_infer(self, moved=None):
+        # Called once per frame. `moved` is checked only for a frame that would
+        # otherwise be skipped: () -> True if the wrists visibly moved.
+        self.frames += 1
+        self.window_frames += 1
+        self.since_infer += 1
+        if self.moving() or self.since_infer >= self.skip:
+            self.since_infer = 0
+            return True
+        if moved is not None and moved():
+            self.still = 0  # moving again, infer every frame from here
+            self.since_infer = 0
+            return True
+        return False
+
+    def resize(self, frame):
+        width = self.widths[self.level]
+        h, w = frame.shape[:2]
+        if w <= width:
+            return frame
+        return cv2.resize(frame, (width, round(h * width / w)), interpolation=cv2.INTER_AREA)
+
+    def update(self, elapsed, motion):
+        # After an inferred frame: its inference time, and the largest wrist
+        # speed (normalised units per frame), None without a pose
+        self.inferred += 1
+        self.window_cost += elapsed
+        self.cost = elapsed if self.cost is None else 0.8 * self.cost + 0.2 * elapsed
+        if motion is not None and motion > self.motion_threshold:
+            self.still = 0
+        else:
+            self.still += 1
+
+        now = time.time()
+        if now - self.last_adjust >= self.adjust_every and self.window_frames:
+            self._adjust(self.window_cost / self.window_frames)
+            self.last_adjust = now
+            self.window_frames = 0
+            self.window_cost = 0.0
+
+    def _adjust(self, per_frame):
+        # per_frame: inference seconds spent per delivered frame, skips included
+        if per_frame > self.budget:
+            if not self.moving() and self.skip < self.max_skip:
+                self.skip += 1
+            elif self.level < len(self.widths) - 1:
+                self.level += 1
+        elif per_frame < 0.6 * self.budget:
+            # Headroom: get quality back, resolution first
+            if self.level > 0:
+                self.level -= 1
+            elif self.skip > 1:
+                self.skip -= 1
+
+    def snapshot(self):
+        return {
+            "width": self.widths[self.level],
+            "skip": self.skip,
+            "moving": self.moving(),
+            "inference_ms": round((self.cost or 0) * 1000, 1),
+            "budget_ms": round(self.budget * 1000, 1),
+            "inferred": self.inferred,
+            "frames": self.frames,
+        }
+
+class WristWatch:
+    # Cheap motion check for frames that skip inference: small grayscale
+    # patches around the last known wrist positions, compared with the same
+    # patches in the last inferred frame. A few hundred pixels per wrist,
+    # against a full MediaPipe pass.
+    def __init__(self, size=0.08, threshold=12.0):
+        self.size = size            # patch side as a fraction of frame width
+        self.threshold = threshold  # mean absolute grey-level change
+        self.boxes = []
+        self.patches = []
+
+    def reset(self, frame, points):
+        # After an inferred frame: its wrists as normalised (x, y) points, or
+        # None when nobody is in view (nothing to watch)
+        self.boxes = [] if points is None else [self._box(frame, p) for p in points]
+        self.patches = [self._patch(frame, box) for box in self.boxes]
+
+    def moved(self, frame):
+        for box, patch in zip(self.boxes, self.patches):
+            if patch.size and np.abs(self._patch(frame, box) - patch).mean() > self.threshold:
+                return True
+        return False
+
+    def _box(self, frame, point):
+        h, w = frame.shape[:2]
+        half = max(4, int(self.size * w / 2))
+        x, y = int(np.clip(point[0], 0, 1) * (w - 1)), int(np.clip(point[1], 0, 1) * (h - 1))
+        return max(0, y - half), min(h, y + half), max(0, x - half), min(w, x + half)
+
+    def _patch(self, frame, box):
+        y0, y1, x0, x1 = box
+        return cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY).astype(np.int16)
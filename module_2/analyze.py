@@ -0,0 +1,188 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+
+# Offline analysis of recorded rounds.
+#
+#   python analyze.py round1.mp4                        print the punch timeline and stats
+#   python analyze.py round1.mp4 --output round1.json
+#   python analyze.py round1.mp4 --annotate round1_annotated.mp4
+#
+# The video is cut into segments that are scored in parallel, one process per
+# core, each with its own PoseProcessor running on the video's clock instead
+# of the wall clock. A segment starts `overlap` seconds early and processes
+# those frames without counting them, so the wrist motion buffers, punch
+# cooldowns and guard state are the same at its first frame as they would be
+# in one continuous pass. Frames are not drawn on or encoded unless an
+# annotated copy is asked for.
+
+SEGMENT_SECONDS = 30.0
+OVERLAP_SECONDS = 1.0  # covers the motion buffers and the 0.5 s punch cooldowns
+DEFAULT_FPS = 30.0
+
+def probe(path):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"cannot open video {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    cap.release()
+    return fps, frames, size
+
+def plan_segments(frames, fps, segment_seconds=SEGMENT_SECONDS, overlap=OVERLAP_SECONDS):
+    # [(warmup_start, start, end)] frame indices covering the whole video
+    step = max(1, int(round(segment_seconds * fps)))
+    warmup = int(round(overlap * fps))
+    return [(max(0, start - warmup), start, min(start + step, frames)) for start in range(0, frames, step)]
+
+def reset_counters(processor, now):
+    # Start counting at a segment boundary, keeping the motion/cooldown state
+    processor.reset_stats()
+    with processor.lock:
+        processor.guard_up_time = 0
+        processor.total_tracking_time = 0
+    processor.session_start = now
+    processor.timeline.clear()
+
+def analyze_segment(path, fps, warmup_start, start, end, annotate_path=None):
+    # Counters for frames [start, end), after running [warmup_start, start) to prime state
+    from app import PoseProcessor
+
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, warmup_start)
+    writer = None
+    # Frames carry their own timestamps, the clock only sets where the segment starts
+    processor = PoseProcessor(f"{os.path.basename(path)}:{start}", record_timeline=True,
+                              clock=lambda: warmup_start / fps, record=False)
+    if warmup_start == start:
+        reset_counters(processor, start / fps)
+    try:
+        for index in range(warmup_start, end):
+            ok, frame = cap.read()
+            if not ok:
+                end = index
+                break
+            now = index / fps
+            if index == start and warmup_start < start:
+                reset_counters(processor, now)
+            drawing = annotate_path is not None and index >= start
+            img = processor.process_frame(frame, now=now, draw=drawing)
+            if drawing:
+                if writer is None:
+                    h, w = img.shape[:2]
+                    writer = cv2.VideoWriter(annotate_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+                writer.write(img)
+    finally:
+        cap.release()
+        if writer is not None:
+            writer.release()
+        processor.close()
+
+    return {
+        "start": start,
+        "end": end,
+        "timeline": processor.timeline,
+        "total_punches": processor.total_punches,
+        "valid_punches": processor.valid_punches,
+        "guard_warnings": processor.guard_warnings,
+        "punch_counts": processor.punch_counts,
+        "guard_up_time": processor.guard_up_time,
+        "total_tracking_time": processor.total_tracking_time,
+    }
+
+def merge(segments, duration):
+    from app import build_stats
+
+    punch_counts = {}
+    for seg in segments:
+        for name, count in seg["punch_counts"].items():
+            punch_counts[name] = punch_counts.get(name, 0) + count
+
+    def total(key):
+        return sum(seg[key] for seg in segments)
+
+    stats = build_stats(total("total_punches"), total("valid_punches"), total("guard_warnings"), punch_counts,
+                        total("guard_up_time"), total("total_tracking_time"), duration)
+    timeline = [event for seg in segments for event in seg["timeline"]]
+    return timeline, stats
+
+def concat_videos(parts, output, fps):
+    writer = None
+    for part in parts:
+        cap = cv2.VideoCapture(part)
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if writer is None:
+                h, w = frame.shape[:2]
+                writer = cv2.VideoWriter(output, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+            writer.write(frame)
+        cap.release()
+        os.remove(part)
+    if writer is not None:
+        writer.release()
+
+def analyze_video(path, workers=None, segment_seconds=SEGMENT_SECONDS, overlap=OVERLAP_SECONDS, annotate=None):
+    # Per-punch timeline and get_stats()-style totals for a recorded video
+    fps, frames, size = probe(path)
+    segments = plan_segments(frames, fps, segment_seconds, overlap)
+    parts = [f"{annotate}.part{i}.mp4" for i in range(len(segments))] if annotate else [None] * len(segments)
+
+    # Spawned workers, MediaPipe graphs do not survive a fork well
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        jobs = [pool.submit(analyze_segment, path, fps, warmup_start, start, end, part)
+                for (warmup_start, start, end), part in zip(segments, parts)]
+        results = [job.result() for job in jobs]
+
+    if annotate:
+        concat_videos(parts, annotate, fps)
+
+    frames = results[-1]["end"] if results else 0
+    duration = frames / fps
+    timeline, stats = merge(results, duration)
+    return {
+        "video": os.path.abspath(path),
+        "fps": fps,
+        "frames": frames,
+        "size": list(size),
+        "segments": len(segments),
+        "timeline": timeline,
+        "stats": stats,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a recorded sparring video')
+    parser.add_argument('video')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--segment', type=float, default=SEGMENT_SECONDS, help='seconds per parallel segment')
+    parser.add_argument('--overlap', type=float, default=OVERLAP_SECONDS, help='warm-up seconds before each segment')
+    parser.add_argument('--annotate', default=None, help='also write an annotated copy of the video here')
+    parser.add_argument('--output', default=None, help='write the report as JSON')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = analyze_video(args.video, args.workers, args.segment, args.overlap, args.annotate)
+    elapsed = time.perf_counter() - start
+
+    for event in report["timeline"]:
+        print(f"{event['time']:>9.2f}s  {event['type']:<9} {event['hand']:<6} guard {'up' if event['guard'] else 'down'}")
+    stats = report["stats"]
+    print(f"{stats['total_punches']} punches, {stats['guard_warnings']} guard warnings, "
+          f"guard {stats['guard_perfection']}%, {stats['punches_per_minute']}/min")
+    print(f"{report['frames']} frames in {report['segments']} segments, {elapsed:.1f}s "
+          f"({report['frames'] / elapsed:.0f} frames/s)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+if __name__ == '__main__':
+    main()
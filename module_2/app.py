@@ -1,88 +1,46 @@
 import cv2
-import math
+import os
 import time
 import threading
-from collections import deque
 from flask import Flask, render_template, Response, jsonify, request, session
 from mediapipe import solutions as mp_solutions
 import numpy as np
+from config import Config
+from pipeline import FramePipeline
+from broadcast import CameraBroadcaster
+from processor_pool import ProcessorManager
+import landmarks
+from adaptive import AdaptiveController, WristWatch, select_model_complexity
+from workers import PoseWorkerPool
+from streaming import FrameAnalyzer, ProcessedFrame, pose_events
+import metrics
+from recording import Recorder, session_path, SKIPPED, RESET
+from sources import open_source
+from sessions import SessionTable
+
+metrics.registry.enabled = Config.METRICS
 
 mp_pose = mp_solutions.pose
 mp_drawing = mp_solutions.drawing_utils
 
-# ---------------- HELPERS ----------------
-def angle(a, b, c):
-    ang = math.degrees(
-        math.atan2(c.y - b.y, c.x - b.x) -
-        math.atan2(a.y - b.y, a.x - b.x)
-    )
-    ang = abs(ang)
-    return 360 - ang if ang > 180 else ang
-
-def avg_motion(buf):
-    if len(buf) < 2:
-        return 0, 0
-    dx, dy = 0, 0
-    for i in range(1, len(buf)):
-        px, py = buf[i - 1]
-        cx, cy = buf[i]
-        dx += cx - px
-        dy += cy - py
-    return dx / (len(buf) - 1), dy / (len(buf) - 1)
-
 # ---------------- RULES ----------------
-def check_guard_up(landmarks):
-    lw_y = landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value].y
-    rw_y = landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value].y
-    chin_y = (landmarks[mp_pose.PoseLandmark.MOUTH_LEFT.value].y +
-              landmarks[mp_pose.PoseLandmark.MOUTH_RIGHT.value].y) / 2
-    guard_threshold = chin_y + 0.15
-    if lw_y < guard_threshold and rw_y < guard_threshold:
+# The rules work on (33, 4) landmark arrays and the wrist RingBuffers, see
+# landmarks.py for the vectorized versions used on recorded sequences.
+def check_guard_up(lm):
+    if landmarks.guard_up(lm):
         return True, ("[OK] Guard", (0, 200, 0))
     else:
         return False, ("[!] Guard Down", (0, 0, 255))
 
-def detect_punch_type(landmarks, lw_buf, rw_buf, last_time, cooldown=0.4):
-    lw = landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value]
-    rw = landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-    le = landmarks[mp_pose.PoseLandmark.LEFT_ELBOW.value]
-    re = landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW.value]
-    ls = landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-    rs = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-
-    now = time.time()
-    left_elb_angle = angle(ls, le, lw)
-    right_elb_angle = angle(rs, re, rw)
-    ldx, ldy = avg_motion(lw_buf)
-    rdx, rdy = avg_motion(rw_buf)
-
-    # --- JAB ---
-    if lw.z < le.z and left_elb_angle > 145 and lw.z - le.z < -0.02 and (now - last_time["jab"]) > cooldown:
-        last_time["jab"] = now
-        return "[OK] Jab", (0, 200, 0)
-
-    # --- CROSS ---
-    if rw.z < re.z and right_elb_angle > 145 and rw.z - re.z < -0.02 and (now - last_time["cross"]) > cooldown:
-        last_time["cross"] = now
-        return "[OK] Cross", (0, 200, 0)
-
-    # --- HOOK ---
-    if ((60 < left_elb_angle < 120 and abs(ldx) > abs(ldy) * 1.5 and abs(ldx) > 0.02) or
-        (60 < right_elb_angle < 120 and abs(rdx) > abs(rdy) * 1.5 and abs(rdx) > 0.02)) \
-        and (now - last_time["hook"]) > cooldown:
-        last_time["hook"] = now
-        return "[OK] Hook", (0, 200, 0)
-
-    # --- UPPERCUT (stricter to avoid false triggers) ---
-    if ((left_elb_angle < 110 and lw.y > landmarks[mp_pose.PoseLandmark.NOSE.value].y
-         and -ldy > abs(ldx) * 2 and -ldy > 0.05) or
-        (right_elb_angle < 110 and rw.y > landmarks[mp_pose.PoseLandmark.NOSE.value].y
-         and -rdy > abs(rdx) * 2 and -rdy > 0.05)) \
-        and (now - last_time["upper"]) > cooldown:
-        last_time["upper"] = now
-        return "[OK] Uppercut", (0, 200, 0)
-
-    return None
+def detect_punch_type(lm, lw_buf, rw_buf, last_time, cooldown=0.4, now=None):
+    # (message, color, hand) for a detected punch, or None
+    now = time.time() if now is None else now
+    candidates = landmarks.punch_candidates(lm, lw_buf.motion(), rw_buf.motion())
+    punch = landmarks.pick_punch(candidates, last_time, now, cooldown)
+    if punch is None:
+        return None
+    key, hand = punch
+    return f"[OK] {landmarks.PUNCH_NAMES[key]}", (0, 200, 0), hand
 
 # ---------------- DEBUG MOTION VECTORS ----------------
 def draw_motion_vectors(img, lw_buf, rw_buf):
@@ -95,48 +53,109 @@ def draw_motion_vectors(img, lw_buf, rw_buf):
         cv2.arrowedLine(img, (int(x1 * w), int(y1 * h)), (int(x2 * w), int(y2 * h)), (255, 0, 0), 2)
 
 # ---------------- POSE PROCESSOR CLASS ----------------
+def create_pose():
+    return mp_pose.Pose(
+        model_complexity=select_model_complexity(Config.POSE_MODEL_COMPLEXITY),
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+def create_quality():
+    if not Config.ADAPTIVE:
+        return None
+    return AdaptiveController(Config.VIDEO_FPS, cpu_budget=Config.CPU_BUDGET, widths=Config.INFERENCE_WIDTHS,
+                              max_skip=Config.MAX_SKIP, motion_threshold=Config.MOTION_THRESHOLD)
+
+def build_stats(total_punches, valid_punches, guard_warnings, punch_counts,
+                guard_up_time, total_tracking_time, session_duration):
+    acc = (valid_punches / total_punches * 100) if total_punches else 0
+    guard_perfection = (guard_up_time / total_tracking_time * 100) if total_tracking_time > 0 else 0
+    return {
+        "total_punches": total_punches,
+        "valid_punches": valid_punches,
+        "accuracy": round(acc, 1),
+        "guard_warnings": guard_warnings,
+        "guard_perfection": round(guard_perfection, 1),
+        "punch_counts": dict(punch_counts),
+        "session_duration": round(session_duration, 1),
+        "punches_per_minute": round(total_punches / (session_duration / 60), 1) if session_duration > 0 else 0
+    }
+
+def empty_stats():
+    # Stats of a session that has nothing counted (yet)
+    return build_stats(0, 0, 0, {"Jab": 0, "Cross": 0, "Hook": 0, "Uppercut": 0}, 0, 0, 0)
+
+def stats_between(baseline, counters):
+    # build_stats() for what was counted between two PoseProcessor.counters()
+    # snapshots; a baseline of None means since the processor's session start
+    if baseline is None:
+        baseline = {"total_punches": 0, "valid_punches": 0, "guard_warnings": 0, "punch_counts": {},
+                    "guard_up_time": 0, "total_tracking_time": 0, "time": counters["session_start"]}
+    punch_counts = {k: v - baseline["punch_counts"].get(k, 0) for k, v in counters["punch_counts"].items()}
+    return build_stats(counters["total_punches"] - baseline["total_punches"],
+                       counters["valid_punches"] - baseline["valid_punches"],
+                       counters["guard_warnings"] - baseline["guard_warnings"],
+                       punch_counts,
+                       counters["guard_up_time"] - baseline["guard_up_time"],
+                       counters["total_tracking_time"] - baseline["total_tracking_time"],
+                       counters["time"] - baseline["time"])
+
 class PoseProcessor:
-    def __init__(self, session_id=None):
+    # Timing follows `clock` (the wall clock by default) unless process_frame()
+    # is given frame timestamps (offline analysis, see analyze.py). With
+    # record_timeline set, every counted punch is also appended to
+    # self.timeline. With Config.RECORD_DIR set and record=True, the pose
+    # stream is saved for replay.py.
+    def __init__(self, session_id=None, pose=None, record_timeline=False, clock=None, record=True):
         self.session_id = session_id or str(time.time())
-        self.pose = mp_pose.Pose(
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-        self.lw_buf = deque(maxlen=5)
-        self.rw_buf = deque(maxlen=5)
+        self.clock = clock or time.time
+        self.pose = pose or create_pose()
+        self.last_active = 0.0
+        self.lw_buf = landmarks.RingBuffer()
+        self.rw_buf = landmarks.RingBuffer()
         self.last_punch = None
         self.last_time = 0
         self.display_time = 1.0
-        self.cooldowns = {"jab": 0, "cross": 0, "hook": 0, "upper": 0}
+        self.cooldowns = dict.fromkeys(landmarks.PUNCHES, float('-inf'))
 
         # Stats
         self.total_punches = 0
         self.valid_punches = 0
         self.guard_warnings = 0
         self.punch_counts = {"Jab": 0, "Cross": 0, "Hook": 0, "Uppercut": 0}
-        self.session_start = time.time()
+        self.session_start = self.clock()
+        self.timeline = [] if record_timeline else None
+        self.recorder = None
+        if record and Config.RECORD_DIR:
+            os.makedirs(Config.RECORD_DIR, exist_ok=True)
+            self.recorder = Recorder(session_path(Config.RECORD_DIR, self.session_id, time.time()))
+        self.quality = create_quality()
+        self.wrist_watch = WristWatch() if self.quality is not None else None
+        self.frame_index = -1   # poses scored plus frames skipped; numbers the wrist points
+        self.last_landmarks = None
+        self.last_pose = None   # (33, 4) array of the last inferred pose, None if nobody in view
+        self.last_seen = 0.0
+        self.motion = None      # largest wrist speed at the last pose
+        self.version = 0        # bumped whenever a counter changes
 
         # State
         self.guard_ok_prev = True
         self.last_counted_punch = None
-        self.last_count_time = 0.0
-        self.count_cooldown = 0.5
+        self.last_count_time = float('-inf')
+        self.count_cooldown = landmarks.COUNT_COOLDOWN
         self.feedback_text = "Starting up..."
         self.feedback_color = (255, 255, 255)
         self.guard_up_time = 0
         self.total_tracking_time = 0
-        self.last_update_time = time.time()
+        self.last_update_time = self.clock()
         
-        # Thread safety
-        self.lock = threading.Lock()
-        self.guard_up_time = 0
-        self.total_tracking_time = 0
-        self.last_update_time = time.time()
+        # Thread safety, with acquire waits recorded in /metrics
+        self.lock = metrics.TimedLock("pose_processor", metrics.registry)
 
     def _extract_name(self, msg_text):
         return msg_text.partition('] ')[2] if '] ' in msg_text else msg_text
-    def update_guard_time(self, guard_ok):
-        now = time.time()
+    def update_guard_time(self, guard_ok, now=None):
+        now = self.clock() if now is None else now
         time_elapsed = now - self.last_update_time
         self.total_tracking_time += time_elapsed
         
@@ -145,87 +164,177 @@ class PoseProcessor:
         
         self.last_update_time = now
 
-    def process_frame(self, frame):
+    def detach_pose(self):
+        # Hand the MediaPipe graph back to the caller (for pooling or closing)
+        metrics.registry.forget(self.session_id)
+        if self.recorder is not None:
+            self.recorder.close(self.counters())
+        pose, self.pose = self.pose, None
+        return pose
+
+    def close(self):
+        pose = self.detach_pose()
+        if pose is not None:
+            pose.close()
+
+    def process_frame(self, frame, now=None, draw=True):
+        # `now` is the frame's timestamp in seconds (the clock by default);
+        # draw=False skips annotating the frame
+        self.last_active = time.time()
+        now = self.clock() if now is None else now
+        observe = metrics.registry.observe
+        metrics.registry.frame_processed(self.session_id)
         img = frame
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        if self.quality is not None and not self.quality.should_infer(lambda: self.wrist_watch.moved(frame)):
+            # Athlete is still: reuse the last pose, nothing new to score
+            self.skip(now)
+            if draw and self.last_landmarks is not None:
+                mp_drawing.draw_landmarks(img, self.last_landmarks, mp_pose.POSE_CONNECTIONS)
+                cv2.putText(img, self.feedback_text, (10, 30), cv2.FONT_HERSHEY_DUPLEX,
+                            0.7, self.feedback_color, 2, cv2.LINE_AA)
+            return img
+
+        start = time.perf_counter()
+        small = img if self.quality is None else self.quality.resize(img)
+        t = time.perf_counter()
+        img_rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+        observe("cvt_color", time.perf_counter() - t)
+        t = time.perf_counter()
         results = self.pose.process(img_rgb)
-        feedback = []
-
-        if results.pose_landmarks:
+        elapsed = time.perf_counter() - start
+        observe("pose_process", time.perf_counter() - t)
+        self.last_landmarks = results.pose_landmarks
+
+        lm = None if not results.pose_landmarks else landmarks.to_array(results.pose_landmarks)
+        if self.wrist_watch is not None:
+            # Reference patches from the frame as captured, before any drawing
+            wrists = None if lm is None else lm[[landmarks.LEFT_WRIST, landmarks.RIGHT_WRIST], :2]
+            self.wrist_watch.reset(img, wrists)
+        if lm is not None and draw:
+            t = time.perf_counter()
             mp_drawing.draw_landmarks(img, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
+            observe("draw_landmarks", time.perf_counter() - t)
+        if self.recorder is not None:
+            self.recorder.write(now, lm)
 
-            lw = results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST]
-            rw = results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST]
-            self.lw_buf.append((lw.x, lw.y))
-            self.rw_buf.append((rw.x, rw.y))
-
-            guard_ok, guard_msg = check_guard_up(results.pose_landmarks.landmark)
-            feedback.append(guard_msg)
-            
-            self.update_guard_time(guard_ok)
-
-            if not guard_ok and self.guard_ok_prev:
-                with self.lock:
-                    self.guard_warnings += 1
-            self.guard_ok_prev = guard_ok
-
-            if guard_ok:
-                punch = detect_punch_type(results.pose_landmarks.landmark,
-                                          self.lw_buf, self.rw_buf,
-                                          self.cooldowns, cooldown=0.4)
-                now = time.time()
-                if punch:
-                    msg_text, color = punch
-                    name = self._extract_name(msg_text)
-
-                    self.last_punch = punch
-                    self.last_time = now
-
-                    if (now - self.last_count_time) > self.count_cooldown or name != self.last_counted_punch:
-                        with self.lock:
-                            self.total_punches += 1
-                            self.valid_punches += 1
-                            if name in self.punch_counts:
-                                self.punch_counts[name] += 1
-                            self.last_counted_punch = name
-                            self.last_count_time = now
-
-                if self.last_punch and (time.time() - self.last_time < self.display_time):
-                    feedback.append(self.last_punch)
+        t = time.perf_counter()
+        feedback = self.score(lm, now)
+        observe("rules", time.perf_counter() - t)
 
+        if lm is not None and draw:
             draw_motion_vectors(img, self.lw_buf, self.rw_buf)
-            
-            # Update feedback text for display
-            if feedback:
-                self.feedback_text, self.feedback_color = feedback[-1]
-            else:
-                self.feedback_text = "Ready for training"
-                self.feedback_color = (255, 255, 255)
-                
+
             # Draw feedback on frame
+            t = time.perf_counter()
             y_offset = 30
             for msg, color in feedback:
                 cv2.putText(img, msg, (10, y_offset), cv2.FONT_HERSHEY_DUPLEX,
                             0.7, color, 2, cv2.LINE_AA)
                 y_offset += 30
+            observe("put_text", time.perf_counter() - t)
 
+        if self.quality is not None:
+            self.quality.update(elapsed, self.motion)
         return img
 
-    def get_stats(self):
+    def skip(self, now):
+        # A frame adaptive inference left out. It has no pose to score but
+        # counts toward the wrist motion (see score()); replays call this for
+        # the frames a recording marks as skipped.
+        self.frame_index += 1
+        if self.recorder is not None:
+            self.recorder.write(now, None, SKIPPED)
+
+    def score(self, lm, now):
+        # The rules for one pose, a (33, 4) landmark array or None when nobody
+        # is in view, at time `now`: updates the counters and the feedback and
+        # returns the feedback lines to draw. Replays call this directly.
+        self.last_pose = lm
+        self.last_seen = now
+        self.motion = None
+        feedback = []
+        if lm is None:
+            return feedback
+
+        # Motion per pose, as without skipping; frames skipped by adaptive
+        # inference also advance the numbering (frames with nobody in view
+        # do not), so a punch thrown across them is not overstated
+        self.frame_index += 1
+        self.lw_buf.append(lm[landmarks.LEFT_WRIST, :2], self.frame_index)
+        self.rw_buf.append(lm[landmarks.RIGHT_WRIST, :2], self.frame_index)
+        self.motion = max(abs(self.lw_buf.motion()).max(), abs(self.rw_buf.motion()).max())
+
+        guard_ok, guard_msg = check_guard_up(lm)
+        feedback.append(guard_msg)
+        
+        self.update_guard_time(guard_ok, now)
+
+        if not guard_ok and self.guard_ok_prev:
+            with self.lock:
+                self.guard_warnings += 1
+                self.version += 1
+        self.guard_ok_prev = guard_ok
+
+        if guard_ok:
+            punch = detect_punch_type(lm,
+                                      self.lw_buf, self.rw_buf,
+                                      self.cooldowns, cooldown=0.4, now=now)
+            if punch:
+                msg_text, color, hand = punch
+                name = self._extract_name(msg_text)
+
+                self.last_punch = (msg_text, color)
+                self.last_time = now
+
+                if (now - self.last_count_time) > self.count_cooldown or name != self.last_counted_punch:
+                    with self.lock:
+                        self.total_punches += 1
+                        self.valid_punches += 1
+                        if name in self.punch_counts:
+                            self.punch_counts[name] += 1
+                        self.version += 1
+                        self.last_counted_punch = name
+                        self.last_count_time = now
+                        if self.timeline is not None:
+                            self.timeline.append({"time": round(now, 3), "type": name,
+                                                  "hand": hand, "guard": guard_ok})
+
+            if self.last_punch and (now - self.last_time < self.display_time):
+                feedback.append(self.last_punch)
+
+        # Update feedback text for display
+        if feedback:
+            self.feedback_text, self.feedback_color = feedback[-1]
+        else:
+            self.feedback_text = "Ready for training"
+            self.feedback_color = (255, 255, 255)
+        return feedback
+
+    def pose_event(self):
+        # Last pose and feedback for clients that draw the overlay themselves
+        return {"time": self.last_seen, "landmarks": self.last_pose,
+                "feedback": [self.feedback_text, list(self.feedback_color)]}
+
+    def counters(self, now=None):
+        # Running totals at `now`, for stats over a window (see stats_between)
         with self.lock:
-            acc = (self.valid_punches / self.total_punches * 100) if self.total_punches else 0
-            session_duration = time.time() - self.session_start
-            guard_perfection = (self.guard_up_time / self.total_tracking_time * 100) if self.total_tracking_time > 0 else 0
             return {
                 "total_punches": self.total_punches,
                 "valid_punches": self.valid_punches,
-                "accuracy": round(acc, 1),
                 "guard_warnings": self.guard_warnings,
-                "guard_perfection": round(guard_perfection, 1),
-                "punch_counts": self.punch_counts,
-                "session_duration": round(session_duration, 1),
-                "punches_per_minute": round(self.total_punches / (session_duration / 60), 1) if session_duration > 0 else 0
+                "punch_counts": dict(self.punch_counts),
+                "guard_up_time": self.guard_up_time,
+                "total_tracking_time": self.total_tracking_time,
+                "session_start": self.session_start,
+                "time": self.clock() if now is None else now,
             }
+
+    def get_stats(self, now=None):
+        return stats_between(None, self.counters(now))
+
+    def stats_since(self, baseline, counters=None):
+        # Stats since an earlier counters() snapshot, up to `counters` or now
+        return stats_between(baseline, self.counters() if counters is None else counters)
     
     def reset_stats(self):
         with self.lock:
@@ -233,75 +342,187 @@ class PoseProcessor:
             self.valid_punches = 0
             self.guard_warnings = 0
             self.punch_counts = {"Jab": 0, "Cross": 0, "Hook": 0, "Uppercut": 0}
-            self.session_start = time.time()
+            self.session_start = self.clock()
+            self.version += 1
+            if self.recorder is not None:
+                # On the frames' clock, after the last frame scored
+                self.recorder.write(self.last_seen, None, RESET)
             return {"status": "success", "message": "Stats reset successfully"}
 
 # ---------------- FLASK APP ----------------
 app = Flask(__name__)
 app.secret_key = 'smartspar-secret-key-2023'
 
-# Session management
-processors = {}
+# Session management: bounded, idle sessions evicted and their Pose graphs pooled
+processors = ProcessorManager(
+    make_processor=lambda session_id, pose: PoseProcessor(session_id, pose=pose),
+    make_pose=create_pose,
+    max_size=Config.PROCESSOR_MAX,
+    ttl=Config.PROCESSOR_TTL,
+    pool_size=Config.POSE_POOL_SIZE,
+)
 
 def get_processor(session_id):
-    if session_id not in processors:
-        processors[session_id] = PoseProcessor(session_id)
-    return processors[session_id]
+    return processors.get(session_id)
+
+def open_camera():
+    if Config.CAMERA != 'auto' and not Config.CAMERA.isdigit():
+        # Generated frames, a video file or an image sequence (see sources.py)
+        try:
+            return open_source(Config.CAMERA, fps=Config.VIDEO_FPS)
+        except ValueError as e:
+            print(f"Frame source unavailable: {e}")
+            return None
 
-def generate_frames(session_id):
-    processor = get_processor(session_id)
-    
     # Try different camera indices if 0 doesn't work
-    camera_indices = [0, 1, 2]
-    camera = None
+    camera_indices = [0, 1, 2] if Config.CAMERA == 'auto' else [int(Config.CAMERA)]
     
     for camera_index in camera_indices:
         try:
             camera = cv2.VideoCapture(camera_index)
             if camera.isOpened():
                 print(f"Camera found at index {camera_index}")
-                break
+                return camera
             else:
                 camera.release()
         except:
             pass
+    return None
+
+def mjpeg_part(jpeg):
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+
+def test_pattern_frames():
+    print("No camera found. Using test pattern.")
+    # Create a test pattern if no camera is available
+    while True:
+        # Create a simple test pattern
+        img = np.zeros((480, 640, 3), dtype=np.uint8)
+        cv2.putText(img, "No camera detected", (100, 200), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        cv2.putText(img, "Please check your camera connection", (50, 250), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        
+        yield ProcessedFrame(img)
+        time.sleep(0.1)
+
+def sequential_frames(camera, processor):
+    # Capture and process one frame at a time
+    analyzer = FrameAnalyzer(processor)
+    while True:
+        t = time.perf_counter()
+        success, frame = camera.read()
+        metrics.registry.observe("camera_read", time.perf_counter() - t)
+        if not success:
+            break
+        else:
+            # Process the frame, viewers encode it if they want video
+            yield analyzer.process_frame(frame)
+
+def pipelined_frames(camera, processor):
+    # Capture and inference overlap in separate threads (see pipeline.py);
+    # encoding happens on the viewers' side, only if someone watches video
+    pipeline = FramePipeline(camera, FrameAnalyzer(processor), fps=Config.VIDEO_FPS, encode=False,
+                             session=processor.session_id).start()
+    try:
+        yield from pipeline.frames()
+    finally:
+        pipeline.stop()
+
+def generate_frames(processor):
+    # ProcessedFrames from the first working camera, or a test pattern
+    camera = open_camera()
     
-    if camera is None or not camera.isOpened():
-        print("No camera found. Using test pattern.")
-        # Create a test pattern if no camera is available
-        while True:
-            # Create a simple test pattern
-            img = np.zeros((480, 640, 3), dtype=np.uint8)
-            cv2.putText(img, "No camera detected", (100, 200), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-            cv2.putText(img, "Please check your camera connection", (50, 250), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-            
-            ret, buffer = cv2.imencode('.jpg', img)
-            frame = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            time.sleep(0.1)
+    if camera is None:
+        yield from test_pattern_frames()
+        return
     
     try:
-        while True:
-            success, frame = camera.read()
-            if not success:
-                break
-            else:
-                # Process the frame
-                processed_frame = processor.process_frame(frame)
-                
-                # Encode the frame
-                ret, buffer = cv2.imencode('.jpg', processed_frame)
-                frame = buffer.tobytes()
-                
-                # Yield the frame in byte format
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+        if Config.PIPELINED:
+            yield from pipelined_frames(camera, processor)
+        else:
+            yield from sequential_frames(camera, processor)
+    finally:
+        camera.release()
+
+# ---------------- SHARED CAMERA ----------------
+# One producer per camera, shared by every /video_feed client. Sessions that
+# watch a camera read their stats from that camera's processor, each counted
+# from when it joined or last reset (see sessions.py).
+CAMERA_SOURCE = 'camera'
+broadcasters = {}
+broadcasters_lock = threading.Lock()
+sessions = SessionTable(ttl=Config.PROCESSOR_TTL, max_size=Config.SESSION_MAX)
+
+def camera_frames(source):
+    # The producer pins the camera's processor, so it is not evicted under the
+    # broadcaster while viewers are subscribed. Looked up per producer start,
+    # an idle camera processor may have been evicted since the last one.
+    processor = processors.pin(source)
+    try:
+        yield from generate_frames(processor)
     finally:
-        if camera:
-            camera.release()
+        processors.unpin(source)
+
+def get_broadcaster(source):
+    with broadcasters_lock:
+        if source not in broadcasters:
+            broadcasters[source] = CameraBroadcaster(lambda: camera_frames(source),
+                                                     linger=Config.CAMERA_LINGER,
+                                                     buffer=Config.SUBSCRIBER_BUFFER)
+        return broadcasters[source]
+
+def session_processor(session_id):
+    return get_processor(sessions.source(session_id, session_id))
+
+def session_stats(session_id, processor, reset=False):
+    # This session's share of the processor's stats; reset=True starts its
+    # count again without touching other sessions on the same processor
+    baseline, counters = sessions.counters(session_id, processor, reset=reset)
+    return processor.stats_since(baseline, counters)
+
+def session_stream(session_id, chunks):
+    # Keeps the session's entry while the response is open
+    sessions.stream_opened(session_id)
+    try:
+        yield from chunks
+    finally:
+        sessions.stream_closed(session_id)
+
+def stream_mjpeg(broadcaster):
+    for frame in broadcaster.stream():
+        yield mjpeg_part(frame.jpeg)
+
+# ---------------- BROWSER UPLOADS ----------------
+# Sessions that send their own frames (POST /upload_frame) are analysed in
+# the pose worker processes (see workers.py), started on the first upload.
+UPLOAD_SOURCE = 'upload'
+upload_pool = None
+upload_pool_lock = threading.Lock()
+
+def get_upload_pool():
+    global upload_pool
+    with upload_pool_lock:
+        if upload_pool is None:
+            upload_pool = PoseWorkerPool(Config.UPLOAD_WORKERS,
+                                         queue_size=Config.UPLOAD_QUEUE,
+                                         max_sessions=Config.PROCESSOR_MAX,
+                                         ttl=Config.PROCESSOR_TTL).start()
+        return upload_pool
+
+def is_upload_session(session_id):
+    return sessions.source(session_id) == UPLOAD_SOURCE
+
+def upload_stats(session_id):
+    # An upload session's stats, empty before its first analysed frame
+    stats = get_upload_pool().stats(session_id, timeout=Config.UPLOAD_TIMEOUT)
+    return stats if stats is not None else empty_stats()
+
+def read_upload():
+    # Raw JPEG body, or a multipart 'frame' file
+    upload = request.files.get('frame')
+    return upload.read() if upload else request.get_data()
 
 @app.route('/')
 def index():
@@ -310,35 +531,110 @@ def index():
         session_id = str(time.time())
         session['session_id'] = session_id
     
-    return render_template('index.html', session_id=session_id)
+    # ?view=landmarks: no video, the page draws the skeleton from /pose_stream
+    view = request.args.get('view', 'video')
+    return render_template('index.html', session_id=session_id, view=view,
+                           connections=sorted(mp_pose.POSE_CONNECTIONS))
+
+@app.route('/webrtc')
+def webrtc():
+    session_id = session.get('session_id')
+    if not session_id:
+        session_id = str(time.time())
+        session['session_id'] = session_id
+
+    return render_template('webrtc.html', session_id=session_id, ice_servers=Config.WEBRTC_ICE_SERVERS)
+
+@app.route('/upload_frame', methods=['POST'])
+def upload_frame():
+    session_id = session.get('session_id', 'default')
+    jpeg = read_upload()
+    if not jpeg:
+        return jsonify({"error": "no frame"}), 400
+    if len(jpeg) > Config.UPLOAD_MAX_BYTES:
+        return jsonify({"error": "frame too large"}), 413
+
+    sessions.join(session_id, UPLOAD_SOURCE)
+    result = get_upload_pool().submit_frame(session_id, jpeg, timeout=Config.UPLOAD_TIMEOUT)
+    if result is None:
+        return jsonify({"error": "worker busy"}), 503
+    if result.get("dropped"):
+        # The session already has a full queue; the client should send its next frame later
+        return jsonify(result), 429
+    if "error" in result:
+        return jsonify(result), 400
+    return jsonify(result)
 
 @app.route('/video_feed')
 def video_feed():
     session_id = session.get('session_id', 'default')
-    return Response(generate_frames(session_id), 
+    sessions.join(session_id, CAMERA_SOURCE, processors.peek(CAMERA_SOURCE))
+    return Response(session_stream(session_id, stream_mjpeg(get_broadcaster(CAMERA_SOURCE))),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/pose_stream')
+def pose_stream():
+    # Server-Sent Events: landmarks and feedback per frame plus stats deltas,
+    # for pages that draw the overlay themselves. ?landmarks=0 sends stats only.
+    session_id = session.get('session_id', 'default')
+    processor = get_processor(CAMERA_SOURCE)
+    sessions.join(session_id, CAMERA_SOURCE, processor)
+    broadcaster = get_broadcaster(CAMERA_SOURCE)
+    view = lambda counters: processor.stats_since(sessions.baseline(session_id, processor), counters)
+    events = pose_events(broadcaster.stream(), session_stats(session_id, processor),
+                         landmarks=request.args.get('landmarks') != '0', view=view)
+    return Response(session_stream(session_id, events), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
 @app.route('/stats')
 def stats():
     session_id = session.get('session_id', 'default')
-    processor = get_processor(session_id)
-    stats_data = processor.get_stats()
-    return jsonify(stats_data)
+    if is_upload_session(session_id):
+        return jsonify(upload_stats(session_id))
+    return jsonify(session_stats(session_id, session_processor(session_id)))
 
 @app.route('/end_session')
 def end_session():
     session_id = session.get('session_id', 'default')
-    processor = get_processor(session_id)
-    stats_data = processor.get_stats()
-    processor.reset_stats()
+    if is_upload_session(session_id):
+        result = get_upload_pool().end(session_id, timeout=Config.UPLOAD_TIMEOUT) or {}
+        sessions.pop(session_id)
+        # The session's processor lives in a worker; without its stats there
+        # is nothing to report, not a reason to build a processor here
+        return render_template('stats.html', stats=result.get("stats") or empty_stats())
+    stats_data = session_stats(session_id, session_processor(session_id), reset=True)
     return render_template('stats.html', stats=stats_data)
 
 @app.route('/reset_stats')
 def reset_stats():
     session_id = session.get('session_id', 'default')
-    processor = get_processor(session_id)
-    result = processor.reset_stats()
-    return jsonify(result)
+    if is_upload_session(session_id):
+        result = get_upload_pool().reset(session_id, timeout=Config.UPLOAD_TIMEOUT) or {"status": "error"}
+        result.pop("stats", None)
+        return jsonify(result)
+    session_stats(session_id, session_processor(session_id), reset=True)
+    return jsonify({"status": "success", "message": "Stats reset successfully"})
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.registry.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug/metrics')
+def debug_metrics():
+    return jsonify(metrics.registry.snapshot())
+
+@app.route('/debug/processors')
+def debug_processors():
+    processors.sweep()
+    sessions.sweep()
+    counts = processors.counts()
+    counts["sessions"] = sessions.counts()
+    camera = processors.peek(CAMERA_SOURCE)
+    if camera is not None and camera.quality is not None:
+        counts["quality"] = camera.quality.snapshot()
+    if upload_pool is not None:
+        counts["upload"] = upload_pool.counts()
+    return jsonify(counts)
 
 if __name__ == '__main__':
     app.run(host="127.0.0.1", port=5000,debug=True)
\ No newline at end of file
@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+from aiohttp import web
+from itsdangerous import BadSignature
+from multidict import CIMultiDict
+import app as smartspar
+from streaming import PoseEventEncoder
+
+# ---------------- ASYNCIO SERVING MODE ----------------
+# Serves SmartSpar from one event loop instead of one OS thread per open
+# connection:
+#
+#   python async_server.py --port 5000
+#
+# /video_feed, /pose_stream and /stats are handled on the loop. A viewer is a
+# coroutine holding at most one pending frame (the newest), so hundreds of
+# streams cost a few kilobytes each rather than a thread and its stack; a
+# slow viewer skips frames and never holds up the camera or other viewers.
+# Capture, pose inference and JPEG encoding stay off the loop: the camera
+# producer is the same CameraBroadcaster thread the Flask server uses, and
+# one pump thread per camera encodes each frame at most once and hands it to
+# the loop. Every other route (pages, uploads, /end_session, /metrics) runs
+# the Flask app itself in a thread pool, so both modes behave the same.
+#
+# Requires aiohttp (see requirements.txt); app.py alone does not.
+
+# Threads for Flask routes that block (uploads wait for a pose worker)
+WSGI_THREADS = 16
+
+class Viewer:
+    # One connected client: the newest frame not yet sent, older ones are
+    # replaced (latest-frame-wins, like LatestQueue)
+    def __init__(self, video):
+        self.video = video
+        self.frame = None
+        self.closed = False
+        self.skipped = 0
+        self.ready = asyncio.Event()
+
+    def offer(self, frame):
+        if self.frame is not None:
+            self.skipped += 1
+        self.frame = frame
+        self.ready.set()
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+    async def frames(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            frame, self.frame = self.frame, None
+            if frame is not None:
+                yield frame
+            elif self.closed:
+                return
+
+class LoopFanout:
+    # Bridges a CameraBroadcaster onto the event loop: a single broadcaster
+    # subscription per camera, however many viewers. Only touched from the
+    # loop, except _pump which runs in its own thread.
+    def __init__(self, broadcaster, loop):
+        self.broadcaster = broadcaster
+        self.loop = loop
+        self.viewers = set()
+        self.video_viewers = 0  # read by _pump
+        self.queue = None
+
+    def subscribe(self, video):
+        viewer = Viewer(video)
+        self.viewers.add(viewer)
+        self.video_viewers += video
+        if self.queue is None:
+            self.queue = self.broadcaster.subscribe()
+            threading.Thread(target=self._pump, args=(self.queue,), name="loop-fanout", daemon=True).start()
+        return viewer
+
+    def unsubscribe(self, viewer):
+        if viewer in self.viewers:
+            self.viewers.discard(viewer)
+            self.video_viewers -= viewer.video
+        if not self.viewers and self.queue is not None:
+            self.broadcaster.unsubscribe(self.queue)  # ends _pump
+            self.queue = None
+
+    def _pump(self, queue):
+        while True:
+            frame = queue.get(timeout=1.0)
+            if frame is None:
+                if queue.closed:
+                    break
+                continue
+            if self.video_viewers:
+                frame.jpeg  # encode here, never on the loop
+            self.loop.call_soon_threadsafe(self._publish, queue, frame)
+        self.loop.call_soon_threadsafe(self._ended, queue)
+
+    def _publish(self, queue, frame):
+        # A video viewer that joined after _pump checked for one skips this
+        # frame rather than encode it on the loop; the next one is encoded
+        if queue is self.queue:
+            for viewer in self.viewers:
+                if not viewer.video or frame.encoded:
+                    viewer.offer(frame)
+
+    def _ended(self, queue):
+        # The camera stopped (not just our unsubscribe): end every stream
+        if queue is self.queue:
+            for viewer in self.viewers:
+                viewer.close()
+            self.viewers.clear()
+            self.video_viewers = 0
+            self.queue = None
+
+# ---------------- SESSIONS ----------------
+# The Flask session cookie, read without a request context
+flask_app = smartspar.app
+serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+
+def session_id(request):
+    cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    if cookie and serializer is not None:
+        try:
+            data = serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+            return data.get('session_id', 'default')
+        except BadSignature:
+            pass  # tampered or expired (SignatureExpired), as Flask treats it
+    return 'default'
+
+# ---------------- HANDLERS ----------------
+async def in_thread(request, fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(request.app['executor'], fn, *args)
+
+async def get_processor(request, key):
+    # Creating a processor builds a Pose graph, keep that off the loop
+    if smartspar.processors.peek(key) is None:
+        return await in_thread(request, smartspar.get_processor, key)
+    return smartspar.get_processor(key)
+
+def get_fanout(request):
+    fanouts = request.app['fanouts']
+    source = smartspar.CAMERA_SOURCE
+    if source not in fanouts:
+        fanouts[source] = LoopFanout(smartspar.get_broadcaster(source), asyncio.get_running_loop())
+    return fanouts[source]
+
+async def video_feed(request):
+    sid = session_id(request)
+    sessions = smartspar.sessions
+    sessions.join(sid, smartspar.CAMERA_SOURCE, smartspar.processors.peek(smartspar.CAMERA_SOURCE))
+    response = web.StreamResponse(headers={'Content-Type': 'multipart/x-mixed-replace; boundary=frame'})
+    await response.prepare(request)
+    fanout = get_fanout(request)
+    viewer = fanout.subscribe(video=True)
+    sessions.stream_opened(sid)
+    try:
+        async for frame in viewer.frames():
+            # Waits while the client's socket buffer is full, so a slow client
+            # only ever has one frame queued here
+            await response.write(smartspar.mjpeg_part(frame.jpeg))
+    except ConnectionResetError:
+        pass  # client went away
+    finally:
+        fanout.unsubscribe(viewer)
+        sessions.stream_closed(sid)
+    return response
+
+async def pose_stream(request):
+    sid = session_id(request)
+    sessions = smartspar.sessions
+    response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+    await response.prepare(request)
+    processor = await get_processor(request, smartspar.CAMERA_SOURCE)
+    sessions.join(sid, smartspar.CAMERA_SOURCE, processor)
+    view = lambda counters: processor.stats_since(sessions.baseline(sid, processor), counters)
+    encoder = PoseEventEncoder(smartspar.session_stats(sid, processor),
+                               landmarks=request.query.get('landmarks') != '0', view=view)
+    fanout = get_fanout(request)
+    viewer = fanout.subscribe(video=False)
+    sessions.stream_opened(sid)
+    try:
+        await response.write(encoder.start())
+        async for frame in viewer.frames():
+            for chunk in encoder.feed(frame):
+                await response.write(chunk)
+    except ConnectionResetError:
+        pass  # client went away
+    finally:
+        fanout.unsubscribe(viewer)
+        sessions.stream_closed(sid)
+    return response
+
+async def stats(request):
+    sid = session_id(request)
+    if smartspar.is_upload_session(sid):
+        # Waits on a pose worker process
+        return web.json_response(await in_thread(request, smartspar.upload_stats, sid))
+    processor = await get_processor(request, smartspar.sessions.source(sid, sid))
+    return web.json_response(smartspar.session_stats(sid, processor))
+
+# ---------------- FLASK ROUTES ----------------
+def wsgi_environ(request, body):
+    host, _, port = (request.host or 'localhost').partition(':')
+    environ = {
+        'REQUEST_METHOD': request.method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': unquote(request.raw_path.split('?', 1)[0], 'latin-1'),
+        'QUERY_STRING': request.query_string,
+        'SERVER_NAME': host,
+        'SERVER_PORT': port or ('443' if request.secure else '80'),
+        'SERVER_PROTOCOL': f'HTTP/{request.version.major}.{request.version.minor}',
+        'REMOTE_ADDR': request.remote or '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': request.scheme,
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in request.headers.items():
+        key = name.upper().replace('-', '_')
+        if key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[key] = value
+        else:
+            key = 'HTTP_' + key
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+def call_flask(environ):
+    # Runs in the executor; the routes sent here return finite bodies
+    started = []
+    def start_response(status, headers, exc_info=None):
+        started[:] = [status, headers]
+    result = flask_app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return started[0], started[1], body
+
+async def flask_fallback(request):
+    body = await request.read()
+    status, headers, payload = await in_thread(request, call_flask, wsgi_environ(request, body))
+    code, _, reason = status.partition(' ')
+    headers = CIMultiDict((k, v) for k, v in headers if k.lower() not in ('content-length', 'transfer-encoding'))
+    return web.Response(status=int(code), reason=reason or None, headers=headers, body=payload)
+
+def create_app():
+    application = web.Application(client_max_size=smartspar.Config.UPLOAD_MAX_BYTES + 64 * 1024)
+    application['fanouts'] = {}
+    application['executor'] = ThreadPoolExecutor(WSGI_THREADS, thread_name_prefix="flask")
+    application.router.add_get('/video_feed', video_feed)
+    application.router.add_get('/pose_stream', pose_stream)
+    application.router.add_get('/stats', stats)
+    application.router.add_route('*', '/{tail:.*}', flask_fallback)
+
+    async def shutdown(application):
+        for fanout in application['fanouts'].values():
+            for viewer in list(fanout.viewers):
+                viewer.close()
+        application['executor'].shutdown(wait=False)
+    application.on_shutdown.append(shutdown)
+    return application
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve SmartSpar from an asyncio event loop')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
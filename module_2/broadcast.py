@@ -0,0 +1,91 @@
+import threading
+import time
+from pipeline import LatestQueue
+
+# ---------------- CAMERA BROADCASTER ----------------
+class CameraBroadcaster:
+    # One capture-and-process producer per camera, fanned out to any number of
+    # subscribers.
+    #
+    # The producer thread starts with the first subscriber and stops once the
+    # last one has been gone for `linger` seconds (so a page reload does not
+    # reopen the device). Every subscriber gets its own small LatestQueue as a
+    # send buffer: a slow client only drops its own frames and never stalls
+    # the producer or the other clients.
+    def __init__(self, produce, linger=0.0, buffer=2):
+        self.produce = produce  # () -> iterator of JPEG bytes
+        self.linger = linger
+        self.buffer = buffer
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.thread = None
+        self.stopping = False
+        self.idle_since = None
+        self.frames_sent = 0
+
+    def subscribe(self):
+        q = LatestQueue(maxsize=self.buffer)
+        with self.lock:
+            self.subscribers.add(q)
+            self.idle_since = None
+            if self.thread is None or self.stopping:
+                # A producer that is shutting down still holds the camera, the
+                # new one waits for it before opening the device again
+                previous = self.thread
+                self.thread = threading.Thread(target=self._run, args=(previous,), name="broadcaster", daemon=True)
+                self.stopping = False
+                self.thread.start()
+        return q
+
+    def unsubscribe(self, q):
+        q.close()
+        with self.lock:
+            self.subscribers.discard(q)
+            if not self.subscribers:
+                self.idle_since = time.time()
+
+    def subscriber_count(self):
+        with self.lock:
+            return len(self.subscribers)
+
+    def stream(self):
+        # Generator for one client: JPEG bytes until the producer ends or the
+        # client goes away (Flask closes the generator on disconnect)
+        q = self.subscribe()
+        try:
+            while True:
+                jpeg = q.get(timeout=1.0)
+                if jpeg is not None:
+                    yield jpeg
+                elif q.closed:
+                    break
+        finally:
+            self.unsubscribe(q)
+
+    def _run(self, previous):
+        if previous is not None:
+            previous.join()
+        me = threading.current_thread()
+        frames = self.produce()
+        try:
+            for jpeg in frames:
+                with self.lock:
+                    if self.thread is not me:
+                        break
+                    if not self.subscribers and time.time() - self.idle_since >= self.linger:
+                        self.stopping = True
+                        break
+                    targets = list(self.subscribers)
+                for q in targets:
+                    q.put(jpeg)
+                self.frames_sent += 1
+        finally:
+            # Releases the camera
+            frames.close()
+            with self.lock:
+                if self.thread is me:
+                    self.thread = None
+                    self.stopping = False
+                    # The source ran dry: end every client's stream
+                    for q in self.subscribers:
+                        q.close()
@@ -17,6 +17,59 @@ class Config:
     VIDEO_HEIGHT = 1920
     VIDEO_FPS = 24
 
+    # Frame source: 'auto' tries camera devices 0-2, a number opens that
+    # device; 'synthetic', 'video:<file>' and 'images:<dir or glob>' run
+    # without a webcam (see sources.py)
+    CAMERA = os.environ.get('SMARTSPAR_CAMERA', 'auto')
+
+    # Run capture, pose inference and JPEG encoding in separate threads,
+    # dropping stale frames to keep latency low (see pipeline.py)
+    PIPELINED = os.environ.get('SMARTSPAR_PIPELINED', '1') != '0'
+
+    # Shared camera: seconds to keep capturing after the last viewer leaves,
+    # and frames buffered per viewer before old ones are dropped
+    CAMERA_LINGER = 2.0
+    SUBSCRIBER_BUFFER = 2
+
+    # Pose processors: at most PROCESSOR_MAX live sessions, evicted after
+    # PROCESSOR_TTL idle seconds, with up to POSE_POOL_SIZE warm Pose graphs kept
+    PROCESSOR_MAX = int(os.environ.get('SMARTSPAR_PROCESSOR_MAX', 32))
+    PROCESSOR_TTL = float(os.environ.get('SMARTSPAR_PROCESSOR_TTL', 600))
+    POSE_POOL_SIZE = int(os.environ.get('SMARTSPAR_POSE_POOL', 4))
+
+    # Browser sessions remembered (which processor they read, their stats
+    # baseline); idle ones also go after PROCESSOR_TTL
+    SESSION_MAX = int(os.environ.get('SMARTSPAR_SESSION_MAX', 1024))
+
+    # Browser uploads (POST /upload_frame): pose worker processes, frames a
+    # session may have in flight before new ones are dropped, seconds to wait
+    # for a worker's answer, and the largest accepted JPEG
+    UPLOAD_WORKERS = int(os.environ.get('SMARTSPAR_UPLOAD_WORKERS', os.cpu_count() or 1))
+    UPLOAD_QUEUE = int(os.environ.get('SMARTSPAR_UPLOAD_QUEUE', 2))
+    UPLOAD_TIMEOUT = 2.0
+    UPLOAD_MAX_BYTES = 2 * 1024 * 1024
+
+    # Per-stage timings, frame counters and lock waits on /metrics
+    METRICS = os.environ.get('SMARTSPAR_METRICS', '1') != '0'
+
+    # Save every session's pose stream here for replay.py (off when unset)
+    RECORD_DIR = os.environ.get('SMARTSPAR_RECORD_DIR')
+
+    # MediaPipe Pose model complexity: 0 (lite), 1 (full) or 2 (heavy), or
+    # 'auto' for lite on machines with <= 2 cores. MediaPipe only ships the
+    # full model and downloads the others the first time they are used.
+    POSE_MODEL_COMPLEXITY = os.environ.get('SMARTSPAR_MODEL_COMPLEXITY', '1')
+
+    # Adaptive quality (see adaptive.py): downscale frames and skip inference
+    # while the athlete is still to keep pose inference within CPU_BUDGET
+    # cores at VIDEO_FPS. MOTION_THRESHOLD is the wrist speed (normalised
+    # units per frame) above which every frame is inferred again.
+    ADAPTIVE = os.environ.get('SMARTSPAR_ADAPTIVE', '0') == '1'
+    CPU_BUDGET = float(os.environ.get('SMARTSPAR_CPU_BUDGET', 1.0))
+    INFERENCE_WIDTHS = (960, 640, 480, 320)
+    MAX_SKIP = 4
+    MOTION_THRESHOLD = 0.01
+
 class DevelopmentConfig(Config):
     DEBUG = True
 
@@ -0,0 +1,171 @@
+import numpy as np
+
+# Landmarks as arrays, and the SmartSpar rules evaluated on them.
+#
+# A frame's pose is a (33, 4) float32 array of x, y, z, visibility in
+# MediaPipe's landmark order, converted once per frame. The rule functions
+# take arrays with any number of leading axes, so the code that scores one
+# live frame also scores a whole recorded sequence, (frames, 33, 4), at once;
+# only the punch cooldowns need a pass in frame order (see punch_sequence).
+
+NOSE = 0
+MOUTH_LEFT, MOUTH_RIGHT = 9, 10
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+
+X, Y, Z = 0, 1, 2
+
+# Shoulders, elbows, wrists as (left, right) pairs: landmarks 11-16 in order
+ARM = slice(LEFT_SHOULDER, RIGHT_WRIST + 1)
+LEFT_ONLY = np.array([True, False])
+RIGHT_ONLY = np.array([False, True])
+
+GUARD_MARGIN = 0.15
+MOTION_WINDOW = 5
+COUNT_COOLDOWN = 0.5  # seconds before the same punch is counted again
+
+# Checked in this order; the first one off cooldown wins
+PUNCHES = ["jab", "cross", "hook", "upper"]
+PUNCH_NAMES = {"jab": "Jab", "cross": "Cross", "hook": "Hook", "upper": "Uppercut"}
+
+# A NormalizedLandmark with x, y, z, visibility and presence all set (as
+# MediaPipe's Pose output always has) serializes to 27 bytes: message tag and
+# length, then five 1-byte field tags each followed by a little-endian float32.
+# Slicing the floats out of the serialized list is several times faster than
+# reading 132 protobuf attributes.
+PACKED_SIZE = 27
+PACKED_HEADER = [(0, 0x0a), (1, 25), (2, 0x0d), (7, 0x15), (12, 0x1d), (17, 0x25), (22, 0x2d)]
+
+def to_array(pose_landmarks):
+    # (33, 4) float32 from a MediaPipe NormalizedLandmarkList
+    if hasattr(pose_landmarks, "SerializeToString"):
+        buf = pose_landmarks.SerializeToString()
+        n, rest = divmod(len(buf), PACKED_SIZE)
+        if n and not rest and all(buf[at::PACKED_SIZE] == bytes([value]) * n for at, value in PACKED_HEADER):
+            # x, y, z, visibility of landmark i start at byte 27 * i + 3, 5 bytes apart
+            return np.ndarray((n, 4), dtype='<f4', buffer=buf, offset=3, strides=(PACKED_SIZE, 5)).astype(np.float32)
+    return np.array([(l.x, l.y, l.z, l.visibility) for l in pose_landmarks.landmark], dtype=np.float32)
+
+class RingBuffer:
+    # Last `maxlen` (x, y) points in a fixed array; indexing and len() behave
+    # like the deque it replaces. Each point keeps the number of the frame it
+    # came from, so motion stays per frame when frames in between were not
+    # inferred (adaptive skipping, see adaptive.py).
+    def __init__(self, maxlen=MOTION_WINDOW):
+        self.data = np.zeros((maxlen, 2), dtype=np.float32)
+        self.frames = np.zeros(maxlen, dtype=np.int64)
+        self.maxlen = maxlen
+        self.count = 0
+        self.head = 0  # next slot to write
+
+    def append(self, point, frame=None):
+        # `frame` defaults to the one after the previous point
+        if frame is None:
+            frame = self.frames[(self.head - 1) % self.maxlen] + 1 if self.count else 0
+        self.data[self.head] = point
+        self.frames[self.head] = frame
+        self.head = (self.head + 1) % self.maxlen
+        self.count = min(self.count + 1, self.maxlen)
+
+    def clear(self):
+        self.count = 0
+        self.head = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not -self.count <= i < self.count:
+            raise IndexError(i)
+        return self.data[(self.head - self.count + i) % self.maxlen if i >= 0 else (self.head + i) % self.maxlen]
+
+    def motion(self):
+        # Mean per-frame (dx, dy); the sum of steps telescopes to last - first,
+        # over the frames between them rather than the points
+        if self.count < 2:
+            return np.zeros(2)
+        first, last = (self.head - self.count) % self.maxlen, (self.head - 1) % self.maxlen
+        span = max(int(self.frames[last] - self.frames[first]), 1)
+        return (self[-1].astype(np.float64) - self[0]) / span
+
+def joint_angles(a, b, c):
+    # Angle at b in degrees, 0-180, for (..., 2+) arrays of points
+    a, b, c = (np.asarray(p, dtype=np.float64) for p in (a, b, c))
+    ang = np.abs(np.degrees(np.arctan2(c[..., Y] - b[..., Y], c[..., X] - b[..., X]) -
+                            np.arctan2(a[..., Y] - b[..., Y], a[..., X] - b[..., X])))
+    return np.where(ang > 180, 360 - ang, ang)
+
+def elbow_angles(lm):
+    # (..., 2): left, right
+    arm = np.asarray(lm[..., ARM, :2], dtype=np.float64)
+    return joint_angles(arm[..., 0:2, :], arm[..., 2:4, :], arm[..., 4:6, :])
+
+def guard_up(lm):
+    # Both wrists above the chin line (+ margin)
+    y = np.asarray(lm[..., Y], dtype=np.float64)
+    threshold = (y[..., MOUTH_LEFT] + y[..., MOUTH_RIGHT]) / 2 + GUARD_MARGIN
+    return (y[..., LEFT_WRIST] < threshold) & (y[..., RIGHT_WRIST] < threshold)
+
+def rolling_motion(points, window=MOTION_WINDOW, frames=None):
+    # (frames, 2) wrist track -> (frames, 2) mean step over the last `window`
+    # points at each frame, what a RingBuffer of that size reports. `frames`
+    # numbers the points when some frames in between have none.
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    first = np.maximum(np.arange(n) - (window - 1), 0)
+    frames = np.arange(n) if frames is None else np.asarray(frames)
+    steps = frames - frames[first]
+    motion = np.zeros_like(points)
+    moving = steps > 0
+    motion[moving] = (points[moving] - points[first[moving]]) / steps[moving, None]
+    return motion
+
+def punch_candidates(lm, lw_motion, rw_motion):
+    # Per-punch (left, right) conditions before cooldowns: dict of (..., 2) bools
+    arm = np.asarray(lm[..., ARM, :3], dtype=np.float64)
+    elbow, wrist = arm[..., 2:4, :], arm[..., 4:6, :]
+    elbows = joint_angles(arm[..., 0:2, :], elbow, wrist)
+    motion = np.stack([lw_motion, rw_motion], axis=-2).astype(np.float64)
+    dx, dy = np.abs(motion[..., 0]), motion[..., 1]
+
+    reach = wrist[..., Z] - elbow[..., Z]
+    straight = (reach < 0) & (elbows > 145) & (reach < -0.02)
+    return {
+        "jab": straight & LEFT_ONLY,
+        "cross": straight & RIGHT_ONLY,
+        "hook": (60 < elbows) & (elbows < 120) & (dx > np.abs(dy) * 1.5) & (dx > 0.02),
+        # stricter to avoid false triggers
+        "upper": (elbows < 110) & (wrist[..., Y] > lm[..., NOSE, Y, None]) & (-dy > dx * 2) & (-dy > 0.05),
+    }
+
+def pick_punch(candidates, cooldowns, now, cooldown):
+    # First candidate whose cooldown has expired: (key, hand) or None.
+    # Updates `cooldowns` like the live detector.
+    for key in PUNCHES:
+        hands = candidates[key]
+        if hands.any() and now - cooldowns[key] > cooldown:
+            cooldowns[key] = now
+            return key, "left" if hands[0] else "right"
+    return None
+
+def punch_sequence(lm, times, cooldown=0.4, window=MOTION_WINDOW, frames=None):
+    # Score a recorded sequence of detected poses, (frames, 33, 4) with frame
+    # times in seconds. `frames` numbers the poses the way PoseProcessor does
+    # (frames skipped by adaptive inference in between count, see
+    # PoseProcessor.score), consecutive by default. Returns the guard state
+    # per pose and the punches the live detector would report, as
+    # (index, key, hand) tuples.
+    lm = np.asarray(lm)
+    guard = guard_up(lm)
+    candidates = punch_candidates(lm, rolling_motion(lm[:, LEFT_WRIST, :2], window, frames),
+                                  rolling_motion(lm[:, RIGHT_WRIST, :2], window, frames))
+    # Only frames with the guard up and at least one candidate need the ordered pass
+    active = np.flatnonzero(guard & np.any([c.any(axis=-1) for c in candidates.values()], axis=0))
+    cooldowns = dict.fromkeys(PUNCHES, float('-inf'))
+    punches = []
+    for i in active:
+        punch = pick_punch({k: c[i] for k, c in candidates.items()}, cooldowns, times[i], cooldown)
+        if punch:
+            punches.append((int(i),) + punch)
+    return guard, punches
@@ -0,0 +1,467 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+import aiohttp
+import numpy as np
+
+# Load tests for SmartSpar, runnable on machines without a webcam.
+#
+# Connection load: `streams` /video_feed connections (and `sse` /pose_stream
+# ones) plus `pollers` clients requesting /stats every `poll_interval`
+# seconds, for `duration` seconds. Reports connections served, frame rate
+# per viewer, frame gaps and /stats latency percentiles.
+#
+#   python loadtest.py --spawn async --streams 200 --pollers 50
+#   python loadtest.py --spawn flask --streams 200 --pollers 50
+#   python loadtest.py --url http://127.0.0.1:5000 --streams 50
+#
+# Session scaling benchmark: for each N in --sessions, N athletes each open
+# the page (getting a session cookie), send or watch video while polling
+# their /stats, and finish with /end_session (see SESSIONS below for the
+# upload and fanout modes). Reports total and per-session analysed FPS, pose
+# detection rate, endpoint latencies and server CPU/memory per step, i.e. how
+# they scale with N. With --spawn every step gets a freshly started server,
+# so steps do not inherit each other's sessions.
+#
+#   python loadtest.py --spawn flask --sessions 1,2,4,8 --source video:sparring.mp4
+#   python loadtest.py --spawn async --sessions 1,50,200 --session-mode fanout
+#
+# --spawn starts the server itself on a free port with a frame source from
+# sources.py (--source, default the synthetic camera) and samples the CPU
+# time, resident memory and thread count of it and its pose worker
+# processes from /proc.
+
+BOUNDARY = b'--frame\r\n'
+
+def percentiles(values, qs=(50, 95, 99)):
+    if not len(values):
+        return {f"p{q}": None for q in qs}
+    return {f"p{q}": round(float(np.percentile(values, q)) * 1000, 2) for q in qs}
+
+async def watch_stream(session, url, duration, result):
+    # Counts MJPEG parts (or SSE events) and the gaps between them
+    arrivals = []
+    marker = BOUNDARY if 'video_feed' in url else b'\n\n'
+    try:
+        async with session.get(url) as response:
+            if response.status != 200:
+                result["errors"] += 1
+                return
+            result["connected"] += 1
+            deadline = time.perf_counter() + duration
+            tail = b''
+            while time.perf_counter() < deadline:
+                try:
+                    chunk = await asyncio.wait_for(response.content.readany(), deadline - time.perf_counter())
+                except asyncio.TimeoutError:
+                    break
+                if not chunk:
+                    break
+                data = tail + chunk
+                n = data.count(marker)
+                now = time.perf_counter()
+                arrivals.extend([now] * n)
+                tail = data[-(len(marker) - 1):]
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        result["errors"] += 1
+        return
+    result["frames"].append(len(arrivals))
+    if len(arrivals) > 1:
+        result["fps"].append((len(arrivals) - 1) / (arrivals[-1] - arrivals[0]))
+        result["gaps"].extend(np.diff(arrivals).tolist())
+
+async def poll_stats(session, url, duration, interval, result):
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            async with session.get(url) as response:
+                await response.read()
+                if response.status == 200:
+                    result["latency"].append(time.perf_counter() - start)
+                else:
+                    result["errors"] += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            result["errors"] += 1
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - start)))
+
+async def run_load(base, streams, sse, pollers, duration, poll_interval):
+    video = {"connected": 0, "errors": 0, "frames": [], "fps": [], "gaps": []}
+    events = {"connected": 0, "errors": 0, "frames": [], "fps": [], "gaps": []}
+    polls = {"latency": [], "errors": 0}
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=10)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        tasks = [watch_stream(session, f"{base}/video_feed", duration, video) for _ in range(streams)]
+        tasks += [watch_stream(session, f"{base}/pose_stream?landmarks=0", duration, events) for _ in range(sse)]
+        tasks += [poll_stats(session, f"{base}/stats", duration, poll_interval, polls) for _ in range(pollers)]
+        await asyncio.gather(*tasks)
+
+    def summary(r, n):
+        return {
+            "clients": n,
+            "connected": r["connected"],
+            "errors": r["errors"],
+            "fps_mean": round(float(np.mean(r["fps"])), 2) if r["fps"] else 0.0,
+            "fps_min": round(float(np.min(r["fps"])), 2) if r["fps"] else 0.0,
+            "frames_delivered": int(sum(r["frames"])),
+            "gap_ms": percentiles(r["gaps"]),
+        }
+    return {
+        "video_feed": summary(video, streams),
+        "pose_stream": summary(events, sse),
+        "stats": {"clients": pollers, "requests": len(polls["latency"]), "errors": polls["errors"],
+                  "latency_ms": percentiles(polls["latency"])},
+    }
+
+# ---------------- SESSIONS ----------------
+# Two ways to run N sessions:
+#
+#   upload  every session sends its own frames to /upload_frame at --fps, so
+#           each one has its own processor in the pose worker pool: the cost
+#           of analysing N athletes. Frames come from --source, rendered on
+#           the client, with every session starting at a different offset.
+#   fanout  every session watches the one shared camera on /video_feed: the
+#           cost of broadcasting one analysed stream to N viewers, with a
+#           single processor however large N is.
+#
+# Both report the pose detection rate next to the frame rate. The default
+# synthetic source is a boxer MediaPipe finds in every frame, so the guard and
+# punch rules run too; a source it finds no pose in only measures the
+# detector's empty path.
+
+def session_result():
+    return {"video": {"connected": 0, "errors": 0, "frames": [], "fps": [], "gaps": []},
+            "upload": {"latency": [], "dropped": 0, "busy": 0, "errors": 0},
+            "stats": {"latency": [], "errors": 0}, "page": [], "end_session": [], "end_errors": 0,
+            "poses": 0, "analysed": 0}
+
+async def open_page(session, base, result):
+    start = time.perf_counter()
+    try:
+        async with session.get(f"{base}/") as response:
+            await response.read()
+            if response.status == 200:
+                result["page"].append(time.perf_counter() - start)
+                return True
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        pass
+    result["video"]["errors"] += 1
+    return False
+
+async def end_session(session, base, result):
+    start = time.perf_counter()
+    try:
+        async with session.get(f"{base}/end_session") as response:
+            await response.read()
+            if response.status == 200:
+                result["end_session"].append(time.perf_counter() - start)
+                return
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        pass
+    result["end_errors"] += 1
+
+async def watch_detection(session, url, duration, result):
+    # Counts pose events from /pose_stream, and how many had a pose in them
+    deadline = time.perf_counter() + duration
+    try:
+        async with session.get(url) as response:
+            buffer = b''
+            while time.perf_counter() < deadline:
+                try:
+                    chunk = await asyncio.wait_for(response.content.readany(), deadline - time.perf_counter())
+                except asyncio.TimeoutError:
+                    break
+                if not chunk:
+                    break
+                buffer += chunk
+                *events, buffer = buffer.split(b'\n\n')
+                for event in events:
+                    if event.startswith(b'event: pose'):
+                        result["analysed"] += 1
+                        result["poses"] += b'"lm":null' not in event
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        pass
+
+async def upload_frames(session, base, frames, offset, fps, duration, result):
+    # Sends frames at `fps` for `duration` seconds, waiting for each answer
+    # like the browser client does; returns the frames analysed
+    interval, sent, analysed = 1.0 / fps, 0, 0
+    begin = time.perf_counter()
+    deadline = begin + duration
+    while time.perf_counter() < deadline:
+        jpeg = frames[(offset + sent) % len(frames)]
+        sent += 1
+        start = time.perf_counter()
+        try:
+            async with session.post(f"{base}/upload_frame", data=jpeg,
+                                    headers={'Content-Type': 'image/jpeg'}) as response:
+                body = await response.json(content_type=None)
+                if response.status == 200:
+                    result["upload"]["latency"].append(time.perf_counter() - start)
+                    analysed += 1
+                    result["analysed"] += 1
+                    result["poses"] += bool(body.get("pose"))
+                elif response.status == 429:
+                    result["upload"]["dropped"] += 1
+                elif response.status == 503:
+                    result["upload"]["busy"] += 1
+                else:
+                    result["upload"]["errors"] += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            result["upload"]["errors"] += 1
+        await asyncio.sleep(max(0.0, begin + sent * interval - time.perf_counter()))
+    return analysed
+
+async def run_session(base, mode, frames, offset, fps, duration, poll_interval, result):
+    # One athlete: page, then video (fanout) or frame uploads (upload) while
+    # polling /stats, then the session summary
+    jar = aiohttp.CookieJar(unsafe=True)  # keep cookies for 127.0.0.1
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=10)
+    async with aiohttp.ClientSession(cookie_jar=jar, timeout=timeout) as session:
+        if not await open_page(session, base, result):
+            return
+        polling = poll_stats(session, f"{base}/stats", duration, poll_interval, result["stats"])
+        if mode == 'fanout':
+            await asyncio.gather(watch_stream(session, f"{base}/video_feed", duration, result["video"]), polling)
+        else:
+            analysed, _ = await asyncio.gather(
+                upload_frames(session, base, frames, offset, fps, duration, result), polling)
+            result["video"]["connected"] += 1
+            result["video"]["fps"].append(analysed / duration)
+        await end_session(session, base, result)
+
+async def run_sessions(base, n, mode, frames, fps, duration, poll_interval):
+    result = session_result()
+    offsets = [i * len(frames) // n for i in range(n)] if frames else [0] * n
+    tasks = [run_session(base, mode, frames, offset, fps, duration, poll_interval, result) for offset in offsets]
+    if mode == 'fanout':
+        # One extra landmarks-only client to see what the shared processor detects
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, sock_connect=10)) as session:
+            await asyncio.gather(watch_detection(session, f"{base}/pose_stream", duration, result), *tasks)
+    else:
+        await asyncio.gather(*tasks)
+    video, upload = result["video"], result["upload"]
+    step = {
+        "sessions": n,
+        "mode": mode,
+        "processors": n if mode == 'upload' else 1,  # pose pipelines doing the work
+        "connected": video["connected"],
+        "errors": video["errors"] + upload["errors"] + result["stats"]["errors"] + result["end_errors"],
+        "throughput_fps": round(sum(video["fps"]), 1),
+        "fps_mean": round(float(np.mean(video["fps"])), 2) if video["fps"] else 0.0,
+        "fps_min": round(float(np.min(video["fps"])), 2) if video["fps"] else 0.0,
+        "detection_rate": round(result["poses"] / result["analysed"], 3) if result["analysed"] else None,
+        "page_ms": percentiles(result["page"]),
+        "stats_ms": percentiles(result["stats"]["latency"]),
+        "end_session_ms": percentiles(result["end_session"]),
+    }
+    if mode == 'fanout':
+        step["gap_ms"] = percentiles(video["gaps"])
+    else:
+        step["upload_ms"] = percentiles(upload["latency"])
+        step["dropped"] = upload["dropped"]
+        step["busy"] = upload["busy"]
+    return step
+
+def client_frames(spec, fps, seconds=8.0):
+    # JPEG frames for upload sessions, `seconds` of the source at the rate
+    # they are sent (so motion looks as it would live), encoded once up front
+    # so the client's own CPU time stays out of the measurement
+    import cv2
+    from sources import open_source
+    source = open_source(spec, fps=fps, paced=False)
+    frames = []
+    try:
+        for _ in range(max(1, int(fps * seconds))):
+            ok, frame = source.read()
+            if not ok:
+                break
+            frames.append(cv2.imencode('.jpg', frame)[1].tobytes())
+    finally:
+        source.release()
+    if not frames:
+        raise ValueError(f"no frames from {spec}")
+    return frames
+
+# ---------------- SERVER UNDER TEST ----------------
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def spawn_server(mode, port, source='synthetic'):
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, SMARTSPAR_CAMERA=source)
+    if mode == 'async':
+        cmd = [sys.executable, 'async_server.py', '--port', str(port)]
+    else:
+        # The threaded Flask server, one OS thread per connection
+        cmd = [sys.executable, '-c', f"from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    server = subprocess.Popen(cmd, cwd=here, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"{mode} server exited with {server.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+def process_tree(pid):
+    # The process and its descendants (pose workers), from /proc (Linux)
+    pids, i = [pid], 0
+    while i < len(pids):
+        try:
+            for task in os.listdir(f'/proc/{pids[i]}/task'):
+                with open(f'/proc/{pids[i]}/task/{task}/children') as f:
+                    pids.extend(int(c) for c in f.read().split())
+        except OSError:
+            pass
+        i += 1
+    return pids
+
+def process_usage(pid):
+    # (cpu seconds, rss MB, threads) of the server and its children
+    total = None
+    for p in process_tree(pid):
+        try:
+            with open(f'/proc/{p}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+            threads = int(fields[17])
+            with open(f'/proc/{p}/status') as f:
+                rss = next(int(line.split()[1]) / 1024 for line in f if line.startswith('VmRSS:'))
+        except (OSError, StopIteration, IndexError, ValueError):
+            continue
+        total = (cpu, rss, threads) if total is None else (total[0] + cpu, total[1] + rss, total[2] + threads)
+    return total
+
+async def sample_usage(pid, stop, samples):
+    while not stop.is_set():
+        usage = process_usage(pid)
+        if usage is not None:
+            samples.append(usage)
+        try:
+            await asyncio.wait_for(stop.wait(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+async def warm_up(base, frame):
+    # Starts the pose worker pool (its first upload spawns it) before the
+    # clock runs, so worker start-up is not counted as load
+    async with aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True)) as session:
+        async with session.get(f"{base}/") as response:
+            await response.read()
+        for _ in range(60):
+            async with session.post(f"{base}/upload_frame", data=frame,
+                                    headers={'Content-Type': 'image/jpeg'}) as response:
+                if response.status == 200:
+                    break
+            await asyncio.sleep(0.5)
+        async with session.get(f"{base}/end_session") as response:
+            await response.read()
+    await asyncio.sleep(2.0)  # the other workers finish importing
+
+async def measure(pid, load, warmup=None):
+    # Runs the `load` coroutine while sampling the server process
+    if warmup is not None:
+        await warmup
+    stop, samples = asyncio.Event(), []
+    sampler = asyncio.create_task(sample_usage(pid, stop, samples)) if pid else None
+    start = time.perf_counter()
+    report = await load
+    elapsed = time.perf_counter() - start
+    if sampler is not None:
+        stop.set()
+        await sampler
+    if len(samples) > 1:
+        report["server"] = {
+            "cpu_cores": round((samples[-1][0] - samples[0][0]) / elapsed, 2),
+            "rss_mb_max": round(max(s[1] for s in samples), 1),
+            "threads_max": max(s[2] for s in samples),
+        }
+    return report
+
+def run_against(args, make_load, make_warmup=None):
+    # Starts the server if asked to, runs the load, stops the server
+    server, pid, base = None, args.pid, args.url
+    if args.spawn:
+        port = free_port()
+        server = spawn_server(args.spawn, port, args.source)
+        pid, base = server.pid, f"http://127.0.0.1:{port}"
+    try:
+        base = base.rstrip('/')
+        return asyncio.run(measure(pid, make_load(base), make_warmup(base) if make_warmup else None))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+def scaling(args):
+    mode = args.session_mode
+    frames = client_frames(args.source, args.fps) if mode == 'upload' else None
+    warmup = (lambda base: warm_up(base, frames[0])) if mode == 'upload' else None
+    steps = []
+    for n in [int(v) for v in args.sessions.split(',')]:
+        step = run_against(args, lambda base: run_sessions(base, n, mode, frames, args.fps, args.duration,
+                                                           args.poll_interval), warmup)
+        server = step.get("server", {})
+        rate = step["detection_rate"]
+        latency = f"upload p99 {step['upload_ms']['p99']} ms" if mode == 'upload' else \
+            f"gap p99 {step['gap_ms']['p99']} ms"
+        print(f"{n:>5} {mode} sessions: {step['throughput_fps']:>7.1f} frames/s total, "
+              f"{step['fps_mean']:>5.1f} fps/session (min {step['fps_min']:.1f}), "
+              f"poses in {'-' if rate is None else f'{rate:.0%}'} of frames, {latency}, "
+              f"stats p99 {step['stats_ms']['p99']} ms, end_session p99 {step['end_session_ms']['p99']} ms, "
+              f"cpu {server.get('cpu_cores')} cores, rss {server.get('rss_mb_max')} MB, "
+              f"{step['errors']} errors", file=sys.stderr)
+        steps.append(step)
+    return {"steps": steps}
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the SmartSpar streaming endpoints')
+    parser.add_argument('--url', default=None, help='server to test, e.g. http://127.0.0.1:5000')
+    parser.add_argument('--spawn', choices=['async', 'flask'], default=None,
+                        help='start this server with --source instead of using --url')
+    parser.add_argument('--pid', type=int, default=None, help='sample CPU and memory of this server process')
+    parser.add_argument('--source', default='synthetic', help='frame source for --spawn and upload sessions, see sources.py')
+    parser.add_argument('--sessions', default=None, metavar='N,N,...',
+                        help='session scaling benchmark with these session counts')
+    parser.add_argument('--session-mode', choices=['upload', 'fanout'], default='upload',
+                        help='upload: every session sends its own frames; fanout: all watch the shared camera')
+    parser.add_argument('--fps', type=float, default=24.0, help='frames per second each upload session sends')
+    parser.add_argument('--streams', type=int, default=50)
+    parser.add_argument('--sse', type=int, default=0)
+    parser.add_argument('--pollers', type=int, default=10)
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--output', default=None, help='write the report as JSON')
+    args = parser.parse_args()
+    if (args.url is None) == (args.spawn is None):
+        parser.error('give one of --url or --spawn')
+
+    if args.sessions:
+        report = scaling(args)
+    else:
+        report = run_against(args, lambda base: run_load(base, args.streams, args.sse, args.pollers,
+                                                         args.duration, args.poll_interval))
+    report["config"] = {k: v for k, v in vars(args).items() if k not in ('output',)}
+    report["machine"] = {"cpus": os.cpu_count(), "platform": platform.platform(),
+                         "python": platform.python_version()}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+import bisect
+import threading
+import time
+
+# ---------------- METRICS ----------------
+# Per-stage timing histograms, per-session frame counters and lock wait times
+# for the frame pipeline, rendered as Prometheus text (/metrics) or JSON
+# (/debug/metrics).
+#
+# Recording is a perf_counter() pair around the stage and one bucket
+# increment under a per-histogram lock, a couple of microseconds per stage on
+# a frame that takes tens of milliseconds, so it stays on in production
+# (SMARTSPAR_METRICS=0 turns it off).
+#
+# Pose worker processes (workers.py) keep their own registry and send what
+# they recorded since the last frame back with each result; the web process
+# merges it into its registry, so uploads show up here too.
+
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+LOCK_BUCKETS = (0.000001, 0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def state(self):
+        with self.lock:
+            return list(self.counts), self.sum, self.count
+
+    def drain(self):
+        # state(), then start over from zero
+        with self.lock:
+            state = self.counts, self.sum, self.count
+            self.counts, self.sum, self.count = [0] * (len(self.buckets) + 1), 0.0, 0
+            return state
+
+    def merge(self, counts, total, count):
+        with self.lock:
+            self.counts = [a + b for a, b in zip(self.counts, counts)]
+            self.sum += total
+            self.count += count
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        counts, _, count = self.state()
+        if not count:
+            return 0.0
+        target, seen = q * count, 0
+        for bound, n in zip(self.buckets, counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float('inf')
+
+class Registry:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.stages = {}     # stage -> Histogram
+        self.lock_waits = {}  # lock name -> Histogram
+        self.processed = {}  # session -> frames
+        self.dropped = {}    # (session, reason) -> frames
+
+    def _histogram(self, table, key, buckets):
+        histogram = table.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = table.setdefault(key, Histogram(buckets))
+        return histogram
+
+    def observe(self, stage, seconds):
+        if self.enabled:
+            self._histogram(self.stages, stage, STAGE_BUCKETS).observe(seconds)
+
+    def lock_wait(self, name, seconds):
+        if self.enabled:
+            self._histogram(self.lock_waits, name, LOCK_BUCKETS).observe(seconds)
+
+    def frame_processed(self, session):
+        if self.enabled:
+            with self.lock:
+                self.processed[session] = self.processed.get(session, 0) + 1
+
+    def frame_dropped(self, session, reason, n=1):
+        if self.enabled:
+            with self.lock:
+                key = (session, reason)
+                self.dropped[key] = self.dropped.get(key, 0) + n
+
+    def drain(self):
+        # Stage and lock wait observations since the last drain, for merge()
+        # in another process's registry; {} when there are none
+        with self.lock:
+            tables = {"stages": dict(self.stages), "lock_wait": dict(self.lock_waits)}
+        drained = {}
+        for kind, table in tables.items():
+            for key, histogram in table.items():
+                counts, total, count = histogram.drain()
+                if count:
+                    drained.setdefault(kind, {})[key] = (counts, total, count)
+        return drained
+
+    def merge(self, drained):
+        if not self.enabled:
+            return
+        for key, state in drained.get("stages", {}).items():
+            self._histogram(self.stages, key, STAGE_BUCKETS).merge(*state)
+        for key, state in drained.get("lock_wait", {}).items():
+            self._histogram(self.lock_waits, key, LOCK_BUCKETS).merge(*state)
+
+    def forget(self, session):
+        # Drop a finished session's counters so the label set stays bounded
+        with self.lock:
+            self.processed.pop(session, None)
+            for key in [k for k in self.dropped if k[0] == session]:
+                del self.dropped[key]
+
+    def snapshot(self):
+        def summary(histogram):
+            counts, total, count = histogram.state()
+            return {
+                "count": count,
+                "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+                "p50_ms": histogram.quantile(0.5) * 1000,
+                "p99_ms": histogram.quantile(0.99) * 1000,
+                "buckets": dict(zip([str(b) for b in histogram.buckets] + ["+Inf"], counts)),
+            }
+
+        with self.lock:
+            stages, lock_waits = dict(self.stages), dict(self.lock_waits)
+            processed, dropped = dict(self.processed), dict(self.dropped)
+        sessions = {}
+        for session, n in processed.items():
+            sessions.setdefault(session, {"processed": 0, "dropped": {}})["processed"] = n
+        for (session, reason), n in dropped.items():
+            sessions.setdefault(session, {"processed": 0, "dropped": {}})["dropped"][reason] = n
+        return {
+            "enabled": self.enabled,
+            "stages": {stage: summary(h) for stage, h in sorted(stages.items())},
+            "lock_wait": {name: summary(h) for name, h in sorted(lock_waits.items())},
+            "sessions": sessions,
+        }
+
+    def prometheus(self):
+        lines = []
+
+        def histogram(name, help_text, label, table):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, h in sorted(table.items()):
+                counts, total, count = h.state()
+                cumulative = 0
+                for bound, n in zip(list(h.buckets) + ['+Inf'], counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{{label}="{escape(key)}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{label}="{escape(key)}"}} {total}')
+                lines.append(f'{name}_count{{{label}="{escape(key)}"}} {count}')
+
+        with self.lock:
+            stages, lock_waits = dict(self.stages), dict(self.lock_waits)
+            processed, dropped = dict(self.processed), dict(self.dropped)
+
+        histogram("smartspar_stage_seconds", "Time spent per frame in each pipeline stage.", "stage", stages)
+        histogram("smartspar_lock_wait_seconds", "Time spent waiting to acquire a lock.", "lock", lock_waits)
+        lines.append("# HELP smartspar_frames_processed_total Frames processed per session.")
+        lines.append("# TYPE smartspar_frames_processed_total counter")
+        for session, n in sorted(processed.items()):
+            lines.append(f'smartspar_frames_processed_total{{session="{escape(session)}"}} {n}')
+        lines.append("# HELP smartspar_frames_dropped_total Frames dropped per session and reason.")
+        lines.append("# TYPE smartspar_frames_dropped_total counter")
+        for (session, reason), n in sorted(dropped.items()):
+            lines.append(f'smartspar_frames_dropped_total{{session="{escape(session)}",reason="{reason}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class TimedLock:
+    # threading.Lock that records how long each acquire waited
+    def __init__(self, name, registry):
+        self.name = name
+        self.registry = registry
+        self.lock = threading.Lock()
+
+    def acquire(self, blocking=True, timeout=-1):
+        start = time.perf_counter()
+        acquired = self.lock.acquire(blocking, timeout)
+        self.registry.lock_wait(self.name, time.perf_counter() - start)
+        return acquired
+
+    def release(self):
+        self.lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+# Shared by the whole process
+registry = Registry()
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import deque
+import cv2
+import metrics
+
+# ---------------- LATEST-FRAME-WINS QUEUE ----------------
+class LatestQueue:
+    # Bounded queue that never blocks the producer: when full, the oldest item
+    # is dropped. A consumer that falls behind skips straight to fresh frames.
+    def __init__(self, maxsize=1, on_drop=None):
+        self.items = deque(maxlen=maxsize)
+        self.cond = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+        self.on_drop = on_drop
+
+    def put(self, item):
+        with self.cond:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+                if self.on_drop is not None:
+                    self.on_drop()
+            self.items.append(item)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        # Oldest queued item, or None on timeout / after close()
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.items or self.closed, timeout):
+                return None
+            return self.items.popleft() if self.items else None
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+# ---------------- FRAME PIPELINE ----------------
+class FramePipeline:
+    # capture -> pose inference -> JPEG encode, one thread per stage.
+    #
+    # Stages hand frames over through LatestQueues, so the slowest stage sets
+    # the frame rate instead of the sum of all three, and the camera buffer is
+    # drained continuously instead of piling up lag. Frames older than
+    # max_age when inference gets to them are dropped rather than processed
+    # late. Inference is paced to `fps` so a fast machine does not burn CPU on
+    # frames nobody will see. With encode=False there is no encode stage and
+    # frames() yields whatever processor.process_frame() returns. Drops are
+    # counted in /metrics under `session`.
+    def __init__(self, camera, processor, fps, max_age=None, encode=True, session=None):
+        self.camera = camera
+        self.processor = processor
+        self.interval = 1.0 / fps
+        self.max_age = max_age if max_age is not None else 2 * self.interval
+        self.session = session
+        self.captured = LatestQueue(on_drop=lambda: metrics.registry.frame_dropped(session, "capture_overrun"))
+        self.processed = LatestQueue(on_drop=lambda: metrics.registry.frame_dropped(session, "inference_overrun"))
+        self.output = LatestQueue(on_drop=lambda: metrics.registry.frame_dropped(session, "encode_overrun")) \
+            if encode else self.processed
+        self.encode = encode
+        self.running = threading.Event()
+        self.threads = []
+        self.stats = {"captured": 0, "processed": 0, "encoded": 0, "dropped_stale": 0}
+
+    def start(self):
+        self.running.set()
+        stages = (self._capture, self._infer, self._encode) if self.encode else (self._capture, self._infer)
+        for target in stages:
+            t = threading.Thread(target=target, name=f"pipeline-{target.__name__.strip('_')}", daemon=True)
+            t.start()
+            self.threads.append(t)
+        return self
+
+    def stop(self):
+        self.running.clear()
+        for q in {self.captured, self.processed, self.output}:
+            q.close()
+        for t in self.threads:
+            if t is not threading.current_thread():
+                t.join(timeout=1.0)
+        self.threads = []
+
+    def dropped(self):
+        queues = {self.captured, self.processed, self.output}
+        return self.stats["dropped_stale"] + sum(q.dropped for q in queues)
+
+    def _capture(self):
+        while self.running.is_set():
+            start = time.perf_counter()
+            success, frame = self.camera.read()
+            metrics.registry.observe("camera_read", time.perf_counter() - start)
+            if not success:
+                break
+            self.stats["captured"] += 1
+            self.captured.put((time.time(), frame))
+        # Camera gone: let the consumer see the end of the stream
+        self.running.clear()
+        self.output.close()
+
+    def _infer(self):
+        next_due = 0.0
+        while self.running.is_set():
+            # Wait for the next frame slot first, so the frame picked up is fresh
+            delay = next_due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            item = self.captured.get(timeout=0.5)
+            if item is None:
+                continue
+            captured_at, frame = item
+            if time.time() - captured_at > self.max_age:
+                self.stats["dropped_stale"] += 1
+                metrics.registry.frame_dropped(self.session, "stale")
+                continue
+            next_due = time.time() + self.interval
+            self.processed.put((captured_at, self.processor.process_frame(frame)))
+            self.stats["processed"] += 1
+
+    def _encode(self):
+        while self.running.is_set():
+            item = self.processed.get(timeout=0.5)
+            if item is None:
+                continue
+            captured_at, img = item
+            start = time.perf_counter()
+            ret, buffer = cv2.imencode('.jpg', img)
+            metrics.registry.observe("imencode", time.perf_counter() - start)
+            if ret:
+                self.output.put((captured_at, buffer.tobytes()))
+                self.stats["encoded"] += 1
+
+    def frames(self):
+        # Encoded JPEGs (or processed frames) for the consumer, until the pipeline stops
+        while self.running.is_set() or self.output.items:
+            item = self.output.get(timeout=0.5)
+            if item is not None:
+                yield item[1]
@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import OrderedDict
+
+# ---------------- PROCESSOR MANAGER ----------------
+class ProcessorManager:
+    # Bounded, LRU-ordered map of session id -> PoseProcessor.
+    #
+    # Sessions idle for longer than `ttl` seconds are evicted, and when more
+    # than `max_size` are live the least recently used idle ones go first.
+    # Evicting a processor hands its MediaPipe Pose graph back to a small pool
+    # (closing it if the pool is full), and new sessions take a warmed-up graph
+    # from that pool instead of paying graph initialisation again.
+    #
+    # A processor counts as active while it is being fed frames
+    # (PoseProcessor.last_active); processors active within `active_grace`
+    # seconds are never evicted, so a live stream is not pulled out from under
+    # its producer even if the map runs over max_size for a while. Processors
+    # pinned with pin() (the shared camera's, while its broadcaster runs) are
+    # never evicted at all until unpinned.
+    def __init__(self, make_processor, make_pose, max_size=32, ttl=600.0, pool_size=4, active_grace=5.0):
+        self.make_processor = make_processor  # (session_id, pose) -> PoseProcessor
+        self.make_pose = make_pose            # () -> mp_pose.Pose
+        self.max_size = max_size
+        self.ttl = ttl
+        self.pool_size = pool_size
+        self.active_grace = active_grace
+        self.lock = threading.Lock()
+        self.processors = OrderedDict()
+        self.last_used = {}
+        self.pose_pool = []
+        self.pins = {}  # session id -> pin count
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def prewarm(self, n=None):
+        # Fill the pose pool ahead of the first sessions
+        n = self.pool_size if n is None else min(n, self.pool_size)
+        poses = [self.make_pose() for _ in range(max(0, n - len(self.pose_pool)))]
+        with self.lock:
+            self.pose_pool.extend(poses)
+
+    def get(self, session_id):
+        now = time.time()
+        with self.lock:
+            processor = self.processors.get(session_id)
+            if processor is not None:
+                self.processors.move_to_end(session_id)
+                self.last_used[session_id] = now
+                return processor
+            pose = self.pose_pool.pop() if self.pose_pool else None
+
+        # Build outside the lock, graph initialisation takes a while
+        if pose is None:
+            pose = self.make_pose()
+            reused = False
+        else:
+            reused = True
+        processor = self.make_processor(session_id, pose)
+
+        with self.lock:
+            existing = self.processors.get(session_id)
+            if existing is not None:
+                # Another request created it first
+                self._release_pose(pose)
+                return existing
+            self.processors[session_id] = processor
+            self.last_used[session_id] = now
+            if reused:
+                self.reused += 1
+            else:
+                self.created += 1
+            evicted = self._collect_evictions(now)
+        self._close(evicted)
+        return processor
+
+    def peek(self, session_id):
+        # Existing processor without creating one or refreshing its LRU position
+        with self.lock:
+            return self.processors.get(session_id)
+
+    def pin(self, session_id):
+        # get() that also keeps the processor out of eviction until unpin()
+        with self.lock:
+            self.pins[session_id] = self.pins.get(session_id, 0) + 1
+        return self.get(session_id)
+
+    def unpin(self, session_id):
+        with self.lock:
+            count = self.pins.pop(session_id, 0) - 1
+            if count > 0:
+                self.pins[session_id] = count
+
+    def remove(self, session_id):
+        with self.lock:
+            processor = self.processors.pop(session_id, None)
+            self.last_used.pop(session_id, None)
+            if processor is not None:
+                self.evicted += 1
+        self._close([processor] if processor is not None else [])
+
+    def sweep(self):
+        with self.lock:
+            evicted = self._collect_evictions(time.time())
+        self._close(evicted)
+        return len(evicted)
+
+    def counts(self):
+        with self.lock:
+            return {
+                "live": len(self.processors),
+                "pinned": len(self.pins),
+                "pooled": len(self.pose_pool),
+                "evicted": self.evicted,
+                "created": self.created,
+                "reused": self.reused,
+                "max_size": self.max_size,
+            }
+
+    def _idle_for(self, session_id, now):
+        processor = self.processors[session_id]
+        last = max(self.last_used.get(session_id, 0), getattr(processor, "last_active", 0))
+        return now - last
+
+    def _collect_evictions(self, now):
+        # Called with the lock held; returns the processors to close
+        evicted = []
+        for session_id in list(self.processors):
+            if self.pins.get(session_id):
+                continue
+            idle = self._idle_for(session_id, now)
+            expired = idle > self.ttl
+            over = len(self.processors) > self.max_size and idle > self.active_grace
+            if expired or over:
+                evicted.append(self.processors.pop(session_id))
+                self.last_used.pop(session_id, None)
+                self.evicted += 1
+        return evicted
+
+    def _release_pose(self, pose):
+        # Called with the lock held
+        if pose is None:
+            return  # already detached (closed elsewhere), nothing to pool
+        if len(self.pose_pool) < self.pool_size:
+            if hasattr(pose, "reset"):
+                pose.reset()  # drop tracking state from the previous session
+            self.pose_pool.append(pose)
+        else:
+            pose.close()
+
+    def _close(self, processors):
+        for processor in processors:
+            pose = processor.detach_pose()
+            with self.lock:
+                self._release_pose(pose)
@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+import numpy as np
+
+# ---------------- LANDMARK RECORDINGS ----------------
+# A recording is the pose stream of one session, enough to replay the rules
+# exactly without a camera or MediaPipe (see replay.py).
+#
+# File layout (.sslm): a 16-byte header, b'SSLM', format version (uint16),
+# landmarks per frame (uint16) and 8 reserved bytes, followed by fixed-size
+# little-endian records, one per frame the processor saw:
+#
+#   t        float64           frame time in seconds (the processor's clock)
+#   kind     uint8             POSE, NOBODY (nobody in view), SKIPPED (adaptive
+#                              inference reused the last pose) or RESET (stats
+#                              were reset at t; not a frame)
+#   lm       float32 (33, 4)   x, y, z, visibility, zeros unless POSE
+#
+# 537 bytes per frame, about 58 MB per hour at 30 fps. Fixed-size records
+# mean a file can be read, or memory-mapped, with one np.fromfile call, and a
+# recording cut short by a crash loses at most its last partial record.
+# Version 1 files have the same layout without SKIPPED or RESET records.
+#
+# When the session ends, the processor's counters go to <recording>.json,
+# what the live session counted, to check replays against (replay.py --check).
+
+MAGIC = b'SSLM'
+FORMAT_VERSION = 2
+READ_VERSIONS = (1, 2)
+HEADER_SIZE = 16
+N_LANDMARKS = 33
+EXTENSION = '.sslm'
+
+NOBODY, POSE, SKIPPED, RESET = 0, 1, 2, 3
+
+RECORD = np.dtype([('t', '<f8'), ('kind', 'u1'), ('lm', '<f4', (N_LANDMARKS, 4))])
+
+def header():
+    head = np.zeros(HEADER_SIZE, dtype=np.uint8)
+    head[:4] = np.frombuffer(MAGIC, dtype=np.uint8)
+    head[4:8] = np.array([FORMAT_VERSION, N_LANDMARKS], dtype='<u2').view(np.uint8)
+    return head.tobytes()
+
+class Recorder:
+    # Appends one record per frame; buffered, flushed on close()
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(header())
+        self.record = np.zeros(1, dtype=RECORD)
+        self.lock = threading.Lock()
+        self.frames = 0
+
+    def write(self, t, lm, kind=None):
+        # `kind` defaults to POSE, or NOBODY when lm is None
+        with self.lock:
+            if self.file is None:
+                return
+            self.record['t'] = t
+            self.record['kind'] = kind if kind is not None else NOBODY if lm is None else POSE
+            self.record['lm'] = 0 if lm is None else lm
+            self.file.write(self.record.tobytes())
+            self.frames += 1
+
+    def close(self, summary=None):
+        # `summary`: the processor's counters at the end, saved alongside
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+                if summary is not None:
+                    with open(summary_path(self.path), 'w') as f:
+                        json.dump(summary, f)
+
+def summary_path(path):
+    return path + '.json'
+
+def read_summary(path):
+    # What the live session counted, None if it never ended cleanly
+    try:
+        with open(summary_path(path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def session_path(directory, session_id, started):
+    safe = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in str(session_id))
+    return os.path.join(directory, f"{safe}-{int(started)}{EXTENSION}")
+
+def read_recording(path, mmap=False):
+    # Structured array of records (fields t, present, lm)
+    with open(path, 'rb') as f:
+        head = f.read(HEADER_SIZE)
+    if len(head) < HEADER_SIZE or head[:4] != MAGIC:
+        raise ValueError(f"{path} is not a landmark recording")
+    version, n_landmarks = np.frombuffer(head[4:8], dtype='<u2')
+    if version not in READ_VERSIONS or n_landmarks != N_LANDMARKS:
+        raise ValueError(f"{path}: unsupported recording format {version} ({n_landmarks} landmarks)")
+    count = (os.path.getsize(path) - HEADER_SIZE) // RECORD.itemsize
+    if mmap:
+        return np.memmap(path, dtype=RECORD, mode='r', offset=HEADER_SIZE, shape=(count,))
+    return np.fromfile(path, dtype=RECORD, count=count, offset=HEADER_SIZE)
+
+def write_recording(path, times, lms, kind=None):
+    # Whole recording at once, e.g. for synthetic test streams; every record
+    # a POSE unless `kind` says otherwise
+    records = np.zeros(len(times), dtype=RECORD)
+    records['t'] = times
+    records['lm'] = lms
+    records['kind'] = POSE if kind is None else kind
+    with open(path, 'wb') as f:
+        f.write(header())
+        f.write(records.tobytes())
+    return path
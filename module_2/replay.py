@@ -0,0 +1,173 @@
+import argparse
+import json
+import time
+import numpy as np
+import landmarks
+import recording
+
+# Deterministic replay of landmark recordings through the punch rules.
+#
+#   python replay.py session.sslm                      detections + frames/s
+#   python replay.py session.sslm --repeat 20          longer timing run
+#   python replay.py session.sslm --output run.json
+#   python replay.py session.sslm --compare run.json   did a rule change alter behaviour?
+#   python replay.py session.sslm --check              live, processor and batch agree?
+#
+# 'processor' mode feeds every recorded pose through PoseProcessor.score()
+# (and skipped frames through skip(), resets through reset_stats()) with the
+# clock pinned to the recorded timestamps, so counts, cooldowns and guard
+# time come out exactly as they did live. 'batch' mode runs the vectorized
+# detector (landmarks.punch_sequence) over the whole recording and reports
+# raw detections, before the per-name count cooldown. --check applies that
+# cooldown to the batch detections and compares the punch counts of both
+# modes with what the live session counted (the recording's .json summary).
+# Recordings are made by setting SMARTSPAR_RECORD_DIR (see recording.py).
+
+class ReplayClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class NoPose:
+    # Stands in for the MediaPipe graph: replays never run inference
+    def process(self, image):
+        raise RuntimeError("replay has no pose model")
+
+    def close(self):
+        pass
+
+def replay_processor(records):
+    from app import PoseProcessor
+
+    clock = ReplayClock(float(records['t'][0]) if len(records) else 0.0)
+    processor = PoseProcessor("replay", pose=NoPose(), record_timeline=True, clock=clock, record=False)
+    lms, times, kinds = records['lm'], records['t'], records['kind']
+    for i in range(len(records)):
+        clock.now = float(times[i])
+        if kinds[i] == recording.SKIPPED:
+            processor.skip(clock.now)
+        elif kinds[i] == recording.RESET:
+            processor.reset_stats()
+        else:
+            processor.score(np.asarray(lms[i]) if kinds[i] == recording.POSE else None, clock.now)
+    detections = [{"time": e["time"], "type": e["type"], "hand": e["hand"]} for e in processor.timeline]
+    return detections, processor.get_stats()
+
+def replay_batch(records):
+    kinds = records['kind']
+    pose = kinds == recording.POSE
+    # Poses numbered like PoseProcessor.frame_index: skipped frames count,
+    # frames with nobody in view and resets do not
+    frames = np.cumsum(pose | (kinds == recording.SKIPPED)) - 1
+    times = records['t'][pose]
+    _, punches = landmarks.punch_sequence(records['lm'][pose], times, frames=frames[pose])
+    return [{"time": round(float(times[i]), 3), "type": landmarks.PUNCH_NAMES[key], "hand": hand}
+            for i, key, hand in punches]
+
+def counted(detections, records, cooldown=landmarks.COUNT_COOLDOWN):
+    # Punch counts from raw detections the way PoseProcessor counts them: the
+    # same punch again within `cooldown` seconds is not counted, and only
+    # punches after the recording's last stats reset remain (a reset is
+    # stamped with the last frame before it; detection times are rounded)
+    counts = dict.fromkeys(landmarks.PUNCH_NAMES.values(), 0)
+    resets = records['t'][records['kind'] == recording.RESET]
+    since = round(float(resets[-1]), 3) if len(resets) else float('-inf')
+    last_name, last_time = None, float('-inf')
+    for d in detections:
+        if d["time"] - last_time > cooldown or d["type"] != last_name:
+            last_name, last_time = d["type"], d["time"]
+            if d["time"] > since:
+                counts[d["type"]] += 1
+    return counts
+
+def check(path):
+    # Punch counts per source: 'live' from the recording's summary (None if
+    # the session did not end cleanly), 'processor' and 'batch' replayed
+    records = recording.read_recording(path)
+    summary = recording.read_summary(path)
+    _, stats = replay_processor(records)
+    return {
+        "live": summary["punch_counts"] if summary is not None else None,
+        "processor": stats["punch_counts"],
+        "batch": counted(replay_batch(records), records),
+    }
+
+def run(path, mode='processor', repeat=1):
+    records = recording.read_recording(path)
+    if mode == 'processor':
+        import app  # loads MediaPipe; keep it out of the timing
+    start = time.perf_counter()
+    for _ in range(repeat):
+        if mode == 'processor':
+            detections, stats = replay_processor(records)
+        else:
+            detections, stats = replay_batch(records), None
+    elapsed = time.perf_counter() - start
+    frames = len(records) * repeat
+    span = float(records['t'][-1] - records['t'][0]) if len(records) > 1 else 0.0
+    return {
+        "recording": path,
+        "mode": mode,
+        "frames": len(records),
+        "recorded_seconds": round(span, 3),
+        "detections": detections,
+        "stats": stats,
+        "frames_per_second": round(frames / elapsed, 1) if elapsed > 0 else None,
+        "realtime_factor": round(span * repeat / elapsed, 1) if elapsed > 0 else None,
+    }
+
+def compare(baseline, result):
+    # Detections that appear in only one of the two runs
+    key = lambda d: (d["time"], d["type"], d["hand"])
+    before, after = set(map(key, baseline["detections"])), set(map(key, result["detections"]))
+    return sorted(before - after), sorted(after - before)
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a landmark recording through the punch rules')
+    parser.add_argument('recording')
+    parser.add_argument('--mode', choices=['processor', 'batch'], default='processor')
+    parser.add_argument('--repeat', type=int, default=1, help='replay this many times for timing')
+    parser.add_argument('--output', default=None, help='write detections and timing as JSON')
+    parser.add_argument('--compare', default=None, metavar='JSON', help='diff detections against an earlier --output')
+    parser.add_argument('--check', action='store_true', help='compare punch counts of live, processor and batch')
+    args = parser.parse_args()
+
+    if args.check:
+        counts = check(args.recording)
+        names = list(landmarks.PUNCH_NAMES.values())
+        print(f"{'source':>10} " + " ".join(f"{n:>9}" for n in names))
+        for source, c in counts.items():
+            print(f"{source:>10} " + (" ".join(f"{c[n]:>9}" for n in names) if c is not None else "no summary"))
+        agree = len({tuple(sorted(c.items())) for c in counts.values() if c is not None}) == 1
+        print("counts agree" if agree else "counts differ")
+        raise SystemExit(0 if agree else 1)
+
+    result = run(args.recording, args.mode, args.repeat)
+    for d in result["detections"]:
+        print(f"{d['time']:>12.3f}  {d['type']:<9} {d['hand']}")
+    print(f"{len(result['detections'])} detections in {result['frames']} frames "
+          f"({result['recorded_seconds']}s recorded), {result['frames_per_second']} frames/s, "
+          f"{result['realtime_factor']}x real time")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        missing, added = compare(baseline, result)
+        for d in missing:
+            print(f"- {d[0]:>10.3f}  {d[1]:<9} {d[2]}")
+        for d in added:
+            print(f"+ {d[0]:>10.3f}  {d[1]:<9} {d[2]}")
+        print("detections unchanged" if not missing and not added
+              else f"{len(missing)} missing, {len(added)} new vs {args.compare}")
+        if missing or added:
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+# ---------------- BROWSER SESSIONS ----------------
+class SessionEntry:
+    def __init__(self, source):
+        self.source = source     # processor key the session reads its stats from
+        self.processor = None    # weakref to the processor the baseline belongs to
+        self.baseline = None     # PoseProcessor.counters() at join/reset, None for the processor's start
+        self.last_seen = time.time()
+        self.streams = 0         # open /video_feed or /pose_stream connections
+
+class SessionTable:
+    # Bounded, LRU-ordered map of browser session id -> SessionEntry.
+    #
+    # Many sessions can read one shared processor (the camera). Each keeps a
+    # baseline of that processor's counters, so its stats cover what happened
+    # since it joined or last reset, and resetting one session never touches
+    # the others. Entries with an open stream are kept; others are dropped
+    # once idle (no request, no stream) for longer than `ttl` seconds, least
+    # recently seen first past `max_size`. A session that comes back after
+    # that simply starts from a new baseline.
+    def __init__(self, ttl=600.0, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.evicted = 0
+
+    def join(self, session_id, source, processor=None):
+        # Session `session_id` reads `source` from now on. With the source's
+        # live processor given, its stats start from that processor's current
+        # counters; rejoining the same processor (a page reload) keeps them.
+        with self.lock:
+            entry = self._touch(session_id)
+            if entry is None or entry.source != source:
+                entry = self.entries[session_id] = SessionEntry(source)
+                self.entries.move_to_end(session_id)
+            if processor is not None and not self._owns(entry, processor):
+                entry.processor = weakref.ref(processor)
+                entry.baseline = processor.counters()
+            self._evict()
+            return entry
+
+    def stream_opened(self, session_id):
+        with self.lock:
+            entry = self._touch(session_id)
+            if entry is not None:
+                entry.streams += 1
+
+    def stream_closed(self, session_id):
+        # The idle time of a session starts when its last stream ends
+        with self.lock:
+            entry = self._touch(session_id)
+            if entry is not None:
+                entry.streams = max(0, entry.streams - 1)
+
+    def source(self, session_id, default=None):
+        with self.lock:
+            entry = self._touch(session_id)
+            return entry.source if entry is not None and entry.source is not None else default
+
+    def counters(self, session_id, processor, reset=False):
+        # (baseline, current counters) of `processor` for this session, then
+        # with reset=True the baseline moves up to the current counters
+        counters = processor.counters()
+        with self.lock:
+            entry = self._touch(session_id)
+            if entry is None:
+                entry = self.entries[session_id] = SessionEntry(None)
+                self._evict()
+            if not self._owns(entry, processor):
+                # First read, or the processor was evicted and rebuilt since
+                entry.processor, entry.baseline = weakref.ref(processor), None
+            baseline = entry.baseline
+            if reset:
+                entry.baseline = counters
+            return baseline, counters
+
+    def baseline(self, session_id, processor):
+        # The session's baseline without reading the processor, for counters
+        # captured elsewhere (ProcessedFrame.counters)
+        with self.lock:
+            entry = self.entries.get(session_id)
+            if entry is None or not self._owns(entry, processor):
+                return None
+            return entry.baseline
+
+    def pop(self, session_id):
+        with self.lock:
+            return self.entries.pop(session_id, None)
+
+    def sweep(self):
+        with self.lock:
+            return self._evict()
+
+    def counts(self):
+        with self.lock:
+            return {"live": len(self.entries), "streaming": sum(1 for e in self.entries.values() if e.streams),
+                    "evicted": self.evicted, "max_size": self.max_size}
+
+    def _owns(self, entry, processor):
+        return entry.processor is not None and entry.processor() is processor
+
+    def _touch(self, session_id):
+        # Called with the lock held
+        entry = self.entries.get(session_id)
+        if entry is not None:
+            entry.last_seen = time.time()
+            self.entries.move_to_end(session_id)
+        return entry
+
+    def _evict(self):
+        # Called with the lock held; least recently seen entries come first
+        now, evicted = time.time(), 0
+        for session_id, entry in list(self.entries.items()):
+            if entry.streams:
+                continue
+            if now - entry.last_seen > self.ttl or len(self.entries) > self.max_size:
+                del self.entries[session_id]
+                evicted += 1
+        self.evicted += evicted
+        return evicted
@@ -0,0 +1,206 @@
+import glob
+import os
+import time
+import cv2
+import numpy as np
+
+# ---------------- FRAME SOURCES ----------------
+# Anything with cv2.VideoCapture's isOpened()/read()/release() can feed the
+# camera producer. Besides physical cameras there are sources for machines
+# without a webcam (CI, benchmarks, load tests), selected with
+# SMARTSPAR_CAMERA (see open_source):
+#
+#   synthetic              a drawn boxer throwing hooks and uppercuts
+#   video:clip.mp4         a recorded video, looped
+#   images:frames/         an image sequence (directory or glob), looped
+#
+# These are paced to their frame rate like a real device, so the pipeline
+# downstream sees the same timing it would live (paced=False reads them as
+# fast as they come, e.g. to pre-render frames).
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+class PacedSource:
+    # Base class: subclasses implement next_frame() -> image or None at end
+    def __init__(self, fps, frames=None, paced=True):
+        self.interval = 1.0 / fps
+        self.frames = frames  # stop after this many, None for endless
+        self.paced = paced
+        self.count = 0
+        self.next_due = None
+        self.opened = True
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self):
+        if not self.opened or (self.frames is not None and self.count >= self.frames):
+            return False, None
+        # Block until the next frame is due; a consumer that fell behind is
+        # not owed a burst of catch-up frames
+        if self.paced:
+            now = time.perf_counter()
+            if self.next_due is None:
+                self.next_due = now
+            elif self.next_due > now:
+                time.sleep(self.next_due - now)
+            self.next_due = max(self.next_due + self.interval, time.perf_counter() - self.interval)
+        frame = self.next_frame()
+        if frame is None:
+            return False, None
+        self.count += 1
+        return True, frame
+
+    def release(self):
+        self.opened = False
+
+    def next_frame(self):
+        raise NotImplementedError
+
+# The synthetic boxer's arms as (seconds, elbow, fist) keyframes, positions in
+# pixels of a 640x480 frame: x outward from the body's centre line, y down.
+# Elbow and fist are interpolated linearly in between, and the first arm
+# repeats the combination every COMBINATION_SECONDS, the other one
+# ARM_OFFSET seconds later: from the guard a hook (wind up, then the fist
+# sweeps across with the elbow near 90 degrees) and an uppercut (the fist
+# drops below the chest and comes up fast). MediaPipe finds the figure in
+# every frame, and at 24-30 fps the rules count each hook and uppercut;
+# jabs and crosses need a depth the flat drawing does not give.
+COMBINATION_SECONDS = 4.0
+ARM_OFFSET = 0.8
+GUARD = ((85, 225), (40, 130))
+HOOK = [((130, 160), (130, 90)), ((96, 120), (65, 90)), ((72, 110), (0, 90))]
+UPPERCUT = [((80, 265), (50, 325)), ((75, 245), (35, 135))]
+COMBINATION = [(0.0, *GUARD), (0.6, *GUARD), (0.75, *HOOK[0]), (0.82, *HOOK[1]), (0.9, *HOOK[2]),
+               (1.3, *GUARD), (2.2, *GUARD), (2.4, *UPPERCUT[0]), (2.52, *UPPERCUT[1]), (2.9, *GUARD)]
+
+SKIN, SHIRT, SHORTS, HAIR, GLOVE = (140, 170, 215), (60, 60, 170), (150, 80, 40), (30, 30, 40), (40, 40, 200)
+
+class SyntheticCamera(PacedSource):
+    # A boxer throwing the combination above, generated per frame so every
+    # stage downstream does real work: pose inference finds a pose and the
+    # guard and punch rules run on it, as they would on a real athlete
+    def __init__(self, width=640, height=480, fps=30, frames=None, paced=True):
+        super().__init__(fps, frames, paced)
+        self.width = width
+        self.height = height
+        keys = COMBINATION + [(COMBINATION_SECONDS, *GUARD)]
+        self.key_times = np.array([k[0] for k in keys])
+        self.key_points = np.array([(*elbow, *fist) for _, elbow, fist in keys], dtype=np.float64)
+
+    def next_frame(self):
+        return self.render(self.count * self.interval)
+
+    def arm(self, t):
+        # (elbow, fist) offsets of an arm `t` seconds into its combination
+        t %= COMBINATION_SECONDS
+        ex, ey, fx, fy = (np.interp(t, self.key_times, self.key_points[:, i]) for i in range(4))
+        return (ex, ey), (fx, fy)
+
+    def render(self, t):
+        # One frame of the figure at time t seconds, drawn at 640x480 and
+        # scaled to the frame's height about its centre line
+        w, h = self.width, self.height
+        img = np.full((h, w, 3), (90, 110, 130), dtype=np.uint8)
+        cx, s = w // 2, h / 480
+
+        def at(x, y):
+            return int(cx + x * s), int(y * s)
+
+        def px(n):
+            return max(1, int(n * s))
+
+        cv2.rectangle(img, (0, int(h * 0.75)), (w, h), (60, 70, 80), -1)  # floor
+        for side in (-1, 1):
+            cv2.line(img, at(side * 25, 300), at(side * 45, 380), SKIN, px(26))
+            cv2.line(img, at(side * 45, 380), at(side * 50, 460), SKIN, px(22))
+        cv2.rectangle(img, at(-50, 280), at(50, 330), SHORTS, -1)
+        cv2.fillPoly(img, [np.array([at(-60, 150), at(60, 150), at(45, 290), at(-45, 290)])], SHIRT)
+        cv2.line(img, at(0, 120), at(0, 150), SKIN, px(26))
+        # A face (eyes, brows, ears, nose, mouth) is what the pose detector keys on
+        cv2.ellipse(img, at(0, 95), (px(30), px(38)), 0, 0, 360, SKIN, -1)
+        cv2.ellipse(img, at(0, 70), (px(31), px(22)), 0, 180, 360, HAIR, -1)
+        for side in (-1, 1):
+            cv2.ellipse(img, at(side * 11, 90), (px(6), px(4)), 0, 0, 360, (255, 255, 255), -1)
+            cv2.circle(img, at(side * 11, 90), px(3), (40, 30, 20), -1)
+            cv2.line(img, at(side * 18, 80), at(side * 5, 79), HAIR, px(2))
+            cv2.ellipse(img, at(side * 31, 95), (px(5), px(9)), 0, 0, 360, SKIN, -1)
+        cv2.line(img, at(0, 92), at(-3, 106), (100, 120, 170), px(2))
+        cv2.ellipse(img, at(0, 116), (px(10), px(4)), 0, 0, 180, (80, 80, 160), px(2))
+        # The figure's left arm (image right) leads
+        for side, delay in ((1, 0.0), (-1, ARM_OFFSET)):
+            (ex, ey), (fx, fy) = self.arm(t - delay)
+            shoulder, elbow, fist = at(side * 58, 160), at(side * ex, ey), at(side * fx, fy)
+            cv2.line(img, shoulder, elbow, SKIN, px(22))
+            cv2.line(img, elbow, fist, SKIN, px(20))
+            cv2.circle(img, fist, px(17), GLOVE, -1)
+        cv2.putText(img, f"synthetic {self.count}", (10, h - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (160, 160, 160), 1)
+        return img
+
+class VideoFileSource(PacedSource):
+    # A recorded clip at its own frame rate (or `fps`), from the start again
+    # when it ends if `loop` is set
+    def __init__(self, path, fps=None, loop=True, frames=None, paced=True):
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise ValueError(f"cannot open video {path}")
+        super().__init__(fps or self.capture.get(cv2.CAP_PROP_FPS) or 30, frames, paced)
+        self.path = path
+        self.loop = loop
+
+    def next_frame(self):
+        success, frame = self.capture.read()
+        if not success and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.capture.read()
+        return frame if success else None
+
+    def release(self):
+        super().release()
+        self.capture.release()
+
+class ImageSequenceSource(PacedSource):
+    # Still images in name order: a directory, or a glob like frames/*.png
+    def __init__(self, pattern, fps=30, loop=True, frames=None, paced=True):
+        super().__init__(fps, frames, paced)
+        if os.path.isdir(pattern):
+            paths = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            paths = glob.glob(pattern)
+        self.paths = sorted(p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS))
+        if not self.paths:
+            raise ValueError(f"no images match {pattern}")
+        self.loop = loop
+        self.index = 0
+
+    def next_frame(self):
+        if self.index >= len(self.paths):
+            if not self.loop:
+                return None
+            self.index = 0
+        frame = cv2.imread(self.paths[self.index])
+        self.index += 1
+        return frame
+
+def open_source(spec, fps=None, paced=True):
+    # A frame source for a SMARTSPAR_CAMERA value other than 'auto' or a
+    # device number (those are physical cameras, see app.open_camera),
+    # delivering `fps` frames per second: by default a video's own rate,
+    # 30 for the others
+    kind, _, arg = spec.partition(':')
+    if kind == 'synthetic':
+        if arg:
+            width, height = (int(v) for v in arg.lower().split('x'))
+            return SyntheticCamera(width, height, fps=fps or 30, paced=paced)
+        return SyntheticCamera(fps=fps or 30, paced=paced)
+    if kind == 'video':
+        return VideoFileSource(arg, fps=fps, paced=paced)
+    if kind == 'images':
+        return ImageSequenceSource(arg, fps=fps or 30, paced=paced)
+    # A bare path: tell videos from image sequences by what it points to
+    if spec.lower().endswith(VIDEO_EXTENSIONS):
+        return VideoFileSource(spec, fps=fps, paced=paced)
+    if os.path.isdir(spec) or glob.has_magic(spec):
+        return ImageSequenceSource(spec, fps=fps or 30, paced=paced)
+    raise ValueError(f"unknown frame source {spec!r}")
@@ -1,39 +1,18 @@
 let localStream = null;
-let socket = null;
 let statsInterval = null;
 
+// Frames the page may have waiting on the server; the server drops anything
+// beyond its own per-session limit with a 429
+const MAX_IN_FLIGHT = 2;
+const UPLOAD_WIDTH = 640;
+const UPLOAD_QUALITY = 0.7;
+
 document.addEventListener('DOMContentLoaded', function() {
     const startButton = document.getElementById('startButton');
     const stopButton = document.getElementById('stopButton');
     const video = document.getElementById('video');
     const feedback = document.getElementById('feedback');
     
-    // Connect to Socket.IO
-    socket = io({
-        query: {
-            session_id: sessionId
-        }
-    });
-    
-    socket.on('connected', function(data) {
-        console.log('Connected to server:', data);
-        feedback.textContent = 'Connected to server';
-        feedback.className = 'feedback-badge alert alert-success';
-    });
-    
-    socket.on('processed_frame', function(data) {
-        // Update video frame
-        video.src = data.image;
-        
-        // Update stats
-        updateStats(data.stats);
-    });
-    
-    socket.on('disconnect', function() {
-        feedback.textContent = 'Disconnected from server';
-        feedback.className = 'feedback-badge alert alert-danger';
-    });
-    
     startButton.addEventListener('click', async function() {
         try {
             // Get user media
@@ -83,29 +62,46 @@ document.addEventListener('DOMContentLoaded', function() {
         if (localStream) {
             localStream.getTracks().forEach(track => track.stop());
         }
-        if (socket) {
-            socket.disconnect();
-        }
     });
 });
 
 function startSendingFrames() {
     const video = document.getElementById('video');
+    const feedback = document.getElementById('feedback');
     const canvas = document.createElement('canvas');
     const ctx = canvas.getContext('2d');
+    let inFlight = 0;
     
-    canvas.width = 640;  // Reduced resolution for performance
-    canvas.height = 480;
+    function sendFrame(blob) {
+        inFlight++;
+        fetch('upload_frame', {
+            method: 'POST',
+            headers: { 'Content-Type': 'image/jpeg' },
+            body: blob
+        })
+            .then(response => response.ok ? response.json() : null)
+            .then(result => {
+                // null: dropped or failed on the server, just send the next frame
+                if (result && result.stats) {
+                    feedback.textContent = result.feedback;
+                    updateStats(result.stats);
+                }
+            })
+            .catch(error => console.error('Error uploading frame:', error))
+            .finally(() => { inFlight--; });
+    }
     
     function captureFrame() {
         if (!localStream) return;
         
         try {
-            ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
-            const imageData = canvas.toDataURL('image/jpeg', 0.7);
-            
-            // Send frame to server
-            socket.emit('frame', { image: imageData });
+            if (inFlight < MAX_IN_FLIGHT && video.videoWidth) {
+                // Downscale before encoding, pose detection does not need full resolution
+                canvas.width = UPLOAD_WIDTH;
+                canvas.height = Math.round(UPLOAD_WIDTH * video.videoHeight / video.videoWidth);
+                ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
+                canvas.toBlob(blob => { if (blob) sendFrame(blob); }, 'image/jpeg', UPLOAD_QUALITY);
+            }
             
             // Continue capturing
             requestAnimationFrame(captureFrame);
@@ -140,7 +136,7 @@ function updateStats(stats) {
 }
 
 function updateStatsFromServer() {
-    fetch('/stats')
+    fetch('stats')
         .then(response => response.json())
         .then(updateStats)
         .catch(error => console.error('Error fetching stats:', error));
@@ -0,0 +1,120 @@
+import base64
+import json
+import threading
+import time
+import cv2
+import numpy as np
+import metrics
+
+# ---------------- PROCESSED FRAMES ----------------
+# What a camera producer hands to its viewers (see broadcast.py). Video
+# viewers read .jpeg, and the frame is JPEG-encoded at most once, by the
+# first of them. Landmark viewers read .pose and .stats, so a camera watched
+# only through /pose_stream is never encoded at all.
+
+class ProcessedFrame:
+    def __init__(self, img, pose=None, stats=None, counters=None):
+        self.img = img
+        self.pose = pose    # PoseProcessor.pose_event() for this frame
+        self.stats = stats  # get_stats() when it changed with this frame, else None
+        self.counters = counters  # the counters() those stats came from
+        self.lock = threading.Lock()
+        self._jpeg = None
+
+    @property
+    def encoded(self):
+        return self._jpeg is not None
+
+    @property
+    def jpeg(self):
+        with self.lock:
+            if self._jpeg is None:
+                start = time.perf_counter()
+                ret, buffer = cv2.imencode('.jpg', self.img)
+                self._jpeg = buffer.tobytes()
+                metrics.registry.observe("imencode", time.perf_counter() - start)
+            return self._jpeg
+
+class FrameAnalyzer:
+    # Wraps a PoseProcessor so process_frame() returns a ProcessedFrame with
+    # the pose and (changed) stats captured in the same thread as the frame.
+    # Stats are recomputed when a counter changes, and at most every
+    # `stats_every` seconds otherwise for the time-based values.
+    def __init__(self, processor, stats_every=1.0):
+        self.processor = processor
+        self.stats_every = stats_every
+        self.version = None
+        self.stats_at = 0.0
+
+    def process_frame(self, frame):
+        img = self.processor.process_frame(frame)
+        now = time.time()
+        stats = counters = None
+        if self.processor.version != self.version or now - self.stats_at >= self.stats_every:
+            self.version = self.processor.version
+            self.stats_at = now
+            counters = self.processor.counters()
+            stats = self.processor.stats_since(None, counters)
+        return ProcessedFrame(img, self.processor.pose_event(), stats, counters)
+
+# ---------------- POSE EVENTS ----------------
+# Server-Sent Events for the browser-drawn overlay:
+#
+#   event: pose   {"t": 1700000000.123, "lm": "<base64>", "feedback": [text, [b, g, r]]}
+#   event: stats  only the get_stats() keys that changed since the last one sent
+#
+# "lm" packs x, y and visibility of the 33 landmarks as little-endian int16
+# in units of 1/10000 (264 characters), or is null when nobody is in view;
+# "feedback" is only sent when it changes. A 640x480 MJPEG frame is tens of
+# kilobytes, one pose event a few hundred bytes.
+
+LANDMARK_SCALE = 10000
+
+def encode_landmarks(lm):
+    if lm is None:
+        return None
+    packed = np.clip(np.rint(lm[:, [0, 1, 3]] * LANDMARK_SCALE), -32768, 32767).astype('<i2')
+    return base64.b64encode(packed.tobytes()).decode('ascii')
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+def stats_delta(previous, stats):
+    return {k: v for k, v in stats.items() if previous.get(k) != v}
+
+class PoseEventEncoder:
+    # SSE chunks for one client, shared by the threaded and asyncio servers:
+    # start() once, then feed() every ProcessedFrame. `view` turns a frame's
+    # counters into the stats this client sees (its session's share of a
+    # shared processor); without it the processor's own stats are sent.
+    def __init__(self, initial_stats, landmarks=True, view=None):
+        self.sent_stats = dict(initial_stats)
+        self.landmarks = landmarks
+        self.view = view
+        self.feedback = None
+
+    def start(self):
+        return sse_event('stats', self.sent_stats)
+
+    def feed(self, frame):
+        chunks = []
+        if frame.stats is not None:
+            stats = frame.stats if self.view is None or frame.counters is None else self.view(frame.counters)
+            delta = stats_delta(self.sent_stats, stats)
+            if delta:
+                self.sent_stats.update(delta)
+                chunks.append(sse_event('stats', delta))
+        if self.landmarks and frame.pose is not None:
+            event = {"t": round(frame.pose["time"], 3), "lm": encode_landmarks(frame.pose["landmarks"])}
+            if frame.pose["feedback"] != self.feedback:
+                self.feedback = frame.pose["feedback"]
+                event["feedback"] = self.feedback
+            chunks.append(sse_event('pose', event))
+        return chunks
+
+def pose_events(frames, initial_stats, landmarks=True, view=None):
+    # SSE byte chunks for one client from a stream of ProcessedFrames
+    encoder = PoseEventEncoder(initial_stats, landmarks, view)
+    yield encoder.start()
+    for frame in frames:
+        yield from encoder.feed(frame)
@@ -0,0 +1,262 @@
+import itertools
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+import cv2
+import numpy as np
+from processor_pool import ProcessorManager
+import metrics
+
+# ---------------- POSE WORKER POOL ----------------
+# Frames uploaded by browsers are decoded and run through MediaPipe in worker
+# processes, so pose inference for many athletes spreads over every core
+# instead of queueing behind the GIL in the web process.
+#
+# Each worker owns its own Pose graphs and PoseProcessors. A session is always
+# routed to the same worker (crc32 of the session id), so its lw_buf/rw_buf,
+# cooldowns and counters live in exactly one place and see its frames in
+# order. The web process only keeps the latest result per session, for as
+# long as the worker keeps the session itself (`ttl`, `max_sessions` each).
+
+def _worker_main(inbox, outbox, max_sessions, ttl, pool_size):
+    # Imported here so the web process does not pay for it per worker, and a
+    # spawned worker gets its own MediaPipe state. Under gateway.py every
+    # module directory is on sys.path with its own app.py, so put ours first.
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from app import PoseProcessor, create_pose
+
+    cv2.setNumThreads(1)  # one core per worker, the pool provides the parallelism
+    processors = ProcessorManager(
+        make_processor=lambda session_id, pose: PoseProcessor(session_id, pose=pose),
+        make_pose=create_pose,
+        max_size=max_sessions,
+        ttl=ttl,
+        pool_size=pool_size,
+    )
+    while True:
+        msg = inbox.get()
+        if msg is None:
+            break
+        ticket, command, session_id, payload = msg
+        try:
+            if command == 'frame':
+                start = time.perf_counter()
+                frame = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+                metrics.registry.observe("imdecode", time.perf_counter() - start)
+                if frame is None:
+                    result = {"error": "could not decode image"}
+                else:
+                    processor = processors.get(session_id)
+                    processor.process_frame(frame)
+                    result = {"feedback": processor.feedback_text, "pose": processor.last_pose is not None,
+                              "stats": processor.get_stats()}
+                # This frame's stage timings, merged into the web process's
+                # /metrics (see _collect)
+                timings = metrics.registry.drain()
+                if timings:
+                    result["timings"] = timings
+            elif command == 'stats':
+                # No frames yet (or evicted): nothing to report, and no Pose
+                # graph worth building to say so
+                processor = processors.peek(session_id)
+                result = {"stats": processor.get_stats() if processor is not None else None}
+            elif command == 'reset':
+                processor = processors.peek(session_id)
+                if processor is None:
+                    result = {"status": "success", "message": "Stats reset successfully", "stats": None}
+                else:
+                    result = processor.reset_stats()
+                    result["stats"] = processor.get_stats()
+            elif command == 'end':
+                processor = processors.peek(session_id)
+                result = {"stats": processor.get_stats() if processor is not None else None}
+                processors.remove(session_id)
+            else:
+                result = {"error": f"unknown command {command!r}"}
+        except Exception as e:
+            result = {"error": str(e)}
+        outbox.put((ticket, session_id, result))
+
+class PoseWorkerPool:
+    # Parent side of the worker processes. submit_frame() never blocks on a busy
+    # worker: a session may have at most `queue_size` frames in flight and
+    # anything beyond that is dropped, so a fast client cannot build up lag or
+    # starve the other sessions sharing its worker. Only frames count as in
+    # flight; stats/reset/end requests never take a frame's place.
+    def __init__(self, workers, queue_size=2, max_sessions=32, ttl=600.0, pool_size=2):
+        self.size = max(1, workers)
+        self.queue_size = queue_size
+        self.ttl = ttl
+        self.max_latest = max_sessions * self.size
+        self.worker_args = (max_sessions, ttl, pool_size)
+        self.ctx = multiprocessing.get_context('spawn')
+        self.outbox = self.ctx.Queue()
+        self.inboxes = [None] * self.size
+        self.procs = [None] * self.size
+        self.lock = threading.Lock()
+        self.tickets = itertools.count()
+        self.pending = {}    # ticket -> [worker, session_id, command, event, result]
+        self.in_flight = {}  # session_id -> frames submitted, not answered yet
+        self.latest = OrderedDict()  # session_id -> (time, last frame result), oldest first
+        self.dropped = 0
+        self.processed = 0
+        self.restarts = 0
+        self.collector = None
+
+    def start(self):
+        with self.lock:
+            for i in range(self.size):
+                self._spawn(i)
+            self.collector = threading.Thread(target=self._collect, name="pose-workers", daemon=True)
+            self.collector.start()
+        return self
+
+    def stop(self):
+        with self.lock:
+            for i, proc in enumerate(self.procs):
+                if proc is not None and proc.is_alive():
+                    self.inboxes[i].put(None)
+        for proc in self.procs:
+            if proc is not None:
+                proc.join(timeout=2.0)
+                if proc.is_alive():
+                    proc.terminate()
+        self.outbox.put(None)
+        if self.collector is not None:
+            self.collector.join(timeout=1.0)
+
+    def worker_for(self, session_id):
+        return zlib.crc32(session_id.encode()) % self.size
+
+    def submit_frame(self, session_id, jpeg, timeout=None):
+        # Result dict for this frame, {"dropped": True} when the session's queue
+        # is full, or None if the worker did not answer within `timeout`
+        return self._request('frame', session_id, jpeg, timeout, limit=self.queue_size)
+
+    def reset(self, session_id, timeout=None):
+        return self._request('reset', session_id, None, timeout)
+
+    def end(self, session_id, timeout=None):
+        result = self._request('end', session_id, None, timeout)
+        with self.lock:
+            self.latest.pop(session_id, None)
+        metrics.registry.forget(session_id)
+        return result
+
+    def stats(self, session_id, timeout=None):
+        # Stats from the session's last processed frame, asking its worker
+        # only before the first one. None if the session has no stats (no
+        # frames yet, or evicted) or the worker did not answer in time.
+        with self.lock:
+            result = self.latest.get(session_id, (None, None))[1]
+        if result is None:
+            result = self._request('stats', session_id, None, timeout)
+        return result.get("stats") if result else None
+
+    def sweep(self):
+        with self.lock:
+            return self._evict(time.time())
+
+    def counts(self):
+        with self.lock:
+            self._evict(time.time())
+            return {
+                "workers": self.size,
+                "alive": sum(1 for p in self.procs if p is not None and p.is_alive()),
+                "sessions": len(self.latest),
+                "in_flight": sum(self.in_flight.values()),
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "restarts": self.restarts,
+            }
+
+    def _request(self, command, session_id, payload, timeout, limit=None):
+        worker = self.worker_for(session_id)
+        event = threading.Event()
+        with self.lock:
+            if not self.procs[worker].is_alive():
+                self._restart(worker)
+            if limit is not None and self.in_flight.get(session_id, 0) >= limit:
+                self.dropped += 1
+                metrics.registry.frame_dropped(session_id, "upload_queue")
+                return {"dropped": True}
+            ticket = next(self.tickets)
+            entry = [worker, session_id, command, event, None]
+            self.pending[ticket] = entry
+            if command == 'frame':
+                self.in_flight[session_id] = self.in_flight.get(session_id, 0) + 1
+            self.inboxes[worker].put((ticket, command, session_id, payload))
+        if not event.wait(timeout):
+            # Still counted in flight until the worker answers, which keeps a
+            # session that outruns its worker throttled
+            return None
+        return entry[4]
+
+    def _spawn(self, i):
+        # Called with the lock held
+        self.inboxes[i] = self.ctx.Queue()
+        self.procs[i] = self.ctx.Process(target=_worker_main, args=(self.inboxes[i], self.outbox) + self.worker_args,
+                                         name=f"pose-worker-{i}", daemon=True)
+        self.procs[i].start()
+
+    def _restart(self, worker):
+        # Called with the lock held. The sessions on a dead worker lost their
+        # state; fail whatever they were waiting for and start over
+        for ticket, entry in list(self.pending.items()):
+            if entry[0] == worker:
+                del self.pending[ticket]
+                self._finish(entry, {"error": "worker restarted"})
+        self.restarts += 1
+        self._spawn(worker)
+
+    def _finish(self, entry, result):
+        # Called with the lock held
+        _, session_id, command, event, _ = entry
+        entry[4] = result
+        if command == 'frame':
+            left = self.in_flight.get(session_id, 1) - 1
+            if left > 0:
+                self.in_flight[session_id] = left
+            else:
+                self.in_flight.pop(session_id, None)
+        event.set()
+
+    def _evict(self, now):
+        # Called with the lock held. Drops results of sessions the workers
+        # will have evicted too: idle past `ttl`, or the oldest beyond what
+        # all workers together keep
+        evicted = 0
+        while self.latest:
+            session_id, (seen, _) = next(iter(self.latest.items()))
+            if now - seen <= self.ttl and len(self.latest) <= self.max_latest:
+                break
+            del self.latest[session_id]
+            metrics.registry.forget(session_id)
+            evicted += 1
+        return evicted
+
+    def _collect(self):
+        while True:
+            msg = self.outbox.get()
+            if msg is None:
+                break
+            ticket, session_id, result = msg
+            metrics.registry.merge(result.pop("timings", {}))
+            with self.lock:
+                entry = self.pending.pop(ticket, None)
+                if entry is None:
+                    continue
+                command = entry[2]
+                if command in ('frame', 'reset') and "error" not in result and result.get("stats") is not None:
+                    now = time.time()
+                    self.latest[session_id] = (now, result)
+                    self.latest.move_to_end(session_id)
+                    self._evict(now)
+                    self.processed += command == 'frame'
+                    if command == 'frame':
+                        metrics.registry.frame_processed(session_id)
+                self._finish(entry, result)
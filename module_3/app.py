@@ -1,80 +1,104 @@
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, abort, jsonify, Response
 import pandas as pd
+import numpy as np
 import joblib
 from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
-import io
+import os
+import time
+from fighter_index import FighterIndex
+from fighter_search import FighterSearch
+import training_cache
+import matchups
+import ingest
+import fighter_updates
 
 app = Flask(__name__)
 
-# Load and preprocess data
+# List of pre-fight stats to use for differences (defined in ingest.py so the
+# command line tools share them without importing the app)
+FEATURES = ingest.FEATURES
+
+# Data files live next to this module, wherever the process was started
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_PATH = ingest.DATASET_PATH
+
+# Load and preprocess data: only the columns training needs, float32 stats and
+# categorical names. FIGHTIQ_NPY_CACHE=1 loads from a one-time .npy conversion.
 def load_data():
-    data = pd.read_csv("large_dataset.csv")
-    return pd.DataFrame(data)
+    return ingest.load_fights(DATASET_PATH, FEATURES,
+                              use_npy_cache=os.environ.get('FIGHTIQ_NPY_CACHE') == '1')
 
-# Initialize data and model
-df = load_data()
+# Initialize model
 model = None
 fighter_db = None
+fighter_index = None
+fighter_search = None
 
-def train_model():
-    global model, fighter_db
-    
-    # List of pre-fight stats to use for differences
-    features_to_diff = [
-        'age', 'height', 'wins_total', 'losses_total',
-        'SLpM_total', 'SApM_total'
-    ]
-
-    # Create a new DataFrame for training with difference features
-    df_diff = pd.DataFrame()
-
-    # Compute differences for each feature
-    for feat in features_to_diff:
-        df_diff['diff_' + feat] = df['r_' + feat] - df['b_' + feat]
-
-    # Target variable: 1 if red wins, 0 if blue wins
-    df_diff['target'] = (df['winner'] == 'Red').astype(int)
-
-    # Drop rows with missing values if any
-    df_diff.dropna(inplace=True)
-
-    # Split the data into features and target
-    X = df_diff.drop('target', axis=1)
-    y = df_diff['target']
+def train_model(df, features_to_diff=FEATURES):
+    # Difference features (red minus blue) and target: 1 if red wins, 0 if blue wins.
+    # Rows with missing values are dropped.
+    X, y = ingest.diff_features(df, features_to_diff)
+    X = pd.DataFrame(X, columns=['diff_' + feat for feat in features_to_diff])
 
     # Train a logistic regression model
     model = LogisticRegression(random_state=42)
     model.fit(X, y)
 
-    # Build a database of fighter average stats
-    # First, extract red and blue fighter stats
-    red_fighters = df[['r_fighter'] + ['r_' + feat for feat in features_to_diff]]
-    blue_fighters = df[['b_fighter'] + ['b_' + feat for feat in features_to_diff]]
-
-    # Rename columns to remove prefix
-    red_fighters.columns = ['fighter'] + features_to_diff
-    blue_fighters.columns = ['fighter'] + features_to_diff
-
-    # Combine red and blue data
-    all_fighters = pd.concat([red_fighters, blue_fighters], ignore_index=True)
-
-    # Group by fighter name and compute mean stats
-    fighter_db = all_fighters.groupby('fighter').mean().reset_index()
+    # Build a database of fighter average stats over their red and blue appearances,
+    # reusing the incremental state (see fighter_updates.py) when it is up to date
+    stats = fighter_updates.load_state(DATASET_PATH, features_to_diff)
+    if stats is None:
+        stats = ingest.FighterStats(features_to_diff).update(df)
     
     # Save model and fighter database
-    joblib.dump(model, 'model.pkl')
-    fighter_db.to_csv('fighter_database.csv', index=False)
+    joblib.dump(model, os.path.join(BASE_DIR, 'model.pkl'))
+    fighter_db = fighter_updates.save_state(stats, DATASET_PATH)
+
+    return model, fighter_db
+
+# Load the model from the training cache, training only when the dataset or
+# feature list changed since the cached run
+def load_model():
+    global model, fighter_db, fighter_index, fighter_search
+    start = time.perf_counter()
+
+    key = training_cache.fingerprint(DATASET_PATH, FEATURES)
+    cached = training_cache.load(key)
+    if cached is not None:
+        model, fighter_db = cached
+        source = 'cache'
+    else:
+        model, fighter_db = train_model(load_data())
+        training_cache.store(key, model, fighter_db)
+        source = 'training'
 
-# Train model on startup
-train_model()
+    # Index fighters by name for O(1) lookups at prediction time
+    fighter_index = FighterIndex(fighter_db, FEATURES, model)
+    fighter_search = FighterSearch(fighter_index.names)
+    print(f"FightIQ model loaded from {source} in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+# Load (or train) model on startup
+load_model()
 
 @app.route('/')
 def index():
-    # Get list of all fighters for the dropdown
-    fighters = sorted(pd.concat([df['r_fighter'], df['b_fighter']]).unique())
-    return render_template('index.html', fighters=fighters)
+    # The dropdowns fetch their options from /fighters/search as the user types,
+    # so the page no longer grows with the roster
+    return render_template('index.html', roster_size=len(fighter_search))
+
+SEARCH_LIMIT = 50
+
+@app.route('/fighters/search')
+def search_fighters():
+    q = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 10, type=int), 0), SEARCH_LIMIT)
+    response = jsonify({'query': q, 'fighters': fighter_search.search(q, limit)})
+    # Results only change with the roster, so browsers and proxies may reuse
+    # them and revalidate against the roster version
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    response.set_etag(fighter_search.version)
+    return response.make_conditional(request)
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -82,16 +106,16 @@ def predict():
     fighter_b = request.form['fighter_b']
     
     # Get stats for both fighters
-    stats_a = fighter_db[fighter_db['fighter'] == fighter_a].iloc[0][1:]
-    stats_b = fighter_db[fighter_db['fighter'] == fighter_b].iloc[0][1:]
-    
-    # Compute differences: fighter_a as red, fighter_b as blue
-    diff = stats_a.values - stats_b.values
-    diff_df = pd.DataFrame([diff], columns=['diff_age', 'diff_height', 'diff_wins_total', 
-                                          'diff_losses_total', 'diff_SLpM_total', 'diff_SApM_total'])
+    stats_a = fighter_index.get(fighter_a)
+    stats_b = fighter_index.get(fighter_b)
+    for name, stats in [(fighter_a, stats_a), (fighter_b, stats_b)]:
+        if stats is None:
+            abort(404, description=f"Fighter not found: {name}")
+        if np.isnan(stats).any():
+            abort(422, description=f"Not enough recorded stats to predict a fight for {name}")
     
-    # Predict probability
-    prob = model.predict_proba(diff_df)[0][1]  # Probability that fighter_a wins
+    # Probability that fighter_a (as red) beats fighter_b (as blue)
+    prob = fighter_index.win_probability(stats_a, stats_b)
     
     # Prepare data for visualization
     comparison_data = []
@@ -100,8 +124,8 @@ def predict():
     for i, feature in enumerate(features):
         comparison_data.append({
             'feature': feature,
-            'fighter_a': round(stats_a.iloc[i], 2),
-            'fighter_b': round(stats_b.iloc[i], 2)
+            'fighter_a': round(float(stats_a[i]), 2),
+            'fighter_b': round(float(stats_b[i]), 2)
         })
     
     if prob > 0.5:
@@ -121,5 +145,70 @@ def predict():
                          loser_prob=loser_prob,
                          comparison_data=comparison_data)
 
+# ---------------- MATCHUP API ----------------
+def known_fighters(names):
+    # 404 for unknown names and 422 for fighters without complete stats
+    unknown = [n for n in names if n not in fighter_index]
+    if unknown:
+        return jsonify({'error': 'Fighter not found', 'fighters': unknown}), 404
+    incomplete = [n for n in names if not fighter_index.valid[fighter_index.rows[n]]]
+    if incomplete:
+        return jsonify({'error': 'Not enough recorded stats', 'fighters': incomplete}), 422
+    return None
+
+def count_arg(name, default=None):
+    # (value, None) for a positive integer query parameter, or (None, 400
+    # response) for anything else; negative values would slice from the end
+    raw = request.args.get(name)
+    if raw is None:
+        return default, None
+    try:
+        value = int(raw)
+    except ValueError:
+        value = 0
+    if value < 1:
+        return None, (jsonify({'error': f'{name} must be a positive integer'}), 400)
+    return value, None
+
+@app.route('/api/rankings')
+def api_rankings():
+    limit, error = count_arg('limit')
+    if error:
+        return error
+    return jsonify({'rankings': matchups.rankings(fighter_index, limit)})
+
+@app.route('/api/fighters/<path:name>/opponents')
+def api_opponents(name):
+    error = known_fighters([name])
+    if error:
+        return error
+    n, error = count_arg('n', 10)
+    if error:
+        return error
+    most_likely = request.args.get('order', 'likely') != 'unlikely'
+    return jsonify({
+        'fighter': name,
+        'order': 'likely' if most_likely else 'unlikely',
+        'opponents': matchups.top_opponents(fighter_index, name, n, most_likely)
+    })
+
+@app.route('/api/matchups', methods=['POST'])
+def api_matchups():
+    data = request.get_json(silent=True) or {}
+    names = data.get('fighters')
+    if not isinstance(names, list) or not names or not all(isinstance(n, str) for n in names):
+        return jsonify({'error': 'expected {"fighters": [...]} with fighter names as strings'}), 400
+    error = known_fighters(names)
+    if error:
+        return error
+
+    matrix = matchups.probability_matrix(fighter_index, names)
+    # Raw little-endian float32, row-major, for callers that want the array as is
+    if request.args.get('format') == 'binary' or request.accept_mimetypes.best == 'application/octet-stream':
+        response = Response(matrix.astype('<f4').tobytes(), mimetype='application/octet-stream')
+        response.headers['X-Shape'] = f'{matrix.shape[0]},{matrix.shape[1]}'
+        return response
+    return jsonify({'fighters': names, 'probabilities': matrix.tolist()})
+
 if __name__ == '__main__':
     app.run(host="127.0.0.1", port=5500,debug=True)
\ No newline at end of file
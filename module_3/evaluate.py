@@ -0,0 +1,203 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, brier_score_loss, log_loss
+from sklearn.model_selection import KFold, TimeSeriesSplit
+import ingest
+
+# Offline evaluation and cost benchmark for FightIQ feature sets.
+#
+#   python evaluate.py                              both presets, 5-fold CV
+#   python evaluate.py --split time --folds 5       expanding-window, oldest rows train
+#   python evaluate.py --set stats=age,reach,td_avg --output results.json
+#
+# Folds run in parallel in a process pool. Every configuration reports
+# accuracy, log-loss, Brier score, calibration bins, fit time and the latency
+# of a single prediction, both through sklearn and through the dot product the
+# app serves with (see fighter_index.py).
+
+FEATURE_SETS = {
+    # The model app.py serves
+    'serving': ['age', 'height', 'wins_total', 'losses_total', 'SLpM_total', 'SApM_total'],
+    # The model main.py trains
+    'full': ['age', 'height', 'weight', 'reach',
+             'SLpM_total', 'SApM_total', 'sig_str_acc_total',
+             'td_acc_total', 'str_def_total', 'td_def_total',
+             'sub_avg', 'td_avg',
+             'wins_total', 'losses_total'],
+}
+
+CALIBRATION_BINS = 10
+LATENCY_SAMPLES = 2000
+
+def calibration(y, prob, bins=CALIBRATION_BINS):
+    # Reliability table and expected calibration error
+    edges = np.linspace(0, 1, bins + 1)
+    which = np.clip(np.digitize(prob, edges[1:-1]), 0, bins - 1)
+    table, ece = [], 0.0
+    for b in range(bins):
+        mask = which == b
+        if not mask.any():
+            continue
+        predicted, observed = float(prob[mask].mean()), float(y[mask].mean())
+        table.append({'bin': [float(edges[b]), float(edges[b + 1])], 'count': int(mask.sum()),
+                      'predicted': predicted, 'observed': observed})
+        ece += mask.mean() * abs(predicted - observed)
+    return table, float(ece)
+
+def latency_us(fn, rows):
+    samples = np.empty(len(rows))
+    for i, row in enumerate(rows):
+        start = time.perf_counter()
+        fn(row)
+        samples[i] = time.perf_counter() - start
+    return {'p50': float(np.percentile(samples, 50) * 1e6), 'p99': float(np.percentile(samples, 99) * 1e6)}
+
+def run_fold(name, fold, X, y, train_idx, test_idx):
+    model = LogisticRegression(random_state=42)
+    start = time.perf_counter()
+    model.fit(X[train_idx], y[train_idx])
+    fit_seconds = time.perf_counter() - start
+
+    prob = model.predict_proba(X[test_idx])[:, 1]
+    y_test = y[test_idx]
+
+    # Single-row prediction cost: sklearn vs the app's dot product
+    rows = X[test_idx][:LATENCY_SAMPLES]
+    coef, intercept = model.coef_[0].astype(np.float64), float(model.intercept_[0])
+    sklearn_latency = latency_us(lambda r: model.predict_proba(r[None, :]), rows)
+    dot_latency = latency_us(lambda r: 1.0 / (1.0 + np.exp(-(float(np.dot(r, coef)) + intercept))), rows)
+
+    return {
+        'set': name,
+        'fold': fold,
+        'train_rows': int(len(train_idx)),
+        'test_rows': int(len(test_idx)),
+        'accuracy': float(accuracy_score(y_test, prob > 0.5)),
+        'log_loss': float(log_loss(y_test, prob, labels=[0, 1])),
+        'brier': float(brier_score_loss(y_test, prob)),
+        'prob': prob.tolist(),
+        'y': y_test.tolist(),
+        'fit_seconds': fit_seconds,
+        'latency_us': {'sklearn': sklearn_latency, 'dot': dot_latency},
+    }
+
+def splits(n, folds, mode):
+    if mode == 'time':
+        # Rows are in chronological order (see by_date); each fold trains on
+        # everything before it
+        return list(TimeSeriesSplit(n_splits=folds).split(np.arange(n)))
+    return list(KFold(n_splits=folds, shuffle=True, random_state=42).split(np.arange(n)))
+
+def by_date(path, fights):
+    # Fights sorted oldest first by event_date. Dumps are often newest first,
+    # and a time split over them would train on the future.
+    dates = pd.to_datetime(pd.read_csv(path, usecols=['event_date'])['event_date'])
+    order = np.argsort(dates.to_numpy(), kind='stable')
+    return fights.iloc[order].reset_index(drop=True)
+
+def summarize(name, features, folds):
+    y = np.concatenate([f['y'] for f in folds])
+    prob = np.concatenate([f['prob'] for f in folds])
+    table, ece = calibration(y, prob)
+
+    def mean(key):
+        return float(np.mean([f[key] for f in folds]))
+
+    def latency(engine, q):
+        return float(np.median([f['latency_us'][engine][q] for f in folds]))
+
+    return {
+        'features': features,
+        'rows': int(sum(f['test_rows'] for f in folds)),
+        'accuracy': mean('accuracy'),
+        'accuracy_std': float(np.std([f['accuracy'] for f in folds])),
+        'log_loss': mean('log_loss'),
+        'brier': mean('brier'),
+        'ece': ece,
+        'calibration': table,
+        'fit_seconds': mean('fit_seconds'),
+        'latency_us': {engine: {q: latency(engine, q) for q in ['p50', 'p99']} for engine in ['sklearn', 'dot']},
+        'folds': [{k: v for k, v in f.items() if k not in ('prob', 'y', 'set')} for f in folds],
+    }
+
+def evaluate(path, feature_sets, folds=5, split='kfold', workers=None):
+    all_features = list(dict.fromkeys(f for features in feature_sets.values() for f in features))
+    fights = ingest.read_fights(path, all_features)
+    if split == 'time':
+        fights = by_date(path, fights)
+
+    jobs = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for name, features in feature_sets.items():
+            X, y = ingest.diff_features(fights, features)
+            for fold, (train_idx, test_idx) in enumerate(splits(len(X), folds, split)):
+                jobs.append(pool.submit(run_fold, name, fold, X, y, train_idx, test_idx))
+        results = [job.result() for job in jobs]
+
+    return {
+        name: summarize(name, features, sorted((r for r in results if r['set'] == name), key=lambda r: r['fold']))
+        for name, features in feature_sets.items()
+    }
+
+def dataset_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate and benchmark FightIQ feature sets')
+    parser.add_argument('--dataset', default='large_dataset.csv')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=f1,f2,...',
+                        help='feature set to evaluate, repeatable; a bare preset name also works')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--split', choices=['kfold', 'time'], default='kfold')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=None, help='write the full results as JSON')
+    args = parser.parse_args()
+
+    feature_sets = {}
+    for spec in args.set or list(FEATURE_SETS):
+        name, _, features = spec.partition('=')
+        if not features and name not in FEATURE_SETS:
+            parser.error(f"unknown feature set {name!r}, expected one of {', '.join(FEATURE_SETS)} or NAME=f1,f2,...")
+        feature_sets[name] = features.split(',') if features else FEATURE_SETS[name]
+
+    start = time.perf_counter()
+    results = evaluate(args.dataset, feature_sets, args.folds, args.split, args.workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'set':>10} {'features':>8} {'accuracy':>9} {'log_loss':>9} {'brier':>7} {'ece':>6} "
+          f"{'fit ms':>8} {'sklearn us':>11} {'dot us':>7}")
+    for name, r in results.items():
+        print(f"{name:>10} {len(r['features']):>8} {r['accuracy']:>9.4f} {r['log_loss']:>9.4f} "
+              f"{r['brier']:>7.4f} {r['ece']:>6.3f} {r['fit_seconds'] * 1000:>8.1f} "
+              f"{r['latency_us']['sklearn']['p50']:>11.1f} {r['latency_us']['dot']['p50']:>7.1f}")
+    print(f"{args.folds} {args.split} folds in {elapsed:.1f}s")
+
+    if args.output:
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'dataset': {'path': os.path.abspath(args.dataset), 'sha256': dataset_sha256(args.dataset)},
+            'split': args.split,
+            'folds': args.folds,
+            'versions': {'python': platform.python_version(), 'sklearn': sklearn.__version__,
+                         'numpy': np.__version__},
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+import numpy as np
+
+# Name -> row index over a contiguous float64 matrix of fighter stats, plus the
+# logistic-regression weights, so a prediction is two dict lookups and a dot
+# product instead of two DataFrame scans and a predict_proba call.
+
+class FighterIndex:
+    def __init__(self, fighter_db, features, model):
+        self.features = list(features)
+        self.names = fighter_db['fighter'].astype(str).tolist()
+        self.rows = {name: i for i, name in enumerate(self.names)}
+        self.stats = np.ascontiguousarray(fighter_db[self.features].to_numpy(dtype=np.float64))
+        self.coef = np.ascontiguousarray(model.coef_[0], dtype=np.float64)
+        self.intercept = float(model.intercept_[0])
+
+        # The model is linear in the stat differences, so w.(a - b) = w.a - w.b
+        # and one score per fighter determines every pairwise probability.
+        # Fighters with missing stats get NaN and are left out of rankings.
+        self.scores = self.stats @ self.coef
+        self.valid = ~np.isnan(self.scores)
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    def __len__(self):
+        return len(self.names)
+
+    def get(self, name):
+        # Stats row for a fighter, or None if the name is unknown
+        i = self.rows.get(name)
+        return None if i is None else self.stats[i]
+
+    def win_probability(self, stats_a, stats_b):
+        # P(a beats b) with a in the red corner, same as
+        # model.predict_proba([stats_a - stats_b])[0][1]
+        z = float(np.dot(stats_a - stats_b, self.coef)) + self.intercept
+        return 1.0 / (1.0 + np.exp(-z))
@@ -0,0 +1,96 @@
+import bisect
+import hashlib
+import re
+import unicodedata
+import numpy as np
+
+# Type-ahead search over the fighter roster, built once when the model loads.
+#
+# Names are normalised (accents folded, lower case, punctuation dropped) and
+# every suffix starting at a word goes into one sorted list, so "mcgr" and
+# "conor m" both reach "Conor McGregor" with a bisect instead of a scan.
+# Matches are ranked full-name prefix first, then word prefix, each in roster
+# order. When that leaves fewer than `limit` results, names sharing character
+# trigrams with the query fill the rest (typos like "nurmagomedv"), scored
+# with one bincount over the trigram postings.
+
+MIN_SIMILARITY = 0.35
+
+def normalize(name):
+    folded = unicodedata.normalize('NFKD', str(name))
+    folded = ''.join(c for c in folded if not unicodedata.combining(c)).lower()
+    return ' '.join(re.sub(r"[^0-9a-z]+", ' ', folded).split())
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class FighterSearch:
+    def __init__(self, names):
+        self.names = list(names)
+        keys = [normalize(name) for name in self.names]
+
+        # (suffix, 0 for the whole name or 1 for a later word, row), sorted by suffix
+        suffixes = []
+        for row, key in enumerate(keys):
+            starts = [0] + [i + 1 for i, c in enumerate(key) if c == ' ']
+            suffixes.extend((key[start:], int(start > 0), row) for start in starts)
+        suffixes.sort()
+        self.suffixes = [s[0] for s in suffixes]
+        self.suffix_tier = np.array([s[1] for s in suffixes], dtype=np.int8)
+        self.suffix_row = np.array([s[2] for s in suffixes], dtype=np.int32)
+
+        # Trigram -> rows containing it
+        postings = {}
+        self.trigram_counts = np.zeros(len(keys), dtype=np.int32)
+        for row, key in enumerate(keys):
+            grams = trigrams(key)
+            self.trigram_counts[row] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(row)
+        self.postings = {gram: np.array(rows, dtype=np.int32) for gram, rows in postings.items()}
+
+        # Changes whenever the roster does; the search endpoint's ETag
+        self.version = hashlib.sha1('\n'.join(self.names).encode('utf-8')).hexdigest()[:16]
+
+    def __len__(self):
+        return len(self.names)
+
+    def prefix(self, query):
+        # Rows whose name, or a word in it, starts with the normalised query,
+        # full-name matches first, each group in roster order
+        lo = bisect.bisect_left(self.suffixes, query)
+        hi = bisect.bisect_left(self.suffixes, query + '\x7f', lo)
+        if lo == hi:
+            return np.empty(0, dtype=np.int32)
+        tier, rows = self.suffix_tier[lo:hi], self.suffix_row[lo:hi]
+        order = np.lexsort((rows, tier))
+        rows = rows[order]
+        # A name can match at several words; keep its best (first) hit
+        _, first = np.unique(rows, return_index=True)
+        return rows[np.sort(first)]
+
+    def similar(self, query, exclude=()):
+        # Rows by trigram similarity (Dice coefficient) to the query, best first
+        grams = trigrams(query)
+        hits = [self.postings[g] for g in grams if g in self.postings]
+        if not hits:
+            return np.empty(0, dtype=np.int32)
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.names))
+        similarity = 2.0 * shared / (len(grams) + self.trigram_counts)
+        similarity[np.asarray(exclude, dtype=np.intp)] = 0.0
+        rows = np.flatnonzero(similarity >= MIN_SIMILARITY)
+        return rows[np.argsort(-similarity[rows], kind='stable')]
+
+    def search(self, query, limit=10):
+        # Up to `limit` names for a type-ahead box; an empty query lists the
+        # roster from the top
+        query = normalize(query)
+        if limit <= 0:
+            return []
+        if not query:
+            return self.names[:limit]
+        rows = self.prefix(query)[:limit]
+        if len(rows) < limit and len(query) >= 3:
+            rows = np.concatenate([rows, self.similar(query, exclude=rows)[:limit - len(rows)]])
+        return [self.names[i] for i in rows]
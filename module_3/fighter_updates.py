@@ -0,0 +1,96 @@
+import argparse
+import csv
+import os
+import time
+import pandas as pd
+import ingest
+
+# Incremental fighter database updates.
+#
+# fighter_state.npz holds per-fighter running sums and counts (ingest.FighterStats)
+# next to fighter_database.csv, together with the (size, mtime) stamp of the
+# dataset they cover. New bouts are appended to the dataset and folded into the
+# totals, so the means update in O(new rows) instead of a full regroup:
+#
+#   python fighter_updates.py new_bouts.csv
+#   python fighter_updates.py new_bouts.csv --dataset other/fights.csv
+#
+# The fighter database is written next to the state file unless a path is
+# given, so state kept for another dataset never overwrites the module's own
+# fighter_database.csv.
+
+STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fighter_state.npz')
+FIGHTER_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fighter_database.csv')
+
+def load_state(dataset_path, features, state_path=STATE_PATH):
+    # FighterStats for the dataset as it is now, or None if the saved state is
+    # missing, built for other features or out of date with the dataset
+    stats, extra = ingest.FighterStats.load(state_path)
+    if stats is None or stats.features != list(features):
+        return None
+    if extra.get('dataset') != ingest.source_stamp(dataset_path):
+        return None
+    return stats
+
+def fighter_db_for(state_path):
+    # fighter_database.csv alongside a state file
+    return os.path.join(os.path.dirname(os.path.abspath(state_path)), os.path.basename(FIGHTER_DB_PATH))
+
+def save_state(stats, dataset_path, state_path=STATE_PATH, fighter_db_path=None):
+    if fighter_db_path is None:
+        fighter_db_path = fighter_db_for(state_path)
+    fighter_db = stats.to_frame()
+    stats.save(state_path, dataset=ingest.source_stamp(dataset_path))
+    fighter_db.to_csv(fighter_db_path, index=False)
+    return fighter_db
+
+def rebuild_state(dataset_path, features, chunksize=50_000, state_path=STATE_PATH, fighter_db_path=None):
+    # Full pass over the dataset, only needed once or when the state is stale
+    stats = ingest.FighterStats(features)
+    for chunk in ingest.read_fights(dataset_path, features, chunksize=chunksize):
+        stats.update(chunk)
+    save_state(stats, dataset_path, state_path, fighter_db_path)
+    return stats
+
+def append_to_dataset(dataset_path, new_bouts):
+    # Append rows in the dataset's own column order, blanks for missing columns
+    with open(dataset_path, newline='') as f:
+        header = next(csv.reader(f))
+    with open(dataset_path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) not in (b'\n', b'\r'):
+                f.write(b'\n')
+    new_bouts.reindex(columns=header).to_csv(dataset_path, mode='a', header=False, index=False)
+
+def append_bouts(new_bouts, dataset_path, features, state_path=STATE_PATH, fighter_db_path=None):
+    # Fold new fights (a DataFrame with r_/b_ columns) into the fighter database.
+    # Returns the updated fighter_db.
+    stats = load_state(dataset_path, features, state_path)
+    if stats is None:
+        stats = rebuild_state(dataset_path, features, state_path=state_path, fighter_db_path=fighter_db_path)
+    append_to_dataset(dataset_path, new_bouts)
+    stats.update(new_bouts)
+    return save_state(stats, dataset_path, state_path, fighter_db_path)
+
+if __name__ == '__main__':
+    from ingest import FEATURES, DATASET_PATH
+
+    parser = argparse.ArgumentParser(description='Append new bouts to the FightIQ fighter database')
+    parser.add_argument('bouts', help='CSV of new fights, same columns as the dataset')
+    parser.add_argument('--dataset', default=DATASET_PATH)
+    parser.add_argument('--state', default=None,
+                        help="state file, default the module's for its own dataset, else next to --dataset")
+    parser.add_argument('--fighter-db', default=None, help='fighter database CSV, default next to the state file')
+    args = parser.parse_args()
+    if args.state is None:
+        same = os.path.abspath(args.dataset) == os.path.abspath(DATASET_PATH)
+        args.state = STATE_PATH if same else os.path.join(os.path.dirname(os.path.abspath(args.dataset)),
+                                                           os.path.basename(STATE_PATH))
+
+    start = time.perf_counter()
+    new_bouts = pd.read_csv(args.bouts, dtype={c: 'float32' for c in ingest.stat_columns(FEATURES)})
+    fighter_db = append_bouts(new_bouts, args.dataset, FEATURES, state_path=args.state, fighter_db_path=args.fighter_db)
+    print(f"Added {len(new_bouts)} bouts, {len(fighter_db)} fighters, "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
@@ -0,0 +1,267 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# Ingestion of the fight history (large_dataset.csv).
+#
+# Training only needs the two fighter names, the winner and the r_/b_ columns
+# of the features being diffed, so everything else is never parsed. Stats are
+# read as float32 and names as categoricals. The diff features and the
+# per-fighter means can be built chunk by chunk, so peak memory is one chunk
+# plus the outputs rather than the whole file. The CSV can also be converted
+# once to a directory of .npy columns that later loads memory-map.
+#
+#   python ingest.py --compare      peak RSS of each loading strategy
+
+# The pre-fight stats the served model diffs, and the dataset it trains on.
+# Kept here rather than in app.py so the command line tools can use them
+# without importing (and so loading or training) the web app.
+FEATURES = [
+    'age', 'height', 'wins_total', 'losses_total',
+    'SLpM_total', 'SApM_total'
+]
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'large_dataset.csv')
+
+NAME_COLUMNS = ['r_fighter', 'b_fighter']
+NPY_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.fightiq_columns')
+
+def stat_columns(features):
+    return ['r_' + f for f in features] + ['b_' + f for f in features]
+
+def required_columns(features):
+    return NAME_COLUMNS + ['winner'] + stat_columns(features)
+
+def column_dtypes(features):
+    dtypes = {c: np.float32 for c in stat_columns(features)}
+    dtypes.update({c: 'category' for c in NAME_COLUMNS + ['winner']})
+    return dtypes
+
+def read_fights(path, features, chunksize=None):
+    # DataFrame (or an iterator of chunks) holding only the columns training uses
+    return pd.read_csv(path, usecols=required_columns(features),
+                       dtype=column_dtypes(features), chunksize=chunksize)
+
+# ---------------- FEATURE BUILDING ----------------
+def diff_features(fights, features):
+    # (X, y): red minus blue stats and 1 if red won, rows with missing values dropped
+    X = np.column_stack([
+        fights['r_' + f].to_numpy(dtype=np.float32) - fights['b_' + f].to_numpy(dtype=np.float32)
+        for f in features
+    ])
+    y = (fights['winner'] == 'Red').to_numpy(dtype=np.int8)
+    keep = ~np.isnan(X).any(axis=1)
+    return X[keep], y[keep]
+
+def diff_features_chunked(chunks, features):
+    parts = [diff_features(chunk, features) for chunk in chunks]
+    if not parts:
+        return np.empty((0, len(features)), dtype=np.float32), np.empty(0, dtype=np.int8)
+    return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+class FighterStats:
+    # Running per-fighter sums and non-missing counts of each stat, so the
+    # mean over every red and blue appearance can be built chunk by chunk.
+    # to_frame() matches all_fighters.groupby('fighter').mean().reset_index().
+    def __init__(self, features):
+        self.features = list(features)
+        self.rows = {}
+        self.names = []
+        self.sums = np.zeros((0, len(self.features)))
+        self.counts = np.zeros((0, len(self.features)), dtype=np.int64)
+
+    def _grow(self, names):
+        new = [n for n in dict.fromkeys(names) if n not in self.rows]
+        for n in new:
+            self.rows[n] = len(self.names)
+            self.names.append(n)
+        if new:
+            pad = ((0, len(new)), (0, 0))
+            self.sums = np.pad(self.sums, pad)
+            self.counts = np.pad(self.counts, pad)
+
+    def update(self, fights):
+        for corner in ['r_', 'b_']:
+            names = fights[corner + 'fighter']
+            present = names.notna().to_numpy()
+            codes, uniques = pd.factorize(names[present].astype(str))
+            values = np.column_stack([fights[corner + f].to_numpy(dtype=np.float64)[present]
+                                      for f in self.features])
+            seen = ~np.isnan(values)
+
+            # Aggregate the chunk per fighter, then merge into the running totals
+            chunk_sums = np.zeros((len(uniques), len(self.features)))
+            chunk_counts = np.zeros((len(uniques), len(self.features)), dtype=np.int64)
+            np.add.at(chunk_sums, codes, np.where(seen, values, 0.0))
+            np.add.at(chunk_counts, codes, seen)
+
+            self._grow(uniques)
+            rows = np.array([self.rows[n] for n in uniques], dtype=np.intp)
+            self.sums[rows] += chunk_sums
+            self.counts[rows] += chunk_counts
+        return self
+
+    def save(self, path, **extra):
+        # Persist the running totals so later updates only touch new rows
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, features=np.array(self.features), names=np.array(self.names, dtype=str),
+                     sums=self.sums, counts=self.counts, extra=np.array(json.dumps(extra)))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        # (stats, extra) from save(), or (None, None) if there is no state yet
+        try:
+            data = np.load(path)
+        except FileNotFoundError:
+            return None, None
+        with data:
+            stats = cls(data['features'].tolist())
+            stats.names = data['names'].tolist()
+            stats.rows = {n: i for i, n in enumerate(stats.names)}
+            stats.sums = data['sums']
+            stats.counts = data['counts']
+            extra = json.loads(str(data['extra']))
+        return stats, extra
+
+    def to_frame(self):
+        order = np.argsort(np.array(self.names, dtype=object), kind='stable')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = self.sums[order] / self.counts[order]
+        fighter_db = pd.DataFrame(means, columns=self.features)
+        fighter_db.insert(0, 'fighter', np.array(self.names, dtype=object)[order])
+        return fighter_db
+
+# ---------------- COLUMNAR CACHE ----------------
+def source_stamp(path):
+    st = os.stat(path)
+    return {'source': os.path.abspath(path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+def convert_to_npy(path, features, out_dir=NPY_CACHE_DIR, chunksize=100_000):
+    # One .npy file per column. Names are stored as int32 codes into a JSON
+    # list of categories, -1 for missing.
+    os.makedirs(out_dir, exist_ok=True)
+    categories = {c: {} for c in NAME_COLUMNS + ['winner']}
+    parts = {c: [] for c in required_columns(features)}
+    for chunk in read_fights(path, features, chunksize=chunksize):
+        for c, lookup in categories.items():
+            codes, uniques = pd.factorize(chunk[c].astype(object))
+            mapping = np.array([lookup.setdefault(u, len(lookup)) for u in uniques] + [-1], dtype=np.int32)
+            parts[c].append(mapping[codes])  # code -1 (missing) picks the trailing -1
+        for c in stat_columns(features):
+            parts[c].append(chunk[c].to_numpy(dtype=np.float32))
+    for c, chunks in parts.items():
+        np.save(os.path.join(out_dir, c + '.npy'), np.concatenate(chunks) if chunks else np.empty(0))
+    manifest = dict(source_stamp(path), columns=required_columns(features),
+                    categories={c: list(lookup) for c, lookup in categories.items()})
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+
+def load_npy(features, out_dir=NPY_CACHE_DIR):
+    with open(os.path.join(out_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    data = {}
+    for c in required_columns(features):
+        values = np.load(os.path.join(out_dir, c + '.npy'), mmap_mode='r')
+        if c in manifest['categories']:
+            data[c] = pd.Categorical.from_codes(values, categories=manifest['categories'][c])
+        else:
+            data[c] = values
+    return pd.DataFrame(data)
+
+def npy_cache_valid(path, features, out_dir=NPY_CACHE_DIR):
+    try:
+        with open(os.path.join(out_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return False
+    stamp = source_stamp(path)
+    return (all(manifest.get(k) == v for k, v in stamp.items()) and
+            set(required_columns(features)) <= set(manifest['columns']))
+
+def load_fights(path, features, use_npy_cache=False):
+    # Pruned, compactly typed fight history, from the .npy cache when enabled
+    if not use_npy_cache:
+        return read_fights(path, features)
+    if not npy_cache_valid(path, features):
+        convert_to_npy(path, features)
+    return load_npy(features)
+
+# ---------------- MEMORY REPORT ----------------
+def peak_rss_mb():
+    # VmHWM is per address space; ru_maxrss on Linux survives exec and would
+    # report the parent's peak in a freshly spawned process
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return float('nan')  # not available on Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _measure(mode, path, features, chunksize, results):
+    start = time.perf_counter()
+    X, fighter_db = [], []
+    if mode == 'full':
+        # What train_model() did before: every column, default dtypes
+        df = pd.read_csv(path)
+        X, y = diff_features(df, features)
+        fighter_db = FighterStats(features).update(df).to_frame()
+    elif mode == 'pruned':
+        df = read_fights(path, features)
+        X, y = diff_features(df, features)
+        fighter_db = FighterStats(features).update(df).to_frame()
+    elif mode == 'chunked':
+        stats = FighterStats(features)
+        def chunks():
+            for chunk in read_fights(path, features, chunksize=chunksize):
+                stats.update(chunk)
+                yield chunk
+        X, y = diff_features_chunked(chunks(), features)
+        fighter_db = stats.to_frame()
+    elif mode == 'npy':
+        df = load_fights(path, features, use_npy_cache=True)
+        X, y = diff_features(df, features)
+        fighter_db = FighterStats(features).update(df).to_frame()
+    results.put((mode, len(X), len(fighter_db), time.perf_counter() - start, peak_rss_mb()))
+
+def compare(path, features, chunksize):
+    # Each strategy runs in a fresh process since peak RSS only ever grows.
+    # 'baseline' is an interpreter with numpy and pandas imported.
+    ctx = multiprocessing.get_context('spawn')
+    if not npy_cache_valid(path, features):
+        convert_to_npy(path, features)
+    print(f"{'mode':>8} {'rows':>9} {'fighters':>9} {'seconds':>8} {'peak RSS MB':>12}")
+    for mode in ['baseline', 'full', 'pruned', 'chunked', 'npy']:
+        results = ctx.Queue()
+        p = ctx.Process(target=_measure, args=(mode, path, features, chunksize, results))
+        p.start()
+        mode, rows, fighters, seconds, rss = results.get()
+        p.join()
+        print(f"{mode:>8} {rows:>9} {fighters:>9} {seconds:>8.2f} {rss:>12.1f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='FightIQ dataset ingestion')
+    parser.add_argument('--path', default=DATASET_PATH)
+    parser.add_argument('--features', nargs='+', default=FEATURES)
+    parser.add_argument('--chunksize', type=int, default=50_000)
+    parser.add_argument('--convert', action='store_true', help='write the .npy column cache')
+    parser.add_argument('--compare', action='store_true', help='report peak RSS per loading strategy')
+    args = parser.parse_args()
+
+    if args.convert:
+        convert_to_npy(args.path, args.features, chunksize=args.chunksize)
+        print(f"Wrote {NPY_CACHE_DIR}/")
+    if args.compare:
+        compare(args.path, args.features, args.chunksize)
@@ -2,10 +2,9 @@ import pandas as pd
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
+import ingest
 
 
-df = pd.read_csv('large_dataset.csv')
-
 features_to_diff = [
     'age', 'height', 'weight', 'reach',
     'SLpM_total', 'SApM_total', 'sig_str_acc_total',
@@ -14,6 +13,9 @@ features_to_diff = [
     'wins_total', 'losses_total'
 ]
 
+# Only the columns used below, float32 stats and categorical names
+df = ingest.read_fights('large_dataset.csv', features_to_diff)
+
 df_diff = pd.DataFrame()
 
 for feat in features_to_diff:
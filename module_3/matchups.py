@@ -0,0 +1,39 @@
+import numpy as np
+
+# Bulk matchup queries over a FighterIndex.
+#
+# P(a beats b), with a in the red corner, is sigmoid(score_a - score_b + bias)
+# where score = w . stats. Everything below is a vector or outer operation on
+# the per-fighter scores, never a Python loop over pairs.
+
+def sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+def rankings(index, limit=None):
+    # Fighters ordered by score, strongest first
+    order = np.flatnonzero(index.valid)
+    order = order[np.argsort(-index.scores[order], kind='stable')]
+    if limit is not None:
+        order = order[:limit]
+    return [{'rank': r + 1, 'fighter': index.names[i], 'score': float(index.scores[i])}
+            for r, i in enumerate(order)]
+
+def top_opponents(index, name, n=10, most_likely=True):
+    # The n opponents `name` is most (or least) likely to beat from the red corner
+    i = index.rows[name]
+    probs = sigmoid(index.scores[i] - index.scores + index.intercept)
+    candidates = np.flatnonzero(index.valid)
+    candidates = candidates[candidates != i]
+    keys = -probs[candidates] if most_likely else probs[candidates]
+    n = min(n, len(candidates))
+    if n <= 0:
+        return []
+    top = np.argpartition(keys, n - 1)[:n]
+    top = top[np.argsort(keys[top], kind='stable')]
+    return [{'fighter': index.names[j], 'win_probability': float(probs[j])} for j in candidates[top]]
+
+def probability_matrix(index, names):
+    # float32 matrix with m[i, j] = P(names[i] beats names[j]), i in the red corner
+    rows = np.array([index.rows[name] for name in names], dtype=np.intp)
+    s = index.scores[rows]
+    return sigmoid(s[:, None] - s[None, :] + index.intercept).astype(np.float32)
@@ -1,4 +1,9 @@
 // Custom dropdown functionality
+// Options come from /fighters/search as the user types, instead of the whole
+// roster being rendered into the page.
+const SEARCH_LIMIT = 20;
+const SEARCH_DELAY_MS = 120;
+
 document.addEventListener('DOMContentLoaded', function() {
     const dropdowns = document.querySelectorAll('.custom-dropdown');
 
@@ -7,7 +12,36 @@ document.addEventListener('DOMContentLoaded', function() {
         const options = dropdown.querySelector('.dropdown-options');
         const hiddenInput = dropdown.querySelector('input[type="hidden"]');
         const searchInput = dropdown.querySelector('.dropdown-search');
-        const optionItems = dropdown.querySelectorAll('.dropdown-option');
+        const results = dropdown.querySelector('.dropdown-results');
+        let timer = null;
+        let latest = 0;
+
+        // Replace the option list with the matches for the current search
+        function render(fighters) {
+            results.replaceChildren(...fighters.map(name => {
+                const option = document.createElement('div');
+                option.className = 'dropdown-option';
+                option.setAttribute('data-value', name);
+                option.textContent = name;
+                if (name === hiddenInput.value) {
+                    option.classList.add('selected');
+                }
+                return option;
+            }));
+        }
+
+        function search(query) {
+            // Responses can arrive out of order; only the newest request renders
+            const request = ++latest;
+            fetch(`fighters/search?q=${encodeURIComponent(query)}&limit=${SEARCH_LIMIT}`)
+                .then(response => response.json())
+                .then(data => {
+                    if (request === latest) {
+                        render(data.fighters);
+                    }
+                })
+                .catch(() => {});
+        }
 
         // Toggle dropdown
         selected.addEventListener('click', function(e) {
@@ -20,35 +54,31 @@ document.addEventListener('DOMContentLoaded', function() {
             });
             options.classList.toggle('active');
             selected.classList.toggle('active');
-            if (options.classList.contains('active') && searchInput) {
+            if (options.classList.contains('active')) {
+                search(searchInput.value);
                 setTimeout(() => searchInput.focus(), 100);
             }
         });
 
         // Select option
-        optionItems.forEach(option => {
-            option.addEventListener('click', function() {
-                const value = this.getAttribute('data-value');
-                const text = this.textContent;
-                selected.querySelector('span').textContent = text;
-                hiddenInput.value = value;
-                optionItems.forEach(item => item.classList.remove('selected'));
-                this.classList.add('selected');
-                options.classList.remove('active');
-                selected.classList.remove('active');
-            });
+        results.addEventListener('click', function(e) {
+            const option = e.target.closest('.dropdown-option');
+            if (!option) {
+                return;
+            }
+            selected.querySelector('span').textContent = option.textContent;
+            hiddenInput.value = option.getAttribute('data-value');
+            results.querySelectorAll('.dropdown-option').forEach(item => item.classList.remove('selected'));
+            option.classList.add('selected');
+            options.classList.remove('active');
+            selected.classList.remove('active');
         });
 
-        // Search filter
-        if (searchInput) {
-            searchInput.addEventListener('input', function() {
-                const searchTerm = this.value.toLowerCase();
-                optionItems.forEach(option => {
-                    const text = option.textContent.toLowerCase();
-                    option.style.display = text.includes(searchTerm) ? "block" : "none";
-                });
-            });
-        }
+        // Search as the user types, once they pause
+        searchInput.addEventListener('input', function() {
+            clearTimeout(timer);
+            timer = setTimeout(() => search(this.value), SEARCH_DELAY_MS);
+        });
 
         // Close dropdown when clicking outside
         document.addEventListener('click', function(e) {
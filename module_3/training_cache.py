@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import joblib
+import pandas as pd
+import sklearn
+
+# Training cache keyed by what the model depends on: the dataset's content
+# hash, the feature list and the library versions. A cache hit loads the fitted
+# model and the fighter database in milliseconds instead of re-reading the CSV,
+# refitting and regrouping on every process start.
+#
+#   .fightiq_cache/
+#     hashes.json          (path, size, mtime) -> sha256, skips rehashing
+#     <key>/model.pkl
+#     <key>/fighter_db.pkl
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.fightiq_cache')
+CACHE_VERSION = 2
+KEEP_ENTRIES = 3
+
+def _hash_file(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def dataset_hash(path, cache_dir=CACHE_DIR):
+    # Content hash of the dataset, memoized on (size, mtime) so an untouched
+    # file is not read at all
+    st = os.stat(path)
+    stamp = f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+    memo_path = os.path.join(cache_dir, 'hashes.json')
+    try:
+        with open(memo_path) as f:
+            memo = json.load(f)
+    except (FileNotFoundError, ValueError):
+        memo = {}
+    if stamp not in memo:
+        memo = {k: v for k, v in memo.items() if not k.startswith(os.path.abspath(path) + ':')}
+        memo[stamp] = _hash_file(path)
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(memo_path + '.tmp', 'w') as f:
+            json.dump(memo, f)
+        os.replace(memo_path + '.tmp', memo_path)
+    return memo[stamp]
+
+def fingerprint(path, features, cache_dir=CACHE_DIR):
+    payload = json.dumps({
+        'cache_version': CACHE_VERSION,
+        'dataset': dataset_hash(path, cache_dir),
+        'features': list(features),
+        'sklearn': sklearn.__version__,
+        'pandas': pd.__version__,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+def load(key, cache_dir=CACHE_DIR):
+    # (model, fighter_db) for a key, or None on a miss
+    entry = os.path.join(cache_dir, key)
+    try:
+        model = joblib.load(os.path.join(entry, 'model.pkl'))
+        fighter_db = pd.read_pickle(os.path.join(entry, 'fighter_db.pkl'))
+    except FileNotFoundError:
+        return None
+    except (EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError):
+        # Truncated, corrupt or written by a different library version: drop
+        # it so store() can put a fresh entry in its place
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+    os.utime(entry)  # mark as recently used for pruning
+    return model, fighter_db
+
+def store(key, model, fighter_db, cache_dir=CACHE_DIR):
+    # Written to a scratch directory and renamed into place, so a concurrent
+    # reader sees either a complete entry or none
+    entry = os.path.join(cache_dir, key)
+    scratch = os.path.join(cache_dir, f'.tmp-{key}-{os.getpid()}')
+    os.makedirs(scratch, exist_ok=True)
+    joblib.dump(model, os.path.join(scratch, 'model.pkl'))
+    fighter_db.to_pickle(os.path.join(scratch, 'fighter_db.pkl'))
+    try:
+        os.rename(scratch, entry)
+    except OSError:
+        shutil.rmtree(scratch, ignore_errors=True)  # another process stored it first
+    prune(cache_dir)
+
+def prune(cache_dir=CACHE_DIR, keep=KEEP_ENTRIES):
+    entries = [os.path.join(cache_dir, d) for d in os.listdir(cache_dir)
+               if os.path.isdir(os.path.join(cache_dir, d)) and not d.startswith('.')]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for entry in entries[keep:]:
+        shutil.rmtree(entry, ignore_errors=True)